@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Batch analysis scaling benchmark.
+
+Records a synthetic scene to a video file, analyzes it once as a single
+unsharded pass and then sharded with 1..N worker processes, and reports
+throughput, speed-up over one worker and how closely the sharded boxes
+agree with the unsharded pass (frames near shard boundaries see a
+background model trained on --warmup frames instead of the whole file).
+
+    python benchmarks/bench_batch.py --frames 3600 --shard-seconds 10 --workers 1 2 4 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections import defaultdict
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_detection import match_boxes
+from motion_tracker.batch import WARMUP_FRAMES, analyze
+from motion_tracker.frame_sources import SyntheticSource
+
+# Benchmark constants
+FPS = 30
+AGREEMENT_IOU = 0.5
+
+
+def record_scene(path, frames):
+    source = SyntheticSource(n_frames=frames, n_blobs=2, seed=2, noise=3.0)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), FPS, (source.width, source.height))
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        writer.write(frame)
+    writer.release()
+
+
+def boxes_by_frame(path):
+    boxes = defaultdict(list)
+    with open(path, 'r') as f:
+        for line in f:
+            record = json.loads(line)
+            boxes[record['frame']].append(record['bbox'])
+    return boxes
+
+
+def agreement(reference, candidate):
+    tp = fp = fn = 0
+    for frame in set(reference) | set(candidate):
+        hits = match_boxes(candidate[frame], reference[frame], AGREEMENT_IOU)
+        tp, fp, fn = tp + hits[0], fp + hits[1], fn + hits[2]
+    return tp / (tp + fp + fn) if tp + fp + fn else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=1800, help='Length of the recorded scene')
+    parser.add_argument('--shard-seconds', type=float, default=10.0)
+    parser.add_argument('--warmup', type=int, default=WARMUP_FRAMES)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help='Worker counts to run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        video = os.path.join(directory, 'scene.avi')
+        record_scene(video, args.frames)
+
+        reference_path = os.path.join(directory, 'reference.jsonl')
+        reference = analyze([video], reference_path, workers=1, shard_seconds=args.frames / FPS + 1,
+                            start_time=0.0, progress=False)
+        print(f"unsharded      {reference['fps']:7.1f} fps")
+        reference_boxes = boxes_by_frame(reference_path)
+
+        baseline = None
+        for workers in args.workers:
+            output = os.path.join(directory, f'sharded_{workers}.jsonl')
+            stats = analyze([video], output, workers=workers, shard_seconds=args.shard_seconds,
+                            warmup=args.warmup, start_time=0.0, progress=False)
+            baseline = baseline or stats['fps']
+            overhead = (stats['decoded_frames'] - stats['frames']) / stats['frames']
+            print(f"{workers:>2} worker(s)   {stats['fps']:7.1f} fps  {stats['fps'] / baseline:4.2f}x  "
+                  f"{stats['shards']} shards, warm-up +{overhead:.0%}  "
+                  f"agreement {agreement(reference_boxes, boxes_by_frame(output)):.3f}")
+    print(f"({os.cpu_count()} CPU(s) available)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Box merge benchmark and equivalence check.
+
+Compares motion_tracker.box_clustering.merge_boxes against the original
+scalar merge_nearby_boxes on randomized frames (clustered blobs plus noise
+boxes, as seen on rain/leaf/lighting frames), then times both across box
+counts from 1 to 500, along with merge_boxes with the optional sweep
+pre-pass (slower than without it at every count here, hence off by default).
+
+    python benchmarks/bench_box_merge.py --check 2000 --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.box_clustering import merge_boxes
+
+# Benchmark constants
+BOX_COUNTS = [1, 2, 5, 10, 25, 50, 100, 200, 350, 500]
+FRAME_WIDTH = 1280
+FRAME_HEIGHT = 720
+DISTANCE_THRESHOLD = 100
+
+
+def merge_nearby_boxes_reference(boxes, distance_threshold=DISTANCE_THRESHOLD):
+    """Original scalar implementation from cat-tracker.py, kept as the reference"""
+    if not boxes:
+        return []
+
+    boxes = np.array(boxes)
+    merged = []
+    used = [False] * len(boxes)
+
+    for i, box1 in enumerate(boxes):
+        if used[i]:
+            continue
+
+        group = [box1]
+        used[i] = True
+
+        changed = True
+        while changed:
+            changed = False
+            current_group_boxes = np.array(group)
+
+            group_x1 = np.min(current_group_boxes[:, 0])
+            group_y1 = np.min(current_group_boxes[:, 1])
+            group_x2 = np.max(current_group_boxes[:, 2])
+            group_y2 = np.max(current_group_boxes[:, 3])
+
+            for j, box2 in enumerate(boxes):
+                if used[j]:
+                    continue
+
+                bx1, by1, bx2, by2 = box2
+
+                group_center_x = (group_x1 + group_x2) // 2
+                group_center_y = (group_y1 + group_y2) // 2
+                box_center_x = (bx1 + bx2) // 2
+                box_center_y = (by1 + by2) // 2
+
+                distance = ((group_center_x - box_center_x) ** 2 + (group_center_y - box_center_y) ** 2) ** 0.5
+
+                overlap_x = max(0, min(group_x2, bx2) - max(group_x1, bx1))
+                overlap_y = max(0, min(group_y2, by2) - max(group_y1, by1))
+                has_overlap = overlap_x > 0 and overlap_y > 0
+
+                x_gap = max(0, max(group_x1, bx1) - min(group_x2, bx2))
+                y_gap = max(0, max(group_y1, by1) - min(group_y2, by2))
+
+                if (distance < distance_threshold or
+                    has_overlap or
+                    (x_gap < distance_threshold//2 and y_gap < distance_threshold//2)):
+                    group.append(box2)
+                    used[j] = True
+                    changed = True
+
+        group_boxes = np.array(group)
+        merged.append([np.min(group_boxes[:, 0]), np.min(group_boxes[:, 1]),
+                       np.max(group_boxes[:, 2]), np.max(group_boxes[:, 3])])
+
+    return merged
+
+
+def random_boxes(rng, count, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+    """Generate a frame's worth of boxes: a few object clusters plus scattered noise"""
+    boxes = []
+    n_clusters = rng.integers(0, 4)
+    centers = rng.integers([0, 0], [width, height], size=(max(n_clusters, 1), 2))
+    for _ in range(count):
+        if n_clusters and rng.random() < 0.6:
+            cx, cy = centers[rng.integers(0, n_clusters)] + rng.normal(0, 60, 2).astype(int)
+        else:
+            cx, cy = rng.integers(0, width), rng.integers(0, height)
+        w, h = rng.integers(31, 160, 2)
+        x1 = int(np.clip(cx - w // 2, 0, width - w))
+        y1 = int(np.clip(cy - h // 2, 0, height - h))
+        boxes.append([x1, y1, x1 + int(w), y1 + int(h)])
+    return boxes
+
+
+def check_equivalence(trials, seed=0):
+    """Compare both implementations on randomized inputs; return the number of mismatches"""
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    for trial in range(trials):
+        count = int(rng.integers(0, 200))
+        threshold = int(rng.choice([0, 1, 10, 50, 100, 250]))
+        boxes = random_boxes(rng, count)
+        expected = [[int(v) for v in box] for box in merge_nearby_boxes_reference(boxes, threshold)]
+        for use_sweep in (True, False):
+            actual = merge_boxes(boxes, threshold, use_sweep=use_sweep)
+            if actual != expected:
+                mismatches += 1
+                print(f"Mismatch on trial {trial} (n={count}, threshold={threshold}, sweep={use_sweep})")
+                print(f"  boxes:    {boxes}")
+                print(f"  expected: {expected}")
+                print(f"  actual:   {actual}")
+    return mismatches
+
+
+def time_call(func, boxes, repeat):
+    """Best-of-repeat wall time in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(boxes, DISTANCE_THRESHOLD)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_benchmark(repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    print(f"{'boxes':>6} {'reference ms':>14} {'vectorized ms':>14} {'with sweep ms':>14} {'speedup':>8}")
+    for count in BOX_COUNTS:
+        boxes = random_boxes(rng, count)
+        reference_ms = time_call(merge_nearby_boxes_reference, boxes, repeat)
+        vectorized_ms = time_call(merge_boxes, boxes, repeat)
+        sweep_ms = time_call(lambda b, t: merge_boxes(b, t, use_sweep=True), boxes, repeat)
+        speedup = reference_ms / vectorized_ms if vectorized_ms > 0 else float('inf')
+        print(f"{count:>6} {reference_ms:>14.3f} {vectorized_ms:>14.3f} {sweep_ms:>14.3f} {speedup:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--check', type=int, default=500, help='Randomized equivalence trials (0 to skip)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions per box count')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.check:
+        mismatches = check_equivalence(args.check, args.seed)
+        print(f"Equivalence: {args.check} trials, {mismatches} mismatches")
+        if mismatches:
+            sys.exit(1)
+
+    run_benchmark(args.repeat, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Detection benchmark suite.
+
+Runs the tracker's per-frame pipeline (MotionDetector.process) over
+deterministic synthetic scenes and optional recorded clips, and reports
+frames/sec, per-stage latency percentiles, peak memory and detection
+precision/recall against ground-truth boxes. Results are saved as JSON so
+runs from different commits can be compared.
+
+    python benchmarks/bench_detection.py --output results.json
+    python benchmarks/bench_detection.py --clip yard.mp4:yard_truth.json
+    python benchmarks/bench_detection.py --set history=100 --compare results.json
+    python benchmarks/bench_detection.py --set mask_mode=fast --compare results.json
+
+A clip's ground-truth file maps frame index to a list of [x, y, w, h]
+boxes: {"0": [], "17": [[120, 80, 64, 40]], ...}. Frames not listed are
+scored as empty; omit the file to report performance only.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker import detector as detector_module
+from motion_tracker.detector import MotionDetector
+from motion_tracker.frame_sources import SyntheticSource, VideoFileSource
+
+# Benchmark constants
+IOU_MATCH_THRESHOLD = 0.3  # Minimum IoU for a detection to count as a hit
+WARMUP_FRAMES = 60  # Frames excluded from scoring while MOG2 learns the scene
+PERCENTILES = (50, 90, 99)
+SCENE_FRAMES = 400
+
+# Deterministic synthetic scenes: name -> SyntheticSource keyword arguments
+SCENES = {
+    'clean': {'n_blobs': 1, 'seed': 1},
+    'two_cats': {'n_blobs': 2, 'seed': 2},
+    'sensor_noise': {'n_blobs': 2, 'seed': 3, 'noise': 8.0},
+    'lighting_drift': {'n_blobs': 1, 'seed': 4, 'lighting': 0.08},
+    'lights_on': {'n_blobs': 1, 'seed': 5, 'lighting_step_frame': 250},
+    'hd_noise': {'n_blobs': 3, 'seed': 6, 'noise': 5.0, 'width': 1280, 'height': 720},
+}
+
+# Tunable detector parameters exposed through --set
+TUNABLE = {
+    'motion_threshold': 'MOTION_THRESHOLD',
+    'history': 'HISTORY',
+    'proximity': 'PROXIMITY',
+    'proximity_threshold': 'PROXIMITY_THRESHOLD',
+    'min_contour_area': 'MIN_CONTOUR_AREA',
+    'downscale': 'DOWNSCALE',
+    'mask_mode': 'MASK_MODE',
+}
+
+
+def iou(a, b):
+    """Intersection over union of two [x, y, w, h] boxes"""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_boxes(detected, truth, threshold=IOU_MATCH_THRESHOLD):
+    """Greedy highest-IoU matching; returns (true positives, false positives, false negatives)"""
+    pairs = sorted(((iou(d, t), i, j) for i, d in enumerate(detected) for j, t in enumerate(truth)),
+                   reverse=True)
+    used_d, used_t = set(), set()
+    for score, i, j in pairs:
+        if score < threshold:
+            break
+        if i in used_d or j in used_t:
+            continue
+        used_d.add(i)
+        used_t.add(j)
+    tp = len(used_d)
+    return tp, len(detected) - tp, len(truth) - tp
+
+
+def load_truth(path):
+    with open(path, 'r') as f:
+        return {int(k): v for k, v in json.load(f).items()}
+
+
+def percentiles_ms(samples):
+    if not samples:
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    values = np.percentile(np.asarray(samples) * 1000, PERCENTILES)
+    return {f"p{p}": round(float(v), 3) for p, v in zip(PERCENTILES, values)}
+
+
+def run_source(source, params, truth_for_frame, warmup):
+    """Feed every frame of a source through a fresh detector and collect metrics"""
+    detector = MotionDetector(**params)
+    stage_samples = {}
+    frame_samples = []
+    tp = fp = fn = 0
+    frames = 0
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+
+        timings = {}
+        start = time.perf_counter()
+        _, detections = detector.process(frame, timings)
+        frame_samples.append(time.perf_counter() - start)
+        for name, duration in timings.items():
+            stage_samples.setdefault(name, []).append(duration)
+
+        truth = truth_for_frame(frames)
+        if truth is not None and frames >= warmup:
+            hits = match_boxes([d['bbox'] for d in detections], truth)
+            tp, fp, fn = tp + hits[0], fp + hits[1], fn + hits[2]
+        frames += 1
+
+    wall = time.perf_counter() - wall_start
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    source.release()
+
+    result = {
+        'frames': frames,
+        'fps': round(frames / wall, 2) if wall > 0 else 0.0,
+        'frame_latency_ms': percentiles_ms(frame_samples),
+        'stage_latency_ms': {name: percentiles_ms(samples) for name, samples in stage_samples.items()},
+        'memory': {
+            'python_peak_kb': traced_peak // 1024,
+            'max_rss_kb': rss_after,
+            'max_rss_growth_kb': rss_after - rss_before,
+        },
+    }
+    if tp + fp + fn:
+        result['accuracy'] = {
+            'true_positives': tp,
+            'false_positives': fp,
+            'false_negatives': fn,
+            'precision': round(tp / (tp + fp), 4) if tp + fp else 0.0,
+            'recall': round(tp / (tp + fn), 4) if tp + fn else 0.0,
+        }
+    return result
+
+
+def run_scene(name, params, frames, warmup):
+    scene = dict(SCENES[name])
+    source = SyntheticSource(n_frames=frames, **scene)
+    return run_source(source, params, lambda _: source.ground_truth, warmup)
+
+
+def run_clip(spec, params, warmup):
+    path, _, truth_path = spec.partition(':')
+    source = VideoFileSource(path)
+    if not source.isOpened():
+        raise SystemExit(f"Error: Could not open clip {path}")
+    truth = load_truth(truth_path) if truth_path else None
+    truth_for_frame = (lambda i: truth.get(i, [])) if truth is not None else (lambda _: None)
+    return run_source(source, params, truth_for_frame, warmup)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def parse_overrides(pairs):
+    params = {}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        if key not in TUNABLE:
+            raise SystemExit(f"Unknown parameter {key}; choose from {', '.join(TUNABLE)}")
+        if key == 'mask_mode':
+            params[key] = value
+        else:
+            params[key] = float(value) if '.' in value else int(value)
+    return params
+
+
+def print_result(name, result, baseline=None):
+    line = f"{name:<16} {result['fps']:>8.1f} fps  p50 {result['frame_latency_ms']['p50']:>7.2f} ms"
+    line += f"  p99 {result['frame_latency_ms']['p99']:>7.2f} ms"
+    accuracy = result.get('accuracy')
+    if accuracy:
+        line += f"  P {accuracy['precision']:.3f}  R {accuracy['recall']:.3f}"
+    if baseline:
+        line += f"  ({(result['fps'] / baseline['fps'] - 1) * 100:+.1f}% fps vs baseline)"
+    print(line)
+    stages = '  '.join(f"{stage} {values['p50']:.2f}" for stage, values in result['stage_latency_ms'].items())
+    print(f"{'':<16} stage p50 ms: {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scene', action='append', choices=sorted(SCENES),
+                        help='Synthetic scene to run (repeatable; default all)')
+    parser.add_argument('--clip', action='append', default=[],
+                        help='Recorded clip as PATH or PATH:TRUTH.json (repeatable)')
+    parser.add_argument('--frames', type=int, default=SCENE_FRAMES, help='Frames per synthetic scene')
+    parser.add_argument('--warmup', type=int, default=WARMUP_FRAMES, help='Frames excluded from accuracy scoring')
+    parser.add_argument('--set', action='append', default=[], metavar='PARAM=VALUE',
+                        help=f"Override a detector parameter ({', '.join(TUNABLE)})")
+    parser.add_argument('--output', help='Write results JSON to this path')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    params = parse_overrides(args.set)
+    baseline = {}
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f).get('results', {})
+
+    results = {}
+    for name in args.scene or sorted(SCENES):
+        results[name] = run_scene(name, params, args.frames, args.warmup)
+        print_result(name, results[name], baseline.get(name))
+    for spec in args.clip:
+        name = os.path.basename(spec.partition(':')[0])
+        results[name] = run_clip(spec, params, args.warmup)
+        print_result(name, results[name], baseline.get(name))
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'parameters': {const: params.get(key, getattr(detector_module, const))
+                       for key, const in TUNABLE.items()},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Mask cleanup benchmark and quality check.
+
+Feeds the same MOG2 output through the exact and the fast cleanup chains
+(MotionDetector mask_mode='exact' / 'fast') over the synthetic scenes and
+reports the per-frame cleanup cost of each and how well the fast chain's
+boxes agree with the exact chain's. A fast box agrees when it matches an
+exact box with IoU >= --iou; agreement is matched / (matched + extra +
+missing). Exits non-zero if any scene falls below --tolerance, so it can
+gate changes to the cleanup stages.
+
+    python benchmarks/bench_mask_cleanup.py --frames 300 --tolerance 0.97
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_detection import SCENES, WARMUP_FRAMES, match_boxes
+from motion_tracker.detector import EXACT_MASK, FAST_MASK, MotionDetector
+from motion_tracker.frame_sources import SyntheticSource
+
+# Quality constants
+BOX_IOU = 0.8  # Fast boxes must overlap the exact ones this closely to count as the same box
+TOLERANCE = 0.97  # Minimum per-scene agreement
+
+
+def xywh(boxes):
+    return [[x1, y1, x2 - x1, y2 - y1] for x1, y1, x2, y2 in boxes]
+
+
+def compare_scene(name, frames, box_iou, downscale):
+    source = SyntheticSource(n_frames=frames, **SCENES[name])
+    exact = MotionDetector(mask_mode=EXACT_MASK, downscale=downscale)
+    fast = MotionDetector(mask_mode=FAST_MASK, downscale=downscale)
+    times = {EXACT_MASK: [], FAST_MASK: []}
+    matched = extra = missing = 0
+
+    for index in range(frames):
+        ret, frame = source.read()
+        if not ret:
+            break
+        # One background model for both, so only the cleanup differs
+        raw = exact.backSub.apply(exact.working_view(frame))
+        fast.roi, fast._work_size = exact.roi, exact._work_size
+
+        boxes = {}
+        for mode, detector in ((EXACT_MASK, exact), (FAST_MASK, fast)):
+            start = time.perf_counter()
+            mask = detector.clean_mask(raw)
+            times[mode].append(time.perf_counter() - start)
+            boxes[mode] = xywh(detector.find_boxes(mask))
+
+        if index >= WARMUP_FRAMES:
+            hits = match_boxes(boxes[FAST_MASK], boxes[EXACT_MASK], box_iou)
+            matched, extra, missing = matched + hits[0], extra + hits[1], missing + hits[2]
+
+    total = matched + extra + missing
+    return {
+        'exact_ms': float(np.mean(times[EXACT_MASK]) * 1000),
+        'fast_ms': float(np.mean(times[FAST_MASK]) * 1000),
+        'matched': matched,
+        'extra': extra,
+        'missing': missing,
+        'agreement': matched / total if total else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scene', action='append', choices=sorted(SCENES),
+                        help='Synthetic scene to run (repeatable; default all)')
+    parser.add_argument('--frames', type=int, default=300, help='Frames per scene')
+    parser.add_argument('--downscale', type=float, default=1.0)
+    parser.add_argument('--iou', type=float, default=BOX_IOU, help='IoU for a fast box to match an exact one')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Minimum agreement per scene')
+    args = parser.parse_args()
+
+    failed = []
+    for name in args.scene or sorted(SCENES):
+        result = compare_scene(name, args.frames, args.iou, args.downscale)
+        print(f"{name:<16} exact {result['exact_ms']:6.2f} ms  fast {result['fast_ms']:6.2f} ms "
+              f"({result['exact_ms'] / result['fast_ms']:.1f}x)  agreement {result['agreement']:.3f} "
+              f"(matched {result['matched']}, extra {result['extra']}, missing {result['missing']})")
+        if result['agreement'] < args.tolerance:
+            failed.append(name)
+
+    if failed:
+        raise SystemExit(f"Fast mask cleanup below {args.tolerance:.2f} agreement: {', '.join(failed)}")
+    print(f"Fast mask cleanup within tolerance ({args.tolerance:.2f} agreement at IoU {args.iou})")
+
+
+if __name__ == '__main__':
+    main()
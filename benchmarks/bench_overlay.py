@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Marker overlay benchmark.
+
+Replays a synthetic detection stream (detections arriving at --detection-hz
+against a --camera-fps feed, two tracks with trails) through the viewer's
+original per-frame drawing and through the cached MarkerOverlay, checks
+every composited frame against the original (identical except for rounding
+where two antialiased labels overlap), and reports per-frame cost and how
+often the overlay layers were built.
+
+    python benchmarks/bench_overlay.py --width 1280 --height 720 --frames 300
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.overlay import MarkerOverlay, draw_crosshair
+
+# Benchmark constants
+MAX_PIXEL_ERROR = 2  # Allowed rounding difference where antialiased labels overlap
+
+# The viewer is a hyphenated script, so load its trail bookkeeping by path
+_spec = importlib.util.spec_from_file_location(
+    'motion_processor', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                     'motion_tracker', 'motion-processor.py'))
+motion_processor = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(motion_processor)
+
+
+def draw_reference(frame, positions, trails):
+    """Original display_markers drawing, straight onto every frame"""
+    for trail in trails.values():
+        for i, (x, y, _) in enumerate(trail):
+            alpha = (i + 1) / len(trail)
+            color_intensity = int(255 * alpha)
+            color = (0, 0, color_intensity)
+            size = int(15 + 15 * alpha)
+            thickness = max(1, int(3 * alpha))
+            draw_crosshair(frame, x, y, color=color, size=size, thickness=thickness)
+        predicted = trail[-1][2]
+        if predicted:
+            draw_crosshair(frame, predicted[0], predicted[1], color=(255, 128, 0), size=10, thickness=1)
+
+    if positions:
+        latest = positions[0]
+        pos_text = f"Position: ({latest['x']}, {latest['y']})"
+        cv2.putText(frame, pos_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        detection_text = f"Recent detections: {len(positions)}, tracks: {len(trails)}"
+        cv2.putText(frame, detection_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    for pos_data in positions:
+        area = pos_data.get('area', 0)
+        if 'bbox' in pos_data:
+            bbox_x, bbox_y, bbox_w, bbox_h = pos_data['bbox']
+            label = f"#{pos_data['track_id']} Area: {area}" if 'track_id' in pos_data else f'Area: {area}'
+            cv2.rectangle(frame, (bbox_x, bbox_y), (bbox_x + bbox_w, bbox_y + bbox_h), (0, 255, 0), 1)
+            cv2.putText(frame, label, (bbox_x, bbox_y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    return frame
+
+
+def detection_windows(frames, width, height, camera_fps, detection_hz, quiet_fraction, seed=0):
+    """Per-frame detection window (most recent first), as read_queue would return it"""
+    rng = np.random.default_rng(seed)
+    log, windows, seq = [], [], 0
+    quiet_from = int(frames * (1 - quiet_fraction))
+    positions = {1: np.array([width * 0.3, height * 0.5]), 2: np.array([width * 0.7, height * 0.4])}
+    every = max(1, round(camera_fps / detection_hz))
+    for index in range(frames):
+        now = index / camera_fps
+        if index < quiet_from and index % every == 0:
+            for track_id, position in positions.items():
+                position += rng.normal(0, 6, 2)
+                np.clip(position, 40, [width - 40, height - 40], out=position)
+                x, y = (int(v) for v in position)
+                seq += 1
+                log.append({'seq': seq, 'timestamp': now, 'x': x, 'y': y, 'area': int(rng.integers(3000, 9000)),
+                            'bbox': [x - 40, y - 30, 80, 60], 'track_id': track_id, 'predicted': [x + 5, y]})
+        windows.append(list(reversed([d for d in log if now - d['timestamp'] <= motion_processor.BOUNDING_BOX_LIFE])))
+    return windows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--camera-fps', type=float, default=30)
+    parser.add_argument('--detection-hz', type=float, default=10)
+    parser.add_argument('--quiet-fraction', type=float, default=0.5, help='Share of frames with no cat in view')
+    args = parser.parse_args()
+
+    windows = detection_windows(args.frames, args.width, args.height, args.camera_fps, args.detection_hz,
+                                args.quiet_fraction)
+    rng = np.random.default_rng(1)
+    background = rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+
+    # Each renderer gets its own timed pass over fresh frames
+    frames = [background.copy() for _ in windows]
+    trails = {}
+    start = time.perf_counter()
+    for frame, positions in zip(frames, windows):
+        motion_processor.update_trails(trails, positions)
+        draw_reference(frame, positions, trails)
+    reference_time = time.perf_counter() - start
+    expected = frames
+
+    frames = [background.copy() for _ in windows]
+    trails = {}
+    overlay = MarkerOverlay()
+    start = time.perf_counter()
+    for frame, positions in zip(frames, windows):
+        motion_processor.update_trails(trails, positions)
+        overlay.update(frame.shape, positions, trails)
+        overlay.apply(frame)
+    overlay_time = time.perf_counter() - start
+
+    differing = worst = 0
+    for frame, reference in zip(frames, expected):
+        error = np.abs(frame.astype(np.int16) - reference).max(axis=2)
+        differing += int(np.count_nonzero(error))
+        worst = max(worst, int(error.max()))
+    if worst > MAX_PIXEL_ERROR:
+        raise SystemExit(f"Overlay output differs from drawing on the frame by up to {worst}")
+
+    print(f"{args.width}x{args.height}, {args.frames} frames, detections at {args.detection_hz:g} Hz, "
+          f"{args.quiet_fraction:.0%} quiet")
+    print(f"draw every frame   {reference_time * 1000 / args.frames:7.3f} ms/frame")
+    print(f"cached overlay     {overlay_time * 1000 / args.frames:7.3f} ms/frame  "
+          f"({overlay.rebuilds} layer builds, {reference_time / overlay_time:.1f}x)")
+    print(f"{differing} of {args.frames * args.width * args.height} pixels differ from drawing on the frame "
+          f"(max {worst})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Detection serialization benchmark.
+
+Compares the JSON-lines path (the old recursive convert_numpy_types walk
+plus json.dumps to write, json.loads to read) with the fixed-layout
+records in motion_tracker.detection_record: per-record pack on write,
+one-call bulk decode on read, and loading a large record file as a single
+memory-mapped array. Also checks that JSON -> binary -> JSON round-trips.
+
+    python benchmarks/bench_records.py --records 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.detection_record import (FILE_HEADER, decode_records, dumps, encode_records,
+                                             jsonl_to_records, load_records, pack_detection,
+                                             records_to_dicts, records_to_jsonl)
+
+
+def convert_numpy_types(obj):
+    """The tracker's previous per-record conversion, kept here as the baseline"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, dict):
+        return {key: convert_numpy_types(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_numpy_types(item) for item in obj]
+    return obj
+
+
+def make_detections(count, seed=0):
+    rng = np.random.default_rng(seed)
+    detections = []
+    for seq in range(1, count + 1):
+        x, y = (int(v) for v in rng.integers(0, 640, 2))
+        detections.append({
+            'type': 'motion', 'seq': seq, 'timestamp': 1.7e9 + seq / 30, 'x': x, 'y': y,
+            'area': int(rng.integers(2000, 20000)), 'bbox': [x - 40, y - 30, 80, 60],
+            'track_id': seq % 7 + 1, 'velocity': [round(float(rng.normal(0, 50)), 1), 0.0],
+            'predicted': [x + 3, y], 'capture_time': 1.7e9 + seq / 30 - 0.02, 'frame_size': [640, 480],
+        })
+    return detections
+
+
+def timed(label, count, fn):
+    """Run fn once and print its cost per record, or per call when count is None (constant-time views)"""
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    if elapsed <= 0:
+        print(f"{label:<40} below timer resolution")
+    elif count is None:
+        print(f"{label:<40} {elapsed * 1e6:8.2f} us/call    (independent of the record count)")
+    else:
+        print(f"{label:<40} {elapsed * 1e6 / count:8.2f} us/record  ({count / elapsed:12,.0f} records/s)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200000, help='Records for the bulk load test')
+    parser.add_argument('--sample', type=int, default=50000, help='Records for the per-record tests')
+    args = parser.parse_args()
+    if args.sample < 1:
+        parser.error("--sample must be at least 1")
+
+    detections = make_detections(args.sample)
+
+    print("write path")
+    lines = timed('convert_numpy_types + json.dumps', args.sample,
+                  lambda: [json.dumps(convert_numpy_types(d)) + '\n' for d in detections])
+    timed('dumps (NumPy fallback only)', args.sample, lambda: [dumps(d) + '\n' for d in detections])
+    timed('pack_detection', args.sample, lambda: [pack_detection(d['seq'], d) for d in detections])
+
+    print("read path")
+    timed('json.loads', args.sample, lambda: [json.loads(line) for line in lines])
+    payload = encode_records(detections)
+    timed('decode_records (array view)', None, lambda: decode_records(payload))
+    decoded = timed('decode_records + records_to_dicts', args.sample,
+                    lambda: records_to_dicts(decode_records(payload)))
+    if decoded != [json.loads(line) for line in lines]:
+        raise SystemExit("Binary records do not round-trip to the JSON records")
+
+    with tempfile.TemporaryDirectory() as directory:
+        jsonl = os.path.join(directory, 'detections.jsonl')
+        binary = os.path.join(directory, 'detections.bin')
+        back = os.path.join(directory, 'roundtrip.jsonl')
+        with open(jsonl, 'w') as f:
+            f.writelines(lines)
+        jsonl_to_records(jsonl, binary)
+        records_to_jsonl(binary, back)
+        with open(jsonl) as a, open(back) as b:
+            if [json.loads(line) for line in a] != [json.loads(line) for line in b]:
+                raise SystemExit("JSON -> binary -> JSON conversion changed records")
+        print("conversion round-trip ok")
+
+        # Bulk file: repeat the sample's records to the requested size, at least once
+        repeats = max(1, args.records // args.sample)
+        with open(binary, 'wb') as f:
+            f.write(FILE_HEADER)
+            for _ in range(repeats):
+                f.write(payload)
+        count = repeats * args.sample
+        print(f"bulk load, {count:,} records ({os.path.getsize(binary) / 2 ** 20:.1f} MB)")
+        records = timed('load_records (memmap)', None, lambda: load_records(binary))
+        timed('  + mean area over all records', count, lambda: float(records['area'].mean()))
+        timed('  + per-track counts', count, lambda: np.bincount(records['track_id']))
+        del records
+
+
+if __name__ == '__main__':
+    main()
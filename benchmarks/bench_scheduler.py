@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Adaptive scheduler benchmark.
+
+Plays a quiet yard (sensor noise and a slow brightness drift), a cat
+crossing it, then quiet again, through the detector at full rate and
+through the AdaptiveScheduler, and reports:
+  - cost: mean milliseconds per frame in the quiet and busy stretches
+  - escalation: frames between the cat appearing and the first detection
+  - recall: busy frames with a detection overlapping the cat
+  - false boxes: detections on quiet frames after the first idle stretch,
+    which show up if the background model fell behind the drift
+
+    python benchmarks/bench_scheduler.py --quiet 900 --busy 150
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.detector import MotionDetector
+from motion_tracker.frame_sources import SyntheticSource
+from motion_tracker.scheduler import AdaptiveScheduler
+from motion_tracker.tracker import box_corners, iou_matrix
+
+# Benchmark constants
+NOISE = 3.0
+DRIFT = 30.0  # Brightness change (0-255) over each quiet stretch
+IOU_MATCH_THRESHOLD = 0.3
+
+
+def scene(quiet, busy, seed=3):
+    """Yield (frame, truth boxes) for quiet -> busy -> quiet"""
+    source = SyntheticSource(n_frames=busy, n_blobs=1, seed=seed)
+    rng = np.random.default_rng(seed)
+    background = source.background.astype(np.float32)
+
+    def quiet_frame(index, base):
+        frame = background + base + DRIFT * index / quiet + rng.normal(0, NOISE, background.shape)
+        return np.clip(frame, 0, 255).astype(np.uint8)
+
+    for index in range(quiet):
+        yield quiet_frame(index, 0.0), []
+    for _ in range(busy):
+        _, frame = source.read()
+        frame = np.clip(frame.astype(np.float32) + DRIFT + rng.normal(0, NOISE, frame.shape), 0, 255)
+        yield frame.astype(np.uint8), source.ground_truth
+    for index in range(quiet):
+        yield quiet_frame(index, DRIFT), []
+
+
+def run(label, runner, quiet, busy):
+    quiet_times, busy_times = [], []
+    first_hit = None
+    hits = false_boxes = 0
+    for index, (frame, truth) in enumerate(scene(quiet, busy)):
+        start = time.perf_counter()
+        _, detections = runner.process(frame)
+        elapsed = time.perf_counter() - start
+
+        busy_frame = quiet <= index < quiet + busy
+        (busy_times if busy_frame else quiet_times).append(elapsed)
+        if busy_frame and detections:
+            overlap = iou_matrix(box_corners(truth), box_corners([d['bbox'] for d in detections]))
+            if overlap.max() >= IOU_MATCH_THRESHOLD:
+                hits += 1
+                if first_hit is None:
+                    first_hit = index - quiet
+        elif index >= quiet // 2 and not busy_frame:
+            false_boxes += len(detections)
+
+    print(f"{label:>9}: quiet {np.mean(quiet_times) * 1000:6.2f} ms/frame, "
+          f"busy {np.mean(busy_times) * 1000:6.2f} ms/frame, first hit after {first_hit} frames, "
+          f"recall {hits}/{busy}, false boxes {false_boxes}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full-rate and adaptive detection cost and recall")
+    parser.add_argument('--quiet', type=int, default=900, help='Frames in each quiet stretch')
+    parser.add_argument('--busy', type=int, default=150, help='Frames with the cat in view')
+    args = parser.parse_args()
+
+    run('full', MotionDetector(), args.quiet, args.busy)
+    run('adaptive', AdaptiveScheduler(MotionDetector()), args.quiet, args.busy)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Shapes persistence benchmark.
+
+Builds a shapes document of --shapes polygons with --points points each and
+simulates an editing session where every autosave moves one point. The
+original full-document POST (re-parse on every GET, indent=2 rewrite in
+place on every save) is compared with the versioned store: PATCH deltas,
+cached GET bodies with ETag/304, and debounced temp-file-and-rename
+writes. Reports bytes sent per autosave, server time per request, and
+disk writes for a burst of saves.
+
+    python benchmarks/bench_shapes.py --shapes 20 --points 500 --saves 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'webapp', 'backend'))
+
+
+def make_shapes(count, points, seed=0):
+    rng = random.Random(seed)
+    return [{'id': f"shape_{index}", 'name': f"Shape {index + 1}", 'active': index == 0,
+             'points': [{'x': rng.uniform(0, 100), 'y': rng.uniform(0, 100)} for _ in range(points)]}
+            for index in range(count)]
+
+
+def old_load(path):
+    """Original load_shapes: read and parse the file on every GET"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def old_save(path, shapes_data):
+    """Original save_shapes: rewrite the file in place with indent=2"""
+    with open(path, 'w') as f:
+        json.dump(shapes_data, f, indent=2)
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shapes', type=int, default=20)
+    parser.add_argument('--points', type=int, default=500, help='Points per polygon')
+    parser.add_argument('--saves', type=int, default=100, help='Autosaves in the editing session')
+    parser.add_argument('--burst', type=int, default=20, help='Saves arriving within one debounce window')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        import app
+        from shapes_store import ShapesStore
+        client = app.app.test_client()
+
+        shapes = make_shapes(args.shapes, args.points)
+        rng = random.Random(1)
+        old_path = os.path.join(directory, 'old_shapes.json')
+        old_save(old_path, {'shapes': shapes})
+
+        # Autosave traffic and server time
+        old_bytes = new_bytes = 0
+        old_time = new_time = 0.0
+        response = client.post('/api/shapes', json={'shapes': shapes})
+        etag = response.headers['ETag']
+        for _ in range(args.saves):
+            shape = rng.choice(shapes)
+            shape['points'][rng.randrange(len(shape['points']))] = {'x': rng.uniform(0, 100), 'y': rng.uniform(0, 100)}
+
+            body = json.dumps({'shapes': shapes})
+            old_bytes += len(body)
+            start = time.perf_counter()
+            data = json.loads(body)
+            app.validate_shapes_data(data)
+            old_save(old_path, data)
+            old_time += time.perf_counter() - start
+
+            delta = json.dumps({'upsert': [shape]})
+            new_bytes += len(delta)
+            start = time.perf_counter()
+            response = client.patch('/api/shapes', data=delta, content_type='application/json',
+                                    headers={'If-Match': etag})
+            new_time += time.perf_counter() - start
+            if response.status_code != 200:
+                raise SystemExit(f"PATCH failed: {response.status_code} {response.get_json()}")
+            etag = response.headers['ETag']
+
+        app.shapes_store.flush()
+        if app.load_shapes()['shapes'] != shapes or old_load(app.SHAPES_FILE)['shapes'] != shapes:
+            raise SystemExit("Patched shapes differ from the edited document")
+
+        print(f"{args.shapes} shapes x {args.points} points, {args.saves} autosaves moving one point each")
+        print(f"full POST    {old_bytes / args.saves / 1024:8.1f} KiB/save  {old_time * 1000 / args.saves:7.2f} ms/save")
+        print(f"PATCH delta  {new_bytes / args.saves / 1024:8.1f} KiB/save  {new_time * 1000 / args.saves:7.2f} ms/save "
+              f"(Flask test client included)")
+
+        # GET polling
+        old_get, _ = timed(lambda: app.app.response_class(json.dumps(old_load(old_path)),
+                                                           mimetype='application/json'), 50)
+        new_get, response = timed(lambda: client.get('/api/shapes'), 50)
+        cached, response = timed(lambda: client.get('/api/shapes', headers={'If-None-Match': etag}), 50)
+        if response.status_code != 304:
+            raise SystemExit(f"Expected 304, got {response.status_code}")
+        print(f"GET  re-parse {old_get:6.2f} ms   cached body {new_get:6.2f} ms   304 {cached:6.2f} ms")
+
+        # Disk writes for a burst of saves inside one debounce window
+        store = ShapesStore(os.path.join(directory, 'burst.json'), debounce=0.2, max_delay=1.0)
+        for index in range(args.burst):
+            store.replace({'shapes': shapes[:1 + index % len(shapes)]})
+        time.sleep(0.5)
+        old_written = sum(len(json.dumps({'shapes': shapes[:1 + index % len(shapes)]}, indent=2))
+                          for index in range(args.burst))
+        print(f"{args.burst} saves in a burst: {args.burst} in-place writes ({old_written / 1024:.0f} KiB) before, "
+              f"{store.writes} atomic write(s) ({os.path.getsize(store.path) / 1024:.0f} KiB) now")
+
+
+if __name__ == '__main__':
+    main()
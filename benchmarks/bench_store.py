@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Detection history store benchmark.
+
+Fills a DetectionStore with months of synthetic detections (through the
+same batched writer thread the tracker uses), then times the backend's
+history queries over growing ranges against the equivalent GROUP BY over
+the raw detections table, and checks both give the same answers, for
+all cameras and for each one, and that out-of-range page limits are
+clamped.
+
+    python benchmarks/bench_store.py --days 120 --per-day 20000
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.detection_store import HEATMAP_GRID, MAX_RANGE_ROWS, DetectionHistory, DetectionStore, heat_cell
+
+# Benchmark constants
+ZONES = ['food_bowl', 'couch', 'counter', None]
+CAMERAS = ['yard', 'porch']
+FRAME_SIZE = [640, 480]
+START_TIME = 1.7e9
+
+
+def fill(store, days, per_day, seed=0):
+    rng = np.random.default_rng(seed)
+    for day in range(days):
+        times = np.sort(START_TIME + day * 86400 + rng.uniform(0, 86400, per_day))
+        xs = rng.integers(0, FRAME_SIZE[0], per_day)
+        ys = rng.integers(0, FRAME_SIZE[1], per_day)
+        zones = rng.integers(0, len(ZONES), per_day)
+        cameras = rng.integers(0, len(CAMERAS), per_day)
+        for timestamp, x, y, zone, camera in zip(times.tolist(), xs.tolist(), ys.tolist(), zones.tolist(),
+                                                 cameras.tolist()):
+            detection = {'timestamp': timestamp, 'x': x, 'y': y, 'area': 4800, 'bbox': [x - 40, y - 30, 80, 60],
+                         'track_id': 1, 'frame_size': FRAME_SIZE, 'camera_id': CAMERAS[camera]}
+            if ZONES[zone]:
+                detection['zone'] = ZONES[zone]
+            store.add(detection)
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def raw_zone_totals(path, start, end, camera_id=None):
+    with sqlite3.connect(path) as connection:
+        rows = connection.execute('SELECT zone, COUNT(*) FROM detections WHERE timestamp >= ? AND timestamp < ? '
+                                  'AND (? IS NULL OR camera_id = ?) GROUP BY zone',
+                                  (start, end, camera_id, camera_id)).fetchall()
+    return dict(rows)
+
+
+def raw_heatmap(path, start, end, camera_id=None):
+    grid = np.zeros(HEATMAP_GRID[0] * HEATMAP_GRID[1], dtype=np.int64)
+    with sqlite3.connect(path) as connection:
+        for x, y, width, height in connection.execute(
+                'SELECT x, y, frame_width, frame_height FROM detections WHERE timestamp >= ? AND timestamp < ? '
+                'AND (? IS NULL OR camera_id = ?)', (start, end, camera_id, camera_id)):
+            grid[heat_cell({'x': x, 'y': y, 'frame_size': (width, height)})] += 1
+    return grid.reshape(HEATMAP_GRID[1], HEATMAP_GRID[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--per-day', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'detections.db')
+        total = args.days * args.per_day
+        start = time.perf_counter()
+        store = DetectionStore(path, retention_seconds=float('inf'))
+        fill(store, args.days, args.per_day)
+        store.close()
+        elapsed = time.perf_counter() - start
+        print(f"inserted {total:,} detections in {elapsed:.1f} s ({total / elapsed:,.0f}/s), "
+              f"{os.path.getsize(path) / 2 ** 20:.0f} MB")
+
+        history = DetectionHistory(path)
+        # Ranges start and end on the minute so the raw GROUP BY covers exactly the same detections
+        for days in (1, 7, 30, args.days):
+            end = START_TIME - START_TIME % 60 + args.days * 86400 - 3 * 3600 - 7 * 60
+            begin = end - days * 86400 + 11 * 60
+            totals, aggregate_ms = timed(lambda: history.zone_totals(begin, end))
+            expected, raw_ms = timed(lambda: raw_zone_totals(path, begin, end), repeat=1)
+            if totals != expected:
+                raise SystemExit(f"Zone totals differ over {days} days: {totals} != {expected}")
+            resolution = history.series_resolution(begin, end, 'hour')
+            series, series_ms = timed(lambda: history.counts(begin, end, resolution))
+            print(f"{days:>4} day range  zone totals {aggregate_ms:7.2f} ms (raw scan {raw_ms:8.1f} ms)  "
+                  f"series {len(series):>5} x {resolution}s {series_ms:7.2f} ms")
+
+        # Heatmaps are kept to the hour, so compare over an hour-aligned range
+        end = START_TIME - START_TIME % 3600 + args.days * 86400
+        begin = end - min(args.days, 30) * 86400 + 5 * 3600
+        grid, heatmap_ms = timed(lambda: history.heatmap(begin, end))
+        expected, raw_ms = timed(lambda: raw_heatmap(path, begin, end), repeat=1)
+        if not np.array_equal(grid, expected):
+            raise SystemExit("Heatmap differs from the raw detections")
+        _, coarse_ms = timed(lambda: history.heatmap(begin, end, columns=16))
+        print(f"heatmap {grid.shape[1]}x{grid.shape[0]} {heatmap_ms:.2f} ms, 16 columns {coarse_ms:.2f} ms "
+              f"(raw scan {raw_ms:.1f} ms)")
+
+        # Each camera's aggregates on their own
+        for camera_id in CAMERAS:
+            if (history.zone_totals(begin, end, camera_id) != raw_zone_totals(path, begin, end, camera_id) or
+                    not np.array_equal(history.heatmap(begin, end, camera_id=camera_id),
+                                       raw_heatmap(path, begin, end, camera_id))):
+                raise SystemExit(f"Aggregates for camera {camera_id} differ from its raw detections")
+        series = history.counts(begin, end, 86400)
+        if len(series) != len({(bucket, zone) for bucket, zone, _ in series}):
+            raise SystemExit("All-camera series repeats a bucket and zone")
+        print(f"per-camera zone totals and heatmaps match for {len(CAMERAS)} cameras")
+
+        _, page_ms = timed(lambda: history.detections(begin, end, zone='couch', limit=1000))
+        print(f"1000-detection page for one zone {page_ms:.2f} ms")
+
+        # SQLite treats a negative LIMIT as unlimited, so out-of-range limits must be clamped
+        for limit in (-1, 0, 10 ** 9):
+            rows = len(history.detections(begin, end, limit=limit))
+            if not 1 <= rows <= MAX_RANGE_ROWS:
+                raise SystemExit(f"limit={limit} returned {rows} detections")
+
+
+if __name__ == '__main__':
+    main()
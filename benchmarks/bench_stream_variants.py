@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Stream profile benchmark.
+
+Encodes a synthetic camera frame at the original fixed 800x600, quality 80,
+30 fps and at each stream profile, and reports encode time and bandwidth
+per viewer. Then replays --clients viewers asking for assorted preview
+sizes through FrameBroadcaster.variants() to show how many encodes a frame
+costs once requests are rounded and capped (checking that no viewer is
+merged into a variant above its quality), and feeds a viewer that only
+reads every --slow-every chunk through a QualityGovernor to show its
+quality and bandwidth stepping down and recovering.
+
+    python benchmarks/bench_stream_variants.py --clients 50 --repeat 30
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'webapp', 'backend'))
+sys.path.insert(0, ROOT)
+from streaming import FrameBroadcaster, Subscription, multipart_chunk
+
+# Benchmark constants
+CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS, JPEG_QUALITY = 800, 600, 30, 80  # As in webapp/backend/app.py
+PREVIEW_WIDTHS = (240, 300, 320, 360, 400, 480, 500, 640)  # Widths browsers ask for
+
+
+def camera_frame(seed=0):
+    """Smooth gradients plus sensor noise, closer to a camera than pure noise"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:CAMERA_HEIGHT, 0:CAMERA_WIDTH]
+    base = np.dstack([x * 255 // CAMERA_WIDTH, y * 255 // CAMERA_HEIGHT,
+                      (x + y) * 255 // (CAMERA_WIDTH + CAMERA_HEIGHT)]).astype(np.uint8)
+    for _ in range(12):
+        cx, cy, r = rng.integers(0, CAMERA_WIDTH), rng.integers(0, CAMERA_HEIGHT), rng.integers(20, 120)
+        cv2.circle(base, (int(cx), int(cy)), int(r), [int(v) for v in rng.integers(0, 255, 3)], -1)
+    noise = rng.normal(0, 6, base.shape)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def encode_cost(broadcaster, frame, profile, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        jpeg = broadcaster.encode(frame, profile)
+    return (time.perf_counter() - start) / repeat * 1000, len(multipart_chunk(jpeg))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=50, help='Viewers asking for random preview sizes')
+    parser.add_argument('--repeat', type=int, default=30, help='Encodes timed per profile')
+    parser.add_argument('--slow-every', type=int, default=3, help='The slow viewer reads one chunk in this many')
+    args = parser.parse_args()
+
+    frame = camera_frame()
+    broadcaster = FrameBroadcaster(lambda: frame, lambda: np.zeros_like(frame), CAMERA_FPS, JPEG_QUALITY)
+
+    # Per-viewer encode cost and bandwidth
+    base_ms, base_bytes = encode_cost(broadcaster, frame, None, args.repeat)
+    print(f"fixed stream {CAMERA_WIDTH}x{CAMERA_HEIGHT} q{JPEG_QUALITY} {CAMERA_FPS} fps: "
+          f"{base_ms:6.2f} ms/encode  {base_bytes * CAMERA_FPS * 8 / 1e6:6.2f} Mbit/s")
+    for name, profile in [('low', broadcaster.profile('low')), ('width=480', broadcaster.profile(width=480)),
+                          ('width=320&quality=60&fps=15', broadcaster.profile(width=320, quality=60, fps=15))]:
+        ms, size = encode_cost(broadcaster, frame, profile, args.repeat)
+        fps = CAMERA_FPS / profile.every
+        print(f"  {name:28s} {profile.label():18s} {ms:6.2f} ms/encode  "
+              f"{size * fps * 8 / 1e6:6.2f} Mbit/s  ({base_bytes * CAMERA_FPS / (size * fps):.1f}x less, "
+              f"{base_ms * CAMERA_FPS / (ms * fps):.1f}x less encode CPU)")
+
+    # Shared variants: encodes per frame for a crowd of preview sizes
+    rng = random.Random(0)
+    subscribers = [Subscription(broadcaster.profile(width=rng.choice(PREVIEW_WIDTHS) + rng.randint(-8, 8)))
+                   for _ in range(args.clients)]
+    # A few of them already stepped down to a lower quality by congestion
+    for subscription in subscribers[::10]:
+        subscription.governor.profile = subscription.profile._replace(quality=JPEG_QUALITY - 40)
+    requested = {subscription.profile for subscription in subscribers}
+    groups = broadcaster.variants(subscribers)
+    print(f"{args.clients} viewers at {len(PREVIEW_WIDTHS)} preview sizes (+/-8 px): {len(requested)} rounded profiles, "
+          f"{len(groups)} encodes per frame (cap {broadcaster.max_variants}) instead of one per viewer")
+    if any(profile.quality > subscription.profile.quality for profile, members in groups.items()
+           for subscription in members):
+        raise SystemExit("A viewer was merged into a variant above its quality")
+
+    # Adaptive quality: a viewer that only keeps up with one chunk in slow_every
+    subscription = Subscription(broadcaster.profile())
+    chunks = {}
+    qualities = []
+    for index in range(3000):
+        profile = subscription.profile
+        if profile not in chunks:
+            chunks[profile] = multipart_chunk(broadcaster.encode(frame, profile))
+        subscription.put(chunks[profile])
+        if index >= 1500:
+            # Caught up: drains whatever is queued
+            while subscription.get(timeout=0) is not None:
+                pass
+        elif index % args.slow_every == 0:
+            subscription.get(timeout=0)
+        qualities.append(subscription.profile.quality)
+    congested, recovered = qualities[1499], qualities[-1]
+    print(f"slow viewer (1 in {args.slow_every} chunks read): quality {JPEG_QUALITY} -> {congested} "
+          f"({len(chunks[broadcaster.profile()]) / len(chunks[subscription.governor.profile._replace(quality=congested)]):.1f}x "
+          f"smaller frames), back to {recovered} once it keeps up; {subscription.quality_changes} steps")
+    if congested >= JPEG_QUALITY or recovered != JPEG_QUALITY:
+        raise SystemExit("Quality did not adapt to the slow viewer")
+
+
+if __name__ == '__main__':
+    main()
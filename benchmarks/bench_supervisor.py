@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Multi-camera supervisor benchmark.
+
+Scaling: runs 1..N synthetic recorded cameras through the supervisor, one
+pinned tracker process each, and reports aggregate frames per second
+(start-up included) and how many detections reached the merged ring.
+
+Isolation: runs two cameras, freezes one tracker with SIGSTOP and checks
+that the other keeps processing frames while the frozen one is detected
+as stalled and restarted.
+
+    python benchmarks/bench_supervisor.py --cameras 1 2 4 --frames 600
+"""
+
+import argparse
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker import supervisor
+from motion_tracker.detection_ring import DetectionRingReader
+from motion_tracker.supervisor import CameraProcess, Supervisor, assign_cores
+
+# Benchmark constants
+TRACKER_ARGS = ['--stats-interval', '0', '--no-zones']
+BENCH_STALL_TIMEOUT = 8.0  # Trackers write a heartbeat every 5 s
+
+
+def run_cameras(directory, count, frames):
+    cameras = [CameraProcess(f"bench{index}", f"synthetic:{frames}", core, tracker_args=TRACKER_ARGS)
+               for index, core in enumerate(assign_cores(count))]
+    ring_path = os.path.join(directory, f'merged_{count}')
+    sup = Supervisor(cameras, ring_path=ring_path, store_path=None,
+                     health_path=os.path.join(directory, 'health.json'))
+    started = time.perf_counter()
+    sup.run()
+    elapsed = time.perf_counter() - started
+    reader = DetectionRingReader(ring_path, from_start=True)
+    merged = reader.last_seq + len(reader.read())
+    reader.close()
+    return cameras, elapsed, merged
+
+
+def frames_of(camera):
+    camera._read_heartbeat()
+    values = {metric['name']: metric.get('value') for metric in (camera.heartbeat or {}).get('metrics', [])}
+    return values.get('frames_total') or 0
+
+
+def isolation(directory):
+    supervisor.STALL_TIMEOUT = BENCH_STALL_TIMEOUT
+    cameras = [CameraProcess(f"bench{index}", 'synthetic:1000000', core, tracker_args=TRACKER_ARGS)
+               for index, core in enumerate(assign_cores(2))]
+    sup = Supervisor(cameras, ring_path=os.path.join(directory, 'merged_isolation'), store_path=None,
+                     health_path=os.path.join(directory, 'health.json'))
+    thread = threading.Thread(target=sup.run)
+    thread.start()
+    try:
+        frozen, healthy = cameras
+        deadline = time.time() + 60
+        while frozen.state != supervisor.RUNNING or healthy.state != supervisor.RUNNING:
+            if time.time() > deadline:
+                raise SystemExit("Trackers did not start")
+            time.sleep(0.5)
+
+        pid = frozen.process.pid
+        os.kill(pid, signal.SIGSTOP)
+        frozen_at = time.time()
+        before = frames_of(healthy)
+        while frozen.restarts == 0:
+            if time.time() - frozen_at > 60:
+                raise SystemExit("Frozen tracker was not restarted")
+            time.sleep(0.5)
+        recovered = time.time() - frozen_at
+        time.sleep(6)
+        after = frames_of(healthy)
+        print(f"froze {frozen.camera_id} (pid {pid}): restarted after {recovered:.1f} s "
+              f"(stall timeout {BENCH_STALL_TIMEOUT:.0f} s), state now {frozen.state}")
+        print(f"{healthy.camera_id} kept running: {after - before:.0f} frames while the other was frozen, "
+              f"state {healthy.state}, restarts {healthy.restarts}")
+        if after <= before or healthy.restarts:
+            raise SystemExit("The healthy camera was affected by the stall")
+    finally:
+        sup.stop()
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cameras', type=int, nargs='+',
+                        default=sorted({1, 2, os.cpu_count() or 1}), help='Camera counts to run')
+    parser.add_argument('--frames', type=int, default=600, help='Frames per synthetic camera')
+    parser.add_argument('--no-isolation', action='store_true', help='Skip the stall isolation test')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for count in args.cameras:
+            cameras, elapsed, merged = run_cameras(directory, count, args.frames)
+            failed = [camera.camera_id for camera in cameras if camera.state != supervisor.FINISHED]
+            if failed:
+                raise SystemExit(f"Cameras did not finish: {failed}")
+            fps = count * args.frames / elapsed
+            baseline = baseline or fps
+            print(f"{count:>2} camera(s)  {fps:7.1f} fps total  {fps / baseline:4.2f}x  "
+                  f"{merged} detections merged")
+        if not args.no_isolation:
+            isolation(directory)
+    print(f"({os.cpu_count()} CPU(s) available)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Multi-object tracker benchmark.
+
+Two checks:
+  - identity: runs the detector and tracker over the synthetic scenes, where
+    every blob's identity is known, and counts id switches (a blob's matched
+    detection changing track id) and how many tracks were created.
+  - cost: times MultiObjectTracker.update with 1..32 simultaneous objects.
+
+    python benchmarks/bench_tracker.py --frames 600 --repeat 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker import tracker as tracker_module
+from motion_tracker.detector import MotionDetector
+from motion_tracker.frame_sources import SyntheticSource
+from motion_tracker.tracker import MultiObjectTracker, iou_matrix, box_corners
+
+# Benchmark constants
+SCENES = {
+    'one_cat': {'n_blobs': 1, 'seed': 1},
+    'two_cats': {'n_blobs': 2, 'seed': 2},
+    'three_cats_noise': {'n_blobs': 3, 'seed': 6, 'noise': 5.0},
+}
+WARMUP_FRAMES = 60  # Frames skipped while MOG2 learns the background
+IOU_MATCH_THRESHOLD = 0.3
+OBJECT_COUNTS = [1, 2, 4, 8, 16, 32]
+FRAME_DT = 1.0 / 30
+
+
+def run_identity(name, frames):
+    """Count id switches per ground-truth blob over one synthetic scene"""
+    source = SyntheticSource(n_frames=frames, **SCENES[name])
+    detector = MotionDetector()
+    tracker = MultiObjectTracker()
+
+    last_track = {}
+    switches = matched = 0
+    index = 0
+    while True:
+        ret, frame = source.read()
+        if not ret:
+            break
+        _, detections = detector.process(frame)
+        tracker.update(detections, index * FRAME_DT)
+        truth = source.ground_truth
+        index += 1
+        if index <= WARMUP_FRAMES or not detections or not truth:
+            continue
+
+        overlap = iou_matrix(box_corners(truth), box_corners([d['bbox'] for d in detections]))
+        for blob, row in enumerate(overlap):
+            best = int(np.argmax(row))
+            if row[best] < IOU_MATCH_THRESHOLD:
+                continue
+            track_id = detections[best].get('track_id')
+            matched += 1
+            if blob in last_track and last_track[blob] != track_id:
+                switches += 1
+            last_track[blob] = track_id
+
+    return {'matched': matched, 'id_switches': switches,
+            'tracks_created': tracker.next_id - 1}
+
+
+def random_detections(rng, n, width=1280, height=720):
+    sizes = rng.integers(40, 120, (n, 2))
+    corners = rng.integers(0, [width - 120, height - 120], (n, 2))
+    return corners, sizes
+
+
+def time_update(n, repeat, seed):
+    """Mean update time with n objects drifting a few pixels per frame"""
+    rng = np.random.default_rng(seed)
+    corners, sizes = random_detections(rng, n)
+    velocity = rng.uniform(-5, 5, (n, 2))
+    tracker = MultiObjectTracker()
+
+    samples = []
+    for i in range(repeat):
+        corners = corners + velocity
+        detections = [{'x': int(x + w // 2), 'y': int(y + h // 2), 'bbox': [int(x), int(y), int(w), int(h)]}
+                      for (x, y), (w, h) in zip(corners, sizes)]
+        start = time.perf_counter()
+        tracker.update(detections, i * FRAME_DT)
+        samples.append(time.perf_counter() - start)
+    return float(np.mean(samples[repeat // 10:])) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=400, help='Frames per synthetic scene (0 to skip)')
+    parser.add_argument('--repeat', type=int, default=200, help='Updates timed per object count')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    assignment = 'scipy' if tracker_module.linear_sum_assignment is not None else 'greedy'
+    print(f"Assignment: {assignment}")
+
+    if args.frames:
+        print(f"{'scene':>18} {'matched':>8} {'switches':>9} {'tracks':>7}")
+        for name in SCENES:
+            result = run_identity(name, args.frames)
+            print(f"{name:>18} {result['matched']:>8} {result['id_switches']:>9} {result['tracks_created']:>7}")
+
+    print(f"{'objects':>8} {'update us':>10}")
+    for n in OBJECT_COUNTS:
+        print(f"{n:>8} {time_update(n, args.repeat, args.seed):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
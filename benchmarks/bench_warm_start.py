@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Background warm-start benchmark.
+
+Runs a synthetic yard (static scene, flicker, sensor noise, a noisier patch
+of foliage) through a MotionDetector for --learn frames with a background
+snapshot path, as a previous tracker session would, and saves the snapshot.
+Then restarts with a cat already sitting in view that gets up and walks
+off after --sit frames, once learning from scratch and once warm-started,
+and reports frames until the model is ready, frames until the cat is
+first published, wrong detections published, and the warm start's cost.
+Then restarts in front of a changed scene to check that a stale
+snapshot is rejected. Finally drags a zone to a new spot at the same size,
+as a hot-reloaded shapes.json would, and checks that nothing is published
+until the model of the new crop is ready.
+
+    python benchmarks/bench_warm_start.py --width 800 --height 600 --learn 600
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.background import BackgroundSnapshot
+from motion_tracker.detector import MotionDetector
+from motion_tracker.zones import ZoneSet
+
+
+class Yard:
+    """Synthetic camera: fixed scene with flicker and per-pixel noise, and an optional cat"""
+
+    def __init__(self, width, height, seed=0):
+        self.rng = np.random.default_rng(seed)
+        y, x = np.mgrid[0:height, 0:width]
+        scene = np.dstack([x * 255 // width, y * 255 // height, (x + y) * 200 // (width + height)]).astype(np.uint8)
+        for _ in range(12):
+            center = (int(self.rng.integers(0, width)), int(self.rng.integers(0, height)))
+            color = [int(v) for v in self.rng.integers(0, 255, 3)]
+            cv2.circle(scene, center, int(self.rng.integers(20, 90)), color, -1)
+        self.scene = scene.astype(np.float32)
+        self.noise = np.full(scene.shape, 4, dtype=np.float32)
+        self.noise[:height // 3, :width // 3] = 12  # Foliage moving in the wind
+        self.cat = self.rng.integers(10, 60, (height // 6, width // 6, 3)).astype(np.float32)
+        self.width = width
+
+    def frame(self, index, cat_x=None, cat_y=None):
+        frame = self.scene + 3 * np.sin(index / 9)
+        if cat_x is not None:
+            frame = frame.copy()
+            frame[cat_y:cat_y + self.cat.shape[0], cat_x:cat_x + self.cat.shape[1]] = self.cat
+        frame += self.rng.standard_normal(frame.shape, dtype=np.float32) * self.noise
+        return np.clip(frame, 0, 255).astype(np.uint8)
+
+    def cat_box(self, index, sit):
+        """Cat position: sitting for `sit` frames, then walking right"""
+        x = min(self.width // 3 + max(0, index - sit) * 4, self.width - self.cat.shape[1])
+        return x, self.cat.shape[0] * 2
+
+
+class MovableZone:
+    """Zone provider with one rectangular zone (percent of the frame) that can be dragged around"""
+
+    def __init__(self, x, y, width, height):
+        self.size = (width, height)
+        self.move(x, y)
+
+    def move(self, x, y):
+        width, height = self.size
+        points = [{'x': x, 'y': y}, {'x': x + width, 'y': y}, {'x': x + width, 'y': y + height},
+                  {'x': x, 'y': y + height}]
+        self.shapes = [{'id': 'zone', 'points': points, 'active': True}]
+        self._compiled = {}
+
+    def __call__(self, width, height):
+        if (width, height) not in self._compiled:
+            self._compiled[(width, height)] = ZoneSet(self.shapes, width, height)
+        return self._compiled[(width, height)]
+
+
+def restart(yard, frames, sit, path):
+    """One tracker start with the cat in view; what the tracker would publish"""
+    detector = MotionDetector(background_path=path)
+    start = time.perf_counter()
+    detector.working_view(yard.frame(0))  # The first frame sets up (and warm-starts) the model
+    setup = time.perf_counter() - start
+    first_hit = wrong = 0
+    for index in range(frames):
+        x, y = yard.cat_box(index, sit)
+        _, detections = detector.process(yard.frame(index, x, y))
+        if not detector.ready:
+            continue
+        for detection in detections:
+            bx, by, bw, bh = detection['bbox']
+            if bx < x + yard.cat.shape[1] and x < bx + bw and by < y + yard.cat.shape[0] and y < by + bh:
+                first_hit = first_hit or index + 1
+            else:
+                wrong += 1
+    return detector, setup, first_hit, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    parser.add_argument('--learn', type=int, default=450, help='Quiet frames seen by the previous session')
+    parser.add_argument('--frames', type=int, default=120, help='Frames after the restart')
+    parser.add_argument('--sit', type=int, default=40, help='Frames the cat sits still after the restart')
+    args = parser.parse_args()
+
+    yard = Yard(args.width, args.height)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'background.npz')
+
+        # Previous session: learns the empty yard and keeps its snapshot
+        detector = MotionDetector(background_path=path)
+        plain, upkeep = [], []
+        for index in range(args.learn):
+            frame = yard.frame(index)
+            samples = detector._snapshot.samples if detector._snapshot is not None else 0
+            start = time.perf_counter()
+            detector.process(frame)
+            elapsed = time.perf_counter() - start
+            (upkeep if detector._snapshot.samples > samples else plain).append(elapsed)
+        if not detector.save_background():
+            raise SystemExit(f"No snapshot written after {args.learn} frames ({detector._snapshot.samples} samples)")
+        snapshot = BackgroundSnapshot.load(path)
+        print(f"{args.width}x{args.height}: snapshot of {snapshot.samples} quiet samples, "
+              f"{os.path.getsize(path) / 1024:.0f} KiB; frames took {np.median(plain) * 1000:.1f} ms, "
+              f"{np.median(upkeep) * 1000:.1f} ms with a sample (one in {detector._last_sample // snapshot.samples})")
+
+        print(f"restart with the cat sitting in view for {args.sit} frames, then walking off:")
+        results = {}
+        for name, background in (('cold start', None), ('warm start', path)):
+            detector, setup, first_hit, wrong = restart(yard, args.frames, args.sit, background)
+            results[name] = detector, first_hit
+            print(f"  {name}: ready after {detector.ready_frames} frame(s), cat first published at frame "
+                  f"{first_hit or 'never'}, {wrong} wrong detection(s) published, setup {setup * 1000:.0f} ms")
+
+        warm, warm_hit = results['warm start']
+        if not warm.warm or warm.ready_frames > 2 or not warm_hit or warm_hit > 2:
+            raise SystemExit("Warm start did not make the first frames usable")
+
+        # A snapshot of another scene must not be trusted
+        moved = MotionDetector(background_path=path)
+        other = Yard(args.width, args.height, seed=1)
+        for index in range(3):
+            moved.process(other.frame(index))
+        print(f"restart in front of a changed scene: seeded {'and kept' if moved.warm else 'then rejected'}, "
+              f"ready={moved.ready}")
+        if moved.warm:
+            raise SystemExit("A snapshot of a different scene was kept")
+
+    # A zone dragged elsewhere at the same size: the old model must not score the new crop
+    zone = MovableZone(10, 30, 30, 40)
+    detector = MotionDetector(zone_provider=zone)
+    for index in range(args.learn):
+        detector.process(yard.frame(index))
+    roi = detector.roi
+    zone.move(55, 30)
+    published = 0
+    reset = None
+    for index in range(args.learn, args.learn + args.frames):
+        _, detections = detector.process(yard.frame(index))
+        if reset is None:
+            reset = not detector.ready
+        if detector.ready:
+            published += len(detections)
+    print(f"zone moved from {roi} to {detector.roi}: model {'reset' if reset else 'kept'}, ready again after "
+          f"{detector.ready_frames} frame(s), {published} detection(s) published in an empty yard")
+    if not reset or published:
+        raise SystemExit("Moving a zone kept the background model of its old position")
+
+
+if __name__ == '__main__':
+    main()
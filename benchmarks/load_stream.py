@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+MJPEG stream load test.
+
+Opens an increasing number of concurrent /api/camera/stream connections
+against a running backend and reports, per step: connections established,
+time to first frame, delivered frames/sec per client, and the server
+process's CPU usage (read from /proc when --pid is given). Run it once
+against app.py and once against async_app.py to compare the two servers.
+
+    python webapp/backend/app.py &          # or async_app.py
+    python benchmarks/load_stream.py --pid $! --label flask --steps 10 50 100 200 400
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+# Load test constants
+DEFAULT_URL = 'http://127.0.0.1:5002/api/camera/stream'
+DEFAULT_STEPS = [1, 10, 50, 100, 200]
+STEP_DURATION = 10.0  # Seconds each connection level is held
+CONNECT_TIMEOUT = 10.0
+BOUNDARY = b'--frame'
+
+
+def read_cpu_seconds(pid):
+    """User + system CPU seconds consumed by a process, or None if unavailable"""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class StreamStats:
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.frames = 0
+        self.first_frame_latencies = []
+
+
+async def stream_client(host, port, path, stats, stop):
+    """Hold one stream connection open, counting multipart frames"""
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+    except (OSError, asyncio.TimeoutError):
+        stats.failed += 1
+        return
+
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n'.encode())
+    await writer.drain()
+    stats.connected += 1
+
+    first = True
+    tail = b''
+    try:
+        while not stop.is_set():
+            data = await asyncio.wait_for(reader.read(65536), timeout=CONNECT_TIMEOUT)
+            if not data:
+                break
+            chunk = tail + data
+            count = chunk.count(BOUNDARY)
+            if count:
+                if first:
+                    stats.first_frame_latencies.append(time.perf_counter() - start)
+                    first = False
+                stats.frames += count
+            tail = chunk[-len(BOUNDARY):]
+    except (OSError, asyncio.TimeoutError):
+        stats.failed += 1
+    finally:
+        writer.close()
+
+
+async def run_step(host, port, path, connections, duration, pid):
+    stats = StreamStats()
+    stop = asyncio.Event()
+    cpu_before = read_cpu_seconds(pid) if pid else None
+    started = time.perf_counter()
+
+    tasks = [asyncio.create_task(stream_client(host, port, path, stats, stop)) for _ in range(connections)]
+    await asyncio.sleep(duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    cpu_after = read_cpu_seconds(pid) if pid else None
+    latencies = sorted(stats.first_frame_latencies)
+    result = {
+        'connections': connections,
+        'connected': stats.connected,
+        'failed': stats.failed,
+        'fps_per_client': round(stats.frames / elapsed / max(stats.connected, 1), 2),
+        'first_frame_p50_ms': round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+        'first_frame_max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+    }
+    if cpu_before is not None and cpu_after is not None:
+        result['server_cpu_percent'] = round((cpu_after - cpu_before) / elapsed * 100, 1)
+    return result
+
+
+async def main_async(args):
+    from urllib.parse import urlparse
+    url = urlparse(args.url)
+    results = []
+    print(f"{'conns':>6} {'ok':>6} {'fail':>5} {'fps/client':>11} {'first p50 ms':>13} {'first max ms':>13} {'cpu %':>7}")
+    for connections in args.steps:
+        result = await run_step(url.hostname, url.port or 80, url.path, connections, args.duration, args.pid)
+        results.append(result)
+        print(f"{result['connections']:>6} {result['connected']:>6} {result['failed']:>5} "
+              f"{result['fps_per_client']:>11} {str(result['first_frame_p50_ms']):>13} "
+              f"{str(result['first_frame_max_ms']):>13} {str(result.get('server_cpu_percent', '-')):>7}")
+        await asyncio.sleep(1.0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--steps', type=int, nargs='+', default=DEFAULT_STEPS, help='Concurrent connections per step')
+    parser.add_argument('--duration', type=float, default=STEP_DURATION, help='Seconds per step')
+    parser.add_argument('--pid', type=int, help='Server process id, for CPU measurement')
+    parser.add_argument('--label', default='server', help='Name stored with the results')
+    parser.add_argument('--output', help='Write results JSON to this path')
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'label': args.label, 'url': args.url, 'results': results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
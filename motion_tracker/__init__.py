@@ -0,0 +1 @@
+"""Motion tracking library shared by the tracker, viewer and sprayer scripts"""
@@ -0,0 +1,125 @@
+"""
+Spray actuator backends.
+
+An actuator turns the sprayer on for a burst without blocking the caller:
+fire() switches the output on immediately and a timer switches it off, so
+the daemon can go straight back to waiting for detections. fire() returns
+the time the output actually changed, which is what the latency histograms
+measure against.
+"""
+
+import threading
+import time
+
+# Actuator constants
+DEFAULT_GPIO_PIN = 18  # BCM numbering
+DEFAULT_BURST = 0.3  # Seconds the valve stays open per burst
+
+
+class Actuator:
+    """Base class: subclasses implement _on() and _off()"""
+
+    name = 'actuator'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+        self.bursts = 0
+
+    def _on(self):
+        raise NotImplementedError
+
+    def _off(self):
+        raise NotImplementedError
+
+    def fire(self, duration=DEFAULT_BURST, target=None):
+        """Start a burst (extending one in progress) and return when the output switched on"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._on()
+            fired_at = time.time()
+            self.bursts += 1
+            self._timer = threading.Timer(duration, self._finish, args=(self.bursts,))
+            self._timer.daemon = True
+            self._timer.start()
+        return fired_at
+
+    def _finish(self, burst):
+        with self._lock:
+            # cancel() can't stop a timer already waiting for the lock; a newer burst owns the output then
+            if burst != self.bursts:
+                return
+            self._off()
+            self._timer = None
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._off()
+
+
+class StubActuator(Actuator):
+    """Prints bursts instead of driving hardware; used for tests and dry runs"""
+
+    name = 'stub'
+
+    def __init__(self, verbose=True):
+        super().__init__()
+        self.verbose = verbose
+        self.active = False
+
+    def _on(self):
+        self.active = True
+
+    def _off(self):
+        self.active = False
+
+    def fire(self, duration=DEFAULT_BURST, target=None):
+        fired_at = super().fire(duration, target)
+        if self.verbose:
+            print(f"[stub] spray {duration:.2f}s at {target}")
+        return fired_at
+
+
+class GpioActuator(Actuator):
+    """Drives a relay/valve on a Raspberry Pi GPIO pin (requires RPi.GPIO)"""
+
+    name = 'gpio'
+
+    def __init__(self, pin=DEFAULT_GPIO_PIN, active_high=True):
+        try:
+            import RPi.GPIO as GPIO
+        except ImportError:
+            raise RuntimeError("GPIO actuator requires RPi.GPIO (pip install RPi.GPIO)")
+        super().__init__()
+        self.GPIO = GPIO
+        self.pin = pin
+        self.on_level = GPIO.HIGH if active_high else GPIO.LOW
+        self.off_level = GPIO.LOW if active_high else GPIO.HIGH
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(pin, GPIO.OUT, initial=self.off_level)
+
+    def _on(self):
+        self.GPIO.output(self.pin, self.on_level)
+
+    def _off(self):
+        self.GPIO.output(self.pin, self.off_level)
+
+    def close(self):
+        super().close()
+        self.GPIO.cleanup(self.pin)
+
+
+ACTUATORS = {
+    'stub': StubActuator,
+    'gpio': GpioActuator,
+}
+
+
+def create_actuator(kind, **kwargs):
+    if kind not in ACTUATORS:
+        raise ValueError(f"Unknown actuator: {kind}")
+    return ACTUATORS[kind](**kwargs)
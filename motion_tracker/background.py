@@ -0,0 +1,105 @@
+"""
+Background-model snapshots for warm-starting the motion detector.
+
+OpenCV's MOG2 doesn't expose its per-pixel mixtures (save() and write()
+only keep the parameters), so a restarted tracker used to learn the scene
+from nothing and had to sit out its first few seconds. A BackgroundSnapshot
+keeps what a model can be rebuilt from: MOG2's own background image and a
+per-pixel spread, a moving average of the squared difference between quiet
+frames (no detections) and that image. The detector writes it next to the
+detection ring (tmpfs, so it survives restarts without wearing the SD card)
+every BACKGROUND_SAVE_INTERVAL seconds and at exit, by temp file and rename.
+On startup seed_frames() turns it back into synthetic frames, the
+background plus noise of the stored spread, which a fresh MOG2 learns in a
+fraction of a second; see MotionDetector.warm_start().
+"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+from motion_tracker.detection_ring import default_ring_path
+
+# Snapshot constants
+BACKGROUND_NAME = 'cat_tracker_background.npz'
+BACKGROUND_SAVE_INTERVAL = 60.0  # Seconds between snapshot writes
+BACKGROUND_SAMPLE_STRIDE = 30  # Frames between quiet frames folded into the spread
+SPREAD_WEIGHT = 0.05  # Weight of each new sample in the spread's moving average
+MIN_SPREAD_SAMPLES = 10  # Samples before a snapshot is worth writing
+BACKGROUND_MAX_AGE = 6 * 3600  # Seconds; older snapshots are ignored since the light will have changed
+SEED_FRAMES = 16  # Synthetic frames a warm start feeds to MOG2
+
+
+def background_path(camera_id=None):
+    """Snapshot path, one per camera when several trackers run"""
+    return default_ring_path(f"cat_tracker_background.{camera_id}.npz" if camera_id else BACKGROUND_NAME)
+
+
+class BackgroundSnapshot:
+    """Background image and per-pixel spread of one working view (roi scaled to size)"""
+
+    def __init__(self, roi, size):
+        self.roi = tuple(int(v) for v in roi)
+        self.size = tuple(int(v) for v in size)
+        self.background = None
+        self.variance = None
+        self.samples = 0
+
+    def fits(self, roi, size):
+        """Whether the snapshot was taken of this working view"""
+        return self.roi == tuple(int(v) for v in roi) and self.size == tuple(int(v) for v in size)
+
+    def add(self, view, background):
+        """Fold a quiet working-view frame into the spread around MOG2's background image"""
+        diff = cv2.subtract(view, background, dtype=cv2.CV_32F)
+        squared = cv2.multiply(diff, diff)
+        if self.variance is None or self.variance.shape != squared.shape:
+            self.variance = squared
+            self.samples = 0
+        else:
+            cv2.accumulateWeighted(squared, self.variance, SPREAD_WEIGHT)
+        self.background = background
+        self.samples += 1
+
+    def save(self, path):
+        """Atomically replace the snapshot file; returns False if the write failed"""
+        temp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, 'wb') as f:
+                np.savez(f, background=self.background, spread=cv2.convertScaleAbs(np.sqrt(self.variance)),
+                         roi=np.array(self.roi), size=np.array(self.size), samples=self.samples, time=time.time())
+            os.replace(temp, path)
+            return True
+        except Exception as e:
+            print(f"Error saving background snapshot: {e}")
+            return False
+
+    @classmethod
+    def load(cls, path, max_age=BACKGROUND_MAX_AGE):
+        """The stored snapshot, or None if it is missing, unreadable or older than max_age seconds"""
+        try:
+            with np.load(path) as data:
+                if time.time() - float(data['time']) > max_age:
+                    return None
+                snapshot = cls(data['roi'], data['size'])
+                snapshot.background = data['background']
+                snapshot.variance = np.square(data['spread'].astype(np.float32))
+                snapshot.samples = int(data['samples'])
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error loading background snapshot: {e}")
+            return None
+        return snapshot
+
+    def seed_frames(self, count=SEED_FRAMES):
+        """Synthetic frames with the background's mean and per-pixel spread"""
+        background = self.background.astype(np.float32)
+        spread = np.sqrt(self.variance)
+        noise = np.empty_like(background)
+        channels = background.shape[2] if background.ndim == 3 else 1
+        for _ in range(count):
+            cv2.randn(noise, (0,) * channels, (1,) * channels)
+            yield np.clip(background + noise * spread, 0, 255).astype(np.uint8)
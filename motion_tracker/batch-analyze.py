@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.batch import OUTPUT_FILE, SHARD_SECONDS, WARMUP_FRAMES, analyze
+from motion_tracker.detector import DOWNSCALE, MASK_MODE, MASK_MODES
+from motion_tracker.tracker import PREDICTION_LEAD
+from motion_tracker.zones import load_shapes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find motion in recorded footage using every core")
+    parser.add_argument('videos', nargs='+', help='Video files to analyze')
+    parser.add_argument('--output', default=OUTPUT_FILE,
+                        help='Merged, time-ordered JSON-lines detections')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Worker processes (default: one per core)')
+    parser.add_argument('--shard-seconds', type=float, default=SHARD_SECONDS,
+                        help='Seconds of video per shard')
+    parser.add_argument('--warmup', type=int, default=WARMUP_FRAMES,
+                        help='Frames before each shard used only to train the background model')
+    parser.add_argument('--shapes', help='shapes.json whose active zones limit where motion is reported')
+    parser.add_argument('--downscale', type=float, default=DOWNSCALE,
+                        help='Process frames at 1/N resolution (boxes are reported at full resolution)')
+    parser.add_argument('--mask-mode', choices=MASK_MODES, default=MASK_MODE,
+                        help='Mask cleanup: exact elliptical closings, or one cheaper rectangular closing')
+    parser.add_argument('--lead-time', type=float, default=PREDICTION_LEAD,
+                        help='Seconds ahead to report each track\'s predicted position')
+    parser.add_argument('--start-time', type=float,
+                        help='Epoch time of the first frame (default: file modification time minus duration)')
+    args = parser.parse_args()
+
+    for path in args.videos:
+        if not os.path.isfile(path):
+            exit(f"Error: No such video {path}")
+
+    stats = analyze(
+        args.videos, output=args.output, workers=args.workers, shard_seconds=args.shard_seconds,
+        warmup=args.warmup, detector_options={'downscale': args.downscale, 'mask_mode': args.mask_mode},
+        shapes_data=load_shapes(args.shapes) if args.shapes else None,
+        start_time=args.start_time, lead_time=args.lead_time,
+    )
+    print(f"{stats['records']} detections from {stats['frames']} frames written to {args.output}")
+    print(f"Throughput: {stats['fps']:.1f} frames/sec overall, {stats['worker_fps']:.1f} frames/sec "
+          f"per worker, {stats['decoded_frames'] - stats['frames']} warm-up frames "
+          f"({stats['seconds']:.1f} s)")
@@ -0,0 +1,216 @@
+"""
+Offline batch analysis of recorded footage.
+
+Each video is split into fixed-length time shards that are processed
+independently in a process pool. A fresh MOG2 model knows nothing about
+the scene, so every shard starts decoding `warmup` frames before its own
+range and feeds them to the detector without reporting anything; by the
+first frame it owns, its background model looks like one that had been
+running since the start of the file. A video's first shard has nothing
+before it, so it learns its own first `warmup` frames and then rewinds,
+and no shard reports detections before its model is ready.
+
+Workers return only the frames that produced detections. The parent merges
+them in video-time order, runs the tracker over each video so track ids
+are continuous across shard boundaries, and writes one JSON-lines file in
+the same record format as the live detection log, plus the video path,
+frame index and offset into the video.
+"""
+
+import heapq
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from motion_tracker.detector import HISTORY, MotionDetector
+from motion_tracker.tracker import MultiObjectTracker, PREDICTION_LEAD
+from motion_tracker.zones import StaticZones
+
+# Batch constants
+SHARD_SECONDS = 60.0  # Video time per shard
+WARMUP_FRAMES = HISTORY  # Frames decoded before each shard so MOG2 has a background
+DEFAULT_FPS = 30.0  # Used when a file does not report its frame rate
+OUTPUT_FILE = 'detections.jsonl'
+
+
+class Shard:
+    """Frames [start, end) of one video, decoded from warm_start"""
+
+    def __init__(self, video_index, path, start, end, warm_start):
+        self.video_index = video_index
+        self.path = path
+        self.start = start
+        self.end = end
+        self.warm_start = warm_start
+
+    def __repr__(self):
+        return f"{os.path.basename(self.path)}[{self.start}:{self.end}]"
+
+
+def probe_video(path):
+    """(frame count, fps) of a video file"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video {path}")
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+        if frames <= 0:
+            # Some containers don't report a length; count by decoding
+            frames = 0
+            while cap.grab():
+                frames += 1
+        return frames, fps
+    finally:
+        cap.release()
+
+
+def plan_shards(paths, shard_seconds=SHARD_SECONDS, warmup=WARMUP_FRAMES):
+    """Split every video into shards; returns (shards, {video_index: (frames, fps)})"""
+    shards = []
+    videos = {}
+    for video_index, path in enumerate(paths):
+        frames, fps = probe_video(path)
+        videos[video_index] = (frames, fps)
+        length = max(1, int(round(shard_seconds * fps)))
+        for start in range(0, frames, length):
+            shards.append(Shard(video_index, path, start, min(start + length, frames),
+                                max(0, start - warmup)))
+    return shards, videos
+
+
+def _init_worker():
+    # One process per core already; OpenCV's own threads would only fight over them
+    cv2.setNumThreads(1)
+
+
+def run_shard(shard, detector_options=None, shapes_data=None, warmup=WARMUP_FRAMES):
+    """Detect motion in one shard; returns (shard, [(frame, detections)], frames decoded, seconds)"""
+    started = time.perf_counter()
+    zone_provider = StaticZones(shapes_data) if shapes_data else None
+    detector = MotionDetector(zone_provider=zone_provider, verbose=False, **(detector_options or {}))
+
+    results = []
+    decoded = 0
+    if shard.warm_start == shard.start and warmup:
+        # Nothing before this shard to learn from: learn its own first frames, then start over
+        cap = cv2.VideoCapture(shard.path)
+        try:
+            if shard.start:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, shard.start)
+            for _ in range(min(warmup, shard.end - shard.start)):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                decoded += 1
+                detector.process(frame)
+        finally:
+            cap.release()
+
+    cap = cv2.VideoCapture(shard.path)
+    if shard.warm_start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, shard.warm_start)
+
+    index = shard.warm_start
+    try:
+        while index < shard.end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            decoded += 1
+            _, detections = detector.process(frame)
+            # An unconverged model reports most of the frame as motion
+            if index >= shard.start and detections and detector.ready:
+                frame_size = [frame.shape[1], frame.shape[0]]
+                for detection in detections:
+                    detection['frame_size'] = frame_size
+                results.append((index, detections))
+            index += 1
+    finally:
+        cap.release()
+    return shard, results, decoded, time.perf_counter() - started
+
+
+def recording_start(path, frames, fps):
+    """Wall-clock time of a video's first frame, assuming the file was closed when recording ended"""
+    return os.path.getmtime(path) - frames / fps
+
+
+def track_video(path, frame_results, fps, start_time, lead_time=PREDICTION_LEAD):
+    """Yield time-ordered records for one video, with track ids from a single tracker"""
+    tracker = MultiObjectTracker(lead_time=lead_time)
+    by_frame = dict(frame_results)
+    previous = None
+    for index in sorted(by_frame):
+        # Tracks are only aged through empty frames while any exist
+        if previous is not None and len(tracker):
+            for empty in range(previous + 1, min(index, previous + 1 + tracker.max_misses + 1)):
+                tracker.update([], empty / fps)
+                if not len(tracker):
+                    break
+        previous = index
+
+        detections = tracker.update(by_frame[index], index / fps)
+        for detection in detections:
+            detection['timestamp'] = round(start_time + index / fps, 3)
+            detection['video'] = path
+            detection['frame'] = index
+            detection['video_time'] = round(index / fps, 3)
+            yield detection
+
+
+def analyze(paths, output=OUTPUT_FILE, workers=None, shard_seconds=SHARD_SECONDS,
+            warmup=WARMUP_FRAMES, detector_options=None, shapes_data=None,
+            start_time=None, lead_time=PREDICTION_LEAD, progress=True):
+    """Run the sharded analysis and write the merged detections; returns a stats dict
+
+    start_time is the wall-clock time of every video's first frame; by
+    default it is worked out from each file's modification time.
+    """
+    wall_start = time.perf_counter()
+    shards, videos = plan_shards(paths, shard_seconds, warmup)
+    total_frames = sum(frames for frames, _ in videos.values())
+    if progress:
+        print(f"{len(paths)} video(s), {total_frames} frames in {len(shards)} shards, "
+              f"{workers or os.cpu_count()} workers")
+
+    per_video = {video_index: [] for video_index in videos}
+    decoded = 0
+    busy = 0.0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(run_shard, shard, detector_options, shapes_data, warmup) for shard in shards]
+        for done, future in enumerate(as_completed(futures), 1):
+            shard, results, shard_decoded, seconds = future.result()
+            per_video[shard.video_index].extend(results)
+            decoded += shard_decoded
+            busy += seconds
+            if progress:
+                print(f"[{done}/{len(shards)}] {shard}: {len(results)} frames with motion, "
+                      f"{shard_decoded / seconds:.1f} fps")
+
+    streams = []
+    for video_index, path in enumerate(paths):
+        frames, fps = videos[video_index]
+        start = recording_start(path, frames, fps) if start_time is None else start_time
+        streams.append(track_video(path, per_video[video_index], fps, start, lead_time))
+
+    records = 0
+    with open(output, 'w') as f:
+        for record in heapq.merge(*streams, key=lambda r: r['timestamp']):
+            f.write(json.dumps(record) + '\n')
+            records += 1
+
+    wall = time.perf_counter() - wall_start
+    return {
+        'videos': len(paths),
+        'shards': len(shards),
+        'frames': total_frames,
+        'decoded_frames': decoded,  # Includes warm-up overlap
+        'records': records,
+        'seconds': wall,
+        'fps': total_frames / wall if wall > 0 else 0.0,
+        'worker_fps': decoded / busy if busy > 0 else 0.0,
+    }
@@ -0,0 +1,136 @@
+"""
+Vectorized bounding box merging.
+
+Produces exactly the same groups as the original greedy merge in
+cat-tracker.py: boxes are seeded in input order and each group absorbs
+every unused box that is close to the group's current bounding box, pass
+after pass, until nothing more joins. The per-box scalar tests are replaced
+by one NumPy comparison per pass. An optional recursive x/y sweep can first
+split the boxes into independent clusters so far-apart boxes are never
+compared, but on realistic frames (bench_box_merge.py, up to a few thousand
+boxes) its sorting and per-cluster overhead costs more than it saves, so it
+is off by default.
+"""
+
+import numpy as np
+
+# Below this many boxes the sweep pre-pass is skipped even when requested
+SWEEP_MIN_BOXES = 64
+
+
+def _merge_gap_bound(distance_threshold):
+    """Smallest per-axis gap that makes two boxes impossible to merge
+
+    Center distance < threshold implies a gap < threshold on each axis,
+    gap tests use threshold // 2, and overlap implies a gap of zero.
+    """
+    return max(distance_threshold, 1)
+
+
+def _split_axis(boxes, indices, axis, gap_bound):
+    """Split indices into runs separated by at least gap_bound along one axis"""
+    lo = boxes[indices, axis]
+    hi = boxes[indices, axis + 2]
+    order = np.argsort(lo, kind='stable')
+    reach = np.maximum.accumulate(hi[order])
+    breaks = np.flatnonzero(lo[order][1:] - reach[:-1] >= gap_bound) + 1
+    return np.split(indices[order], breaks)
+
+
+def split_independent_clusters(boxes, distance_threshold):
+    """Partition box indices into clusters that can never merge with each other"""
+    indices = np.arange(len(boxes))
+
+    # The gap bound relies on well-formed boxes; otherwise compare everything
+    if np.any(boxes[:, 2] < boxes[:, 0]) or np.any(boxes[:, 3] < boxes[:, 1]):
+        return [indices]
+
+    gap_bound = _merge_gap_bound(distance_threshold)
+    clusters = []
+    pending = [(indices, 0, False)]
+    while pending:
+        cluster, axis, other_axis_done = pending.pop()
+        parts = _split_axis(boxes, cluster, axis, gap_bound)
+        if len(parts) == 1:
+            if other_axis_done:
+                clusters.append(np.sort(cluster))
+            else:
+                pending.append((cluster, 1 - axis, True))
+            continue
+        for part in parts:
+            pending.append((part, 1 - axis, False))
+    return clusters
+
+
+def _greedy_merge(boxes, distance_threshold):
+    """Vectorized version of the seed-and-grow merge; returns (seed, box) pairs"""
+    unused = np.ones(len(boxes), dtype=bool)
+    half_threshold = distance_threshold // 2
+    groups = []
+
+    for seed in range(len(boxes)):
+        if not unused[seed]:
+            continue
+        unused[seed] = False
+        gx1, gy1, gx2, gy2 = boxes[seed]
+
+        while True:
+            candidates = np.flatnonzero(unused)
+            if candidates.size == 0:
+                break
+            cand = boxes[candidates]
+            bx1, by1, bx2, by2 = cand[:, 0], cand[:, 1], cand[:, 2], cand[:, 3]
+
+            dx = (gx1 + gx2) // 2 - (bx1 + bx2) // 2
+            dy = (gy1 + gy2) // 2 - (by1 + by2) // 2
+            close = np.sqrt(dx * dx + dy * dy) < distance_threshold
+
+            overlap_x = np.minimum(gx2, bx2) - np.maximum(gx1, bx1)
+            overlap_y = np.minimum(gy2, by2) - np.maximum(gy1, by1)
+            close |= (overlap_x > 0) & (overlap_y > 0)
+
+            x_gap = np.maximum(0, np.maximum(gx1, bx1) - np.minimum(gx2, bx2))
+            y_gap = np.maximum(0, np.maximum(gy1, by1) - np.minimum(gy2, by2))
+            close |= (x_gap < half_threshold) & (y_gap < half_threshold)
+
+            if not close.any():
+                break
+
+            members = candidates[close]
+            unused[members] = False
+            joined = boxes[members]
+            gx1 = min(gx1, joined[:, 0].min())
+            gy1 = min(gy1, joined[:, 1].min())
+            gx2 = max(gx2, joined[:, 2].max())
+            gy2 = max(gy2, joined[:, 3].max())
+
+        groups.append((seed, [gx1, gy1, gx2, gy2]))
+    return groups
+
+
+def merge_boxes(boxes, distance_threshold, use_sweep=False):
+    """Merge [x1, y1, x2, y2] boxes that are close to each other
+
+    Returns merged boxes as lists of ints, in the same order and with the
+    same extents as the original greedy merge.
+    """
+    if len(boxes) == 0:
+        return []
+
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    if len(boxes) == 1:
+        return [[int(v) for v in boxes[0]]]
+
+    if use_sweep and len(boxes) >= SWEEP_MIN_BOXES:
+        clusters = split_independent_clusters(boxes, distance_threshold)
+    else:
+        clusters = [np.arange(len(boxes))]
+
+    merged = []
+    for cluster in clusters:
+        for seed, box in _greedy_merge(boxes[cluster], distance_threshold):
+            merged.append((cluster[seed], box))
+
+    # Groups come out in the order their seed box appeared in the input
+    merged.sort(key=lambda item: item[0])
+    return [[int(v) for v in box] for _, box in merged]
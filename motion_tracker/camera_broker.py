@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Single-capture camera broker.
+
+One broker process owns the camera, captures each frame once and publishes
+it into a small ring of frame slots in an mmap-backed file on tmpfs. Any
+number of clients (the tracker, the marker viewer, the Flask streamer) map
+the same file read-only and get the latest frame without a second
+VideoCapture. Frames are copied out of their slot by default, since the
+broker reuses a slot after DEFAULT_SLOTS newer frames; a client that is
+done with a frame right away can ask for copy=False and get a NumPy view
+of the slot instead. Each slot carries a sequence stamp that is
+cleared while the frame is being written, like the detection ring. A
+restarted broker creates a fresh file, so old mappings never shrink under a
+client; clients notice the new inode and re-map.
+
+    python motion_tracker/camera_broker.py --source camera:0 --width 800 --height 600
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.detection_ring import default_ring_path
+
+# Broker layout constants
+BROKER_MAGIC = b'CTFB'
+BROKER_VERSION = 1
+DEFAULT_BROKER_NAME = 'cat_tracker_camera'
+DEFAULT_SLOTS = 8  # A view stays valid until this many newer frames have been captured
+
+# Client timing constants
+READ_POLL_INTERVAL = 0.001  # Seconds between checks while waiting for a new frame
+READ_TIMEOUT = 5.0  # Seconds without a new frame before read() reports failure
+RESTART_CHECK_INTERVAL = 0.5  # Seconds between checks for a restarted broker
+
+# Header: magic, version, width, height, channels, slots, generation, latest seq (padded to 64 bytes)
+HEADER_STRUCT = struct.Struct('<4sIIIIIQQ')
+HEADER_SIZE = 64
+LATEST_SEQ_OFFSET = 32
+# Slot header: sequence stamp, capture timestamp (padded to 64 bytes so frames stay aligned)
+SLOT_STRUCT = struct.Struct('<Qd')
+SLOT_HEADER_SIZE = 64
+STAMP_STRUCT = struct.Struct('<Q')
+
+
+def broker_path(name=DEFAULT_BROKER_NAME):
+    return default_ring_path(name)
+
+
+def _slot_size(frame_bytes):
+    return SLOT_HEADER_SIZE + ((frame_bytes + 63) // 64) * 64
+
+
+class FrameBrokerWriter:
+    """Publishes frames of a fixed size into the shared slots"""
+
+    def __init__(self, width, height, channels=3, slots=DEFAULT_SLOTS, path=None):
+        self.path = path or broker_path()
+        self.shape = (height, width, channels)
+        self.slots = slots
+        self.seq = 0
+
+        frame_bytes = width * height * channels
+        self.slot_size = _slot_size(frame_bytes)
+        size = HEADER_SIZE + slots * self.slot_size
+
+        # Replace rather than resize the file so existing client mappings stay valid
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        self._frames = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=self._map,
+                       offset=HEADER_SIZE + i * self.slot_size + SLOT_HEADER_SIZE)
+            for i in range(slots)
+        ]
+        HEADER_STRUCT.pack_into(self._map, 0, BROKER_MAGIC, BROKER_VERSION, width, height,
+                                channels, slots, time.time_ns(), 0)
+
+    def write(self, frame, capture_time=None):
+        """Copy one frame into the next slot and publish it"""
+        self.seq += 1
+        slot = (self.seq - 1) % self.slots
+        offset = HEADER_SIZE + slot * self.slot_size
+
+        STAMP_STRUCT.pack_into(self._map, offset, 0)
+        np.copyto(self._frames[slot], frame)
+        SLOT_STRUCT.pack_into(self._map, offset, self.seq,
+                              capture_time if capture_time is not None else time.time())
+        STAMP_STRUCT.pack_into(self._map, LATEST_SEQ_OFFSET, self.seq)
+        return self.seq
+
+    def close(self):
+        self._frames = []
+        self._map.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SharedFrameClient:
+    """Frame source that reads the broker's latest frame without opening the camera
+
+    With copy=False frames are views into the broker's slots, overwritten
+    once DEFAULT_SLOTS newer frames have been captured (see still_valid()).
+    """
+
+    live = True
+
+    def __init__(self, path=None, copy=True):
+        self.path = path or broker_path()
+        self.copy = copy
+        self.last_seq = 0
+        self.capture_time = None
+        self._map = None
+        self._next_restart_check = 0.0
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            st = os.fstat(fd)
+            self.inode = st.st_ino
+            self._map = mmap.mmap(fd, st.st_size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        magic, version, width, height, channels, slots, _, _ = HEADER_STRUCT.unpack_from(self._map, 0)
+        if magic != BROKER_MAGIC or version != BROKER_VERSION:
+            self._map.close()
+            self._map = None
+            raise ValueError(f"Unsupported camera broker format in {self.path}")
+
+        self.width, self.height = width, height
+        self.shape = (height, width, channels)
+        self.slots = slots
+        self.slot_size = _slot_size(width * height * channels)
+        self._frames = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=self._map,
+                       offset=HEADER_SIZE + i * self.slot_size + SLOT_HEADER_SIZE)
+            for i in range(slots)
+        ]
+        self.last_seq = 0
+
+    def _check_restart(self):
+        """Re-map the file if the broker restarted (possibly with a new frame size)"""
+        now = time.monotonic()
+        if now < self._next_restart_check:
+            return
+        self._next_restart_check = now + RESTART_CHECK_INTERVAL
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return
+        if inode != self.inode:
+            # Drop (not close) the old mapping; frames handed out may still reference it
+            self._frames = []
+            self._map = None
+            try:
+                self._open()
+            except ValueError:
+                # New file not initialised yet; keep waiting
+                self._map = None
+                self.inode = None
+
+    def _latest_seq(self):
+        return STAMP_STRUCT.unpack_from(self._map, LATEST_SEQ_OFFSET)[0]
+
+    def isOpened(self):
+        return self._map is not None
+
+    def latest(self, copy=None):
+        """Return (ret, frame) for the newest frame, even if it was returned before"""
+        copy = self.copy if copy is None else copy
+        self._check_restart()
+        if self._map is None:
+            return False, None
+        for _ in range(3):
+            seq = self._latest_seq()
+            if seq == 0:
+                return False, None
+            offset = HEADER_SIZE + ((seq - 1) % self.slots) * self.slot_size
+            stamp, capture_time = SLOT_STRUCT.unpack_from(self._map, offset)
+            if stamp != seq:
+                continue
+            frame = self._frames[(seq - 1) % self.slots]
+            if copy:
+                frame = frame.copy()
+                # The broker may have lapped us during the copy
+                if STAMP_STRUCT.unpack_from(self._map, offset)[0] != seq:
+                    continue
+            self.last_seq = seq
+            self.capture_time = capture_time
+            return True, frame
+        return False, None
+
+    def read(self, timeout=READ_TIMEOUT):
+        """Wait for a frame newer than the last one returned"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._map is not None and self._latest_seq() > self.last_seq:
+                ret, frame = self.latest()
+                if ret:
+                    return ret, frame
+            if time.monotonic() >= deadline:
+                return False, None
+            self._check_restart()
+            time.sleep(READ_POLL_INTERVAL)
+
+    def still_valid(self, seq=None):
+        """Whether the slot of the last returned (or given) frame has not been overwritten"""
+        seq = self.last_seq if seq is None else seq
+        offset = HEADER_SIZE + ((seq - 1) % self.slots) * self.slot_size
+        return STAMP_STRUCT.unpack_from(self._map, offset)[0] == seq
+
+    def release(self):
+        if self._map is not None:
+            self._frames = []
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # Caller still holds frame views; the mapping closes when they are freed
+            self._map = None
+
+
+def broker_available(path=None):
+    """True if a broker has published at least one frame at path"""
+    try:
+        client = SharedFrameClient(path)
+    except (FileNotFoundError, ValueError):
+        return False
+    try:
+        return client._latest_seq() > 0
+    finally:
+        client.release()
+
+
+def run_broker(source, width=None, height=None, slots=DEFAULT_SLOTS, path=None):
+    """Capture from source forever, publishing every frame to the shared slots"""
+    ret, frame = source.read()
+    capture_time = time.time()
+    if not ret:
+        exit("Error: Could not read from camera")
+
+    if width and height:
+        frame = cv2.resize(frame, (width, height))
+    height, width = frame.shape[:2]
+    writer = FrameBrokerWriter(width, height, frame.shape[2], slots, path)
+    print(f"Camera broker publishing {width}x{height} frames to {writer.path}")
+
+    try:
+        while ret:
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height))
+            writer.write(frame, capture_time)
+            ret, frame = source.read()
+            capture_time = time.time()
+    except KeyboardInterrupt:
+        print("Stopping camera broker...")
+    finally:
+        writer.close()
+        source.release()
+
+
+if __name__ == "__main__":
+    from motion_tracker.frame_sources import open_source
+
+    parser = argparse.ArgumentParser(description="Share one camera capture with every local consumer")
+    parser.add_argument('--source', default='camera:0', help='Frame source spec (see frame_sources.open_source)')
+    parser.add_argument('--width', type=int, help='Publish frames resized to this width')
+    parser.add_argument('--height', type=int, help='Publish frames resized to this height')
+    parser.add_argument('--slots', type=int, default=DEFAULT_SLOTS, help='Frame slots in the shared ring')
+    args = parser.parse_args()
+
+    try:
+        source = open_source(args.source)
+    except ValueError as e:
+        parser.error(str(e))
+    if not source.isOpened():
+        exit(f"Error: Could not open source {args.source}")
+    run_broker(source, args.width, args.height, args.slots)
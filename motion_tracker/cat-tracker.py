@@ -1,215 +1,292 @@
+import argparse
 import cv2
-import numpy as np
 import os
-import json
+import sys
 import time
 
-# Adjusted sensitivity parameters
-MOTION_THRESHOLD = 50  # Higher = less sensitive to small movements
-PROXIMITY_THRESHOLD = 100  # Distance threshold for merging boxes
-PROXIMITY = 15  # Morphological closing kernel size (smaller = less aggressive merging)
-HISTORY = 200  # Number of frames to build background model
-MIN_CONTOUR_AREA = 2000  # Minimum area for valid detection (increased)
-
-def convert_numpy_types(obj):
-    """Convert numpy types to native Python types for JSON serialization"""
-    if isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, dict):
-        return {key: convert_numpy_types(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy_types(item) for item in obj]
-    return obj
-
-def write_to_queue(data, queue_file="position_queue.txt"):
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.background import background_path
+from motion_tracker.box_clustering import merge_boxes
+from motion_tracker.detection_log import (BINARY_LOG_FILE, DetectionLog, RETENTION_BYTES, RETENTION_SECONDS,
+                                         SEGMENT_BYTES)
+from motion_tracker.detection_ring import DetectionRingWriter
+from motion_tracker.detection_store import STORE_FILE, DetectionStore
+from motion_tracker.detector import DOWNSCALE, MASK_MODE, MASK_MODES, MotionDetector, PROXIMITY_THRESHOLD
+from motion_tracker.frame_sources import open_source
+from motion_tracker.metrics import (MetricsRegistry, SNAPSHOT_INTERVAL, TRACKER_METRICS_NAME,
+                                    default_metrics_path, write_snapshot)
+from motion_tracker.zone_config import ZoneConfigWatcher
+from motion_tracker.zones import SHAPES_FILE
+from motion_tracker.pipeline import BLOCK, DEFAULT_QUEUE_SIZE, DROP_OLDEST, Pipeline
+from motion_tracker.scheduler import ACTIVATE_THRESHOLD, ACTIVE_HOLD, IDLE_STRIDE, AdaptiveScheduler
+from motion_tracker.tracker import MultiObjectTracker, PREDICTION_LEAD
+
+QUEUE_WRITE_INTERVAL = 0.1  # Minimum seconds between queue writes per track
+STATS_INTERVAL = 10.0  # Seconds between pipeline stats printouts
+
+def write_to_queue(data, ring, exporter=None, store=None):
+    """Publish a detection to the shared ring and, optionally, the detection log and history store"""
     try:
         data['timestamp'] = time.time()
-        # Convert numpy types to native Python types
-        data = convert_numpy_types(data)
-        line = json.dumps(data) + '\n'
-        
-        # Simple append - atomic on most systems
-        with open(queue_file, 'a') as f:
-            f.write(line)
-            
+        # Both the ring's record packing and the log's encoders accept NumPy values as they are
+        data['seq'] = ring.write(data)
+
+        if exporter is not None:
+            exporter.write(data)
+        if store is not None:
+            store.add(data)
+
     except Exception as e:
         print(f"Error writing to queue: {e}")
 
 def merge_nearby_boxes(boxes, distance_threshold=PROXIMITY_THRESHOLD):
     """Improved merging of bounding boxes that are close to each other"""
-    if not boxes:
-        return []
-    
-    # Convert to numpy array for easier manipulation
-    boxes = np.array(boxes)
-    merged = []
-    used = [False] * len(boxes)
-    
-    for i, box1 in enumerate(boxes):
-        if used[i]:
-            continue
-            
-        x1, y1, x2, y2 = box1
-        group = [box1]
-        used[i] = True
-        
-        # Find all boxes that should be merged with this one
-        changed = True
-        while changed:
-            changed = False
-            current_group_boxes = np.array(group)
-            
-            # Get bounding box of current group
-            group_x1 = np.min(current_group_boxes[:, 0])
-            group_y1 = np.min(current_group_boxes[:, 1])
-            group_x2 = np.max(current_group_boxes[:, 2])
-            group_y2 = np.max(current_group_boxes[:, 3])
-            
-            for j, box2 in enumerate(boxes):
-                if used[j]:
-                    continue
-                    
-                bx1, by1, bx2, by2 = box2
-                
-                # Calculate distance between group center and box center
-                group_center_x = (group_x1 + group_x2) // 2
-                group_center_y = (group_y1 + group_y2) // 2
-                box_center_x = (bx1 + bx2) // 2
-                box_center_y = (by1 + by2) // 2
-                
-                distance = ((group_center_x - box_center_x) ** 2 + (group_center_y - box_center_y) ** 2) ** 0.5
-                
-                # Check if boxes overlap or are very close
-                overlap_x = max(0, min(group_x2, bx2) - max(group_x1, bx1))
-                overlap_y = max(0, min(group_y2, by2) - max(group_y1, by1))
-                has_overlap = overlap_x > 0 and overlap_y > 0
-                
-                # More aggressive merging criteria
-                x_gap = max(0, max(group_x1, bx1) - min(group_x2, bx2))
-                y_gap = max(0, max(group_y1, by1) - min(group_y2, by2))
-                
-                if (distance < distance_threshold or 
-                    has_overlap or 
-                    (x_gap < distance_threshold//2 and y_gap < distance_threshold//2)):
-                    group.append(box2)
-                    used[j] = True
-                    changed = True
-        
-        # Create merged box from the group
-        if group:
-            group_boxes = np.array(group)
-            min_x = np.min(group_boxes[:, 0])
-            min_y = np.min(group_boxes[:, 1])
-            max_x = np.max(group_boxes[:, 2])
-            max_y = np.max(group_boxes[:, 3])
-            merged.append([min_x, min_y, max_x, max_y])
-    
-    return merged
-
-def detect_motion(cap, use_queue=False):
-    # Create background subtractor with adjusted parameters
-    backSub = cv2.createBackgroundSubtractorMOG2(
-        detectShadows=True,
-        varThreshold=MOTION_THRESHOLD,  # Higher = less sensitive
-        history=HISTORY
-    )
-    
-    last_queue_write = 0
-    
-    # Morphological operations kernels - adjusted sizes
-    kernel_open = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))  # Slightly larger for better noise removal
-    kernel_close = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (PROXIMITY, PROXIMITY))
-    
-    # Additional kernel for more aggressive closing if needed
-    kernel_close_large = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (25, 25))
-    
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # Apply background subtraction
-        fgMask = backSub.apply(frame)
-        
-        # More aggressive morphological operations
-        # Opening removes noise (small white spots)
-        fgMask = cv2.morphologyEx(fgMask, cv2.MORPH_OPEN, kernel_open)
-        
-        # Multiple closing operations with different kernel sizes
-        fgMask = cv2.morphologyEx(fgMask, cv2.MORPH_CLOSE, kernel_close)
-        fgMask = cv2.morphologyEx(fgMask, cv2.MORPH_CLOSE, kernel_close_large)  # Additional aggressive closing
-        
-        # Gaussian blur for smoothing
-        fgMask = cv2.GaussianBlur(fgMask, (9, 9), 0)  # Increased blur kernel
-        
-        # Re-threshold with higher threshold for stricter detection
-        _, fgMask = cv2.threshold(fgMask, 200, 255, cv2.THRESH_BINARY)  # Higher threshold
-        
-        # Find contours
-        contours, _ = cv2.findContours(fgMask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Filter contours by area with higher threshold
-        valid_contours = []
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > MIN_CONTOUR_AREA:  # Much higher minimum area
-                valid_contours.append(contour)
-        
-        # Create bounding boxes and merge them
-        if valid_contours:
-            bounding_boxes = []
-            for contour in valid_contours:
-                x, y, w, h = cv2.boundingRect(contour)
-                # Additional filtering based on aspect ratio and size
-                aspect_ratio = w / h if h > 0 else 0
-                if w > 30 and h > 30 and 0.2 < aspect_ratio < 5.0:  # Filter unrealistic shapes
-                    bounding_boxes.append([x, y, x + w, y + h])
-            
-            # Merge nearby boxes with improved algorithm
-            merged_boxes = merge_nearby_boxes(bounding_boxes, distance_threshold=PROXIMITY_THRESHOLD)
-            
-            # Process merged boxes
-            for box in merged_boxes:
-                x1, y1, x2, y2 = box
-                x, y, w, h = x1, y1, x2 - x1, y2 - y1
-                center_x = x + w // 2
-                center_y = y + h // 2
-                area = w * h
-                
-                # Additional size filter after merging
-                if area > MIN_CONTOUR_AREA:
-                    print(f"Moving object at x={center_x}, y={center_y}, area={area}")
-                    
-                    # Throttle queue writes
-                    current_time = time.time()
-                    if use_queue and (current_time - last_queue_write) > 0.1:
-                        write_to_queue({
-                            'type': 'motion',
-                            'x': center_x,
-                            'y': center_y,
-                            'area': area,
-                            'bbox': [x, y, w, h]
-                        })
-                        last_queue_write = current_time
-        
-        # Only show the foreground mask window (removed the main frame display)
-        cv2.imshow('Foreground Mask', fgMask)
-        
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    return merge_boxes(boxes, distance_threshold)
+
+def detect_motion(cap, use_queue=False, export_json=True, queue_size=DEFAULT_QUEUE_SIZE,
+                  policy=DROP_OLDEST, stats_interval=STATS_INTERVAL, headless=False,
+                  zone_provider=None, downscale=DOWNSCALE, lead_time=PREDICTION_LEAD, log_options=None,
+                  metrics=None, metrics_path=None, schedule_options=None, mask_mode=MASK_MODE,
+                  store_path=None, camera_id=None, ring_path=None, background_file=None):
+    metrics = metrics or MetricsRegistry('tracker', enabled=False)
+    metrics.describe('detector_stage_seconds', 'Time spent in each detector stage per frame')
+    metrics.describe('sink_stage_seconds', 'Time spent in each output step per frame')
+    metrics.describe('pipeline_fps', 'Frames per second through each pipeline stage')
+    metrics.describe('pipeline_dropped_frames', 'Frames dropped between pipeline stages')
+    metrics.describe('scheduler_active', '1 while the detector runs at full rate, 0 while idle')
+    metrics.describe('scheduler_frames_total', 'Frames by how the scheduler handled them')
+    metrics.describe('scheduler_transitions_total', 'Idle/active mode switches')
+    metrics.describe('background_ready', '1 once the background model has converged and detections are published')
+    metrics.describe('background_ready_frames', 'Frames from startup (or a zone change) until the model was ready')
+    metrics.describe('detections_suppressed_total', 'Detections dropped while the background model was not ready')
+
+    # background_file=None learns the background from scratch on every start
+    motion = MotionDetector(downscale=downscale, zone_provider=zone_provider, mask_mode=mask_mode,
+                            background_path=background_file)
+    detector = motion
+    # schedule_options=None runs the full pipeline on every frame
+    if schedule_options is not None:
+        detector = AdaptiveScheduler(detector, metrics=metrics, **schedule_options)
+    tracker = MultiObjectTracker(lead_time=lead_time)
+    ring = DetectionRingWriter(ring_path) if use_queue else None
+    # The JSON-lines mirror is a rotated, retention-bounded log rather than one ever-growing file
+    exporter = DetectionLog(**(log_options or {})) if use_queue and export_json else None
+    # History for the webapp's range, count and heatmap queries
+    store = DetectionStore(store_path) if use_queue and store_path else None
+
+    # last_queue_write is keyed by track id (None for untracked detections)
+    state = {'last_queue_write': {}, 'last_stats': time.monotonic(), 'last_snapshot': time.monotonic()}
+
+    live = getattr(cap, 'live', True)
+
+    def process(frame):
+        if not metrics.enabled:
+            mask, detections = detector.process(frame)
+        else:
+            timings = {}
+            with metrics.timer('detector_stage_seconds', stage='total'):
+                mask, detections = detector.process(frame, timings)
+            for name, duration in timings.items():
+                metrics.observe('detector_stage_seconds', duration, stage=name)
+        if not motion.ready:
+            # An unconverged model reports the scene itself as motion; don't spray at it
+            metrics.inc('detections_suppressed_total', len(detections))
+            detections = []
+        return mask, detections
+
+    def publish_metrics():
+        for name, stats in pipeline.stats.items():
+            metrics.set_gauge('pipeline_fps', round(stats.fps(), 2), stage=name)
+        metrics.set_gauge('pipeline_dropped_frames', pipeline.capture_queue.dropped, queue='capture')
+        metrics.set_gauge('pipeline_dropped_frames', pipeline.output_queue.dropped, queue='process')
+        metrics.set_gauge('background_ready', 1 if motion.ready else 0)
+        if motion.ready_frames is not None:
+            metrics.set_gauge('background_ready_frames', motion.ready_frames)
+        if metrics_path:
+            write_snapshot(metrics_path, metrics.snapshot())
+
+    def sink(packet):
+        # Tracking runs here, in frame order. Recorded sources are read faster than
+        # real time, so their tracks step by the nominal frame interval instead.
+        with metrics.timer('sink_stage_seconds', stage='track'):
+            tracker.update(packet.detections, packet.capture_time if live else None)
+        metrics.inc('frames_total')
+        metrics.inc('detections_total', len(packet.detections))
+        last_writes = state['last_queue_write']
+        frame_size = [packet.frame.shape[1], packet.frame.shape[0]]
+
+        for detection in packet.detections:
+            # Consumers measure reaction time from capture and map positions onto zones
+            detection['capture_time'] = packet.capture_time
+            detection['frame_size'] = frame_size
+            if camera_id:
+                detection['camera_id'] = camera_id
+            track_id = detection.get('track_id')
+            print(f"Moving object {track_id} at x={detection['x']}, y={detection['y']}, area={detection['area']}")
+
+            # Throttle queue writes per track so a second cat isn't starved
+            current_time = time.time()
+            if use_queue and (current_time - last_writes.get(track_id, 0)) > QUEUE_WRITE_INTERVAL:
+                with metrics.timer('sink_stage_seconds', stage='queue_write'):
+                    write_to_queue(dict(detection), ring, exporter, store)
+                metrics.inc('queue_writes_total')
+                last_writes[track_id] = current_time
+
+        # Forget throttle state for tracks that have been dropped
+        if len(last_writes) > len(tracker) + 1:
+            live_ids = set(int(i) for i in tracker.ids)
+            for track_id in [t for t in last_writes if t is not None and t not in live_ids]:
+                del last_writes[track_id]
+
+        if stats_interval and time.monotonic() - state['last_stats'] >= stats_interval:
+            print(pipeline.summary())
+            if headless and metrics.enabled:
+                print(f"stages: {metrics.stage_summary('detector_stage_seconds')}")
+                print(f"output: {metrics.stage_summary('sink_stage_seconds')}")
+            state['last_stats'] = time.monotonic()
+
+        if metrics.enabled and time.monotonic() - state['last_snapshot'] >= SNAPSHOT_INTERVAL:
+            publish_metrics()
+            state['last_snapshot'] = time.monotonic()
+
+        if headless:
+            return True
+
+        with metrics.timer('sink_stage_seconds', stage='display'):
+            # Only show the foreground mask window (removed the main frame display)
+            cv2.imshow('Foreground Mask', packet.mask)
+
+            return not (cv2.waitKey(1) & 0xFF == ord('q'))
+
+    # Live capture keeps only the latest frame; recorded sources process every frame
+    if live:
+        capture_policy, process_policy = DROP_OLDEST, policy
+    else:
+        capture_policy, process_policy = BLOCK, BLOCK
+
+    pipeline = Pipeline(cap, process, sink, queue_size=queue_size,
+                        capture_policy=capture_policy, process_policy=process_policy)
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        print("Stopping motion detector...")
+    finally:
+        print(pipeline.summary())
+        if metrics.enabled:
+            publish_metrics()
+        # The next start warm-starts from the background as it is now
+        motion.save_background()
+        if ring is not None:
+            ring.close()
+        if exporter is not None:
+            exporter.close()
+        if store is not None:
+            store.close()
 
 if __name__ == "__main__":
-    print("Initializing motion detector, this may take a few seconds...")
+    parser = argparse.ArgumentParser(description="Detect motion and publish positions to the queue")
+    parser.add_argument('--camera-id',
+                        help='Tag detections with this camera and use its zones from shapes.json')
+    parser.add_argument('--source', default='camera:0',
+                        help="camera:N, broker[:PATH], a video file, an image directory or synthetic[:FRAMES]")
+    parser.add_argument('--headless', action='store_true',
+                        help='Run without any GUI windows')
+    parser.add_argument('--shapes', default=SHAPES_FILE,
+                        help='shapes.json whose active zones limit where motion is detected')
+    parser.add_argument('--no-zones', action='store_true',
+                        help='Ignore saved zones and process the full frame')
+    parser.add_argument('--downscale', type=float, default=DOWNSCALE,
+                        help='Process frames at 1/N resolution (boxes are reported at full resolution)')
+    parser.add_argument('--mask-mode', choices=MASK_MODES, default=MASK_MODE,
+                        help='Mask cleanup: exact elliptical closings, or one cheaper rectangular closing')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='Frames buffered between pipeline stages')
+    parser.add_argument('--policy', choices=[DROP_OLDEST, BLOCK], default=DROP_OLDEST,
+                        help='What to do when the sink falls behind')
+    parser.add_argument('--no-adaptive', action='store_true',
+                        help='Run full-rate detection on every frame, even when nothing moves')
+    parser.add_argument('--idle-stride', type=int, default=IDLE_STRIDE,
+                        help='While idle, check one frame in this many for motion')
+    parser.add_argument('--activate-threshold', type=float, default=ACTIVATE_THRESHOLD,
+                        help='Fraction of changed pixels that switches to full-rate detection')
+    parser.add_argument('--active-hold', type=int, default=ACTIVE_HOLD,
+                        help='Frames without a detection before going back to idle')
+    parser.add_argument('--lead-time', type=float, default=PREDICTION_LEAD,
+                        help='Seconds ahead to report each track\'s predicted position')
+    parser.add_argument('--ring', help='Detection ring path (defaults to the shared one)')
+    parser.add_argument('--no-log', action='store_true',
+                        help='Publish to the ring only, without the detection log')
+    parser.add_argument('--log-format', choices=['jsonl', 'binary'], default='jsonl',
+                        help=f'Detection log as JSON lines, or fixed-size records in {BINARY_LOG_FILE}')
+    parser.add_argument('--segment-mb', type=float, default=SEGMENT_BYTES / 2 ** 20,
+                        help='Roll the JSON-lines detection log at this size')
+    parser.add_argument('--retention-mb', type=float, default=RETENTION_BYTES / 2 ** 20,
+                        help='Disk space kept for closed log segments')
+    parser.add_argument('--retention-days', type=float, default=RETENTION_SECONDS / 86400,
+                        help='Closed log segments older than this are deleted')
+    parser.add_argument('--no-compress', action='store_true',
+                        help='Leave closed log segments uncompressed')
+    parser.add_argument('--store', default=STORE_FILE,
+                        help='SQLite detection history queried by the webapp')
+    parser.add_argument('--no-store', action='store_true',
+                        help='Do not record detection history')
+    parser.add_argument('--background',
+                        help='Background model snapshot for warm starts (defaults to one per camera id in shared memory)')
+    parser.add_argument('--no-background', action='store_true',
+                        help='Learn the background from scratch on every start')
+    parser.add_argument('--no-metrics', action='store_true',
+                        help='Disable per-stage timers and the metrics snapshot file')
+    parser.add_argument('--metrics-file', default=default_metrics_path(TRACKER_METRICS_NAME),
+                        help='Where the metrics snapshot for /api/metrics is written')
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL,
+                        help='Seconds between stage FPS/latency printouts (0 to disable)')
+    args = parser.parse_args()
+
+    background_file = None if args.no_background else args.background or background_path(args.camera_id)
+    if background_file is None or not os.path.exists(background_file):
+        print("Initializing motion detector, this may take a few seconds...")
+    else:
+        print("Initializing motion detector...")
     
-    cap = cv2.VideoCapture(0)
+    try:
+        cap = open_source(args.source)
+    except ValueError as e:
+        parser.error(str(e))
     if not cap.isOpened():
-        exit("Error: Could not open camera")
+        exit(f"Error: Could not open source {args.source}")
+
+    zone_provider = None
+    if not args.no_zones:
+        # Zones are reloaded in the background whenever the webapp saves shapes.json
+        zone_provider = ZoneConfigWatcher(args.shapes, camera_id=args.camera_id).start()
+        if not zone_provider.shapes:
+            print("No active zones found, processing the full frame")
 
-    detect_motion(cap, use_queue=True)
+    log_options = {
+        'segment_bytes': int(args.segment_mb * 2 ** 20),
+        'retention_bytes': int(args.retention_mb * 2 ** 20),
+        'retention_seconds': args.retention_days * 86400,
+        'compress': not args.no_compress,
+    }
+    if args.log_format == 'binary':
+        log_options.update(path=BINARY_LOG_FILE, binary=True)
+    schedule_options = None if args.no_adaptive else {
+        'idle_stride': args.idle_stride,
+        'activate_threshold': args.activate_threshold,
+        'active_hold': args.active_hold,
+    }
+    metrics = MetricsRegistry('tracker', enabled=not args.no_metrics,
+                              labels={'camera': args.camera_id} if args.camera_id else None)
+    detect_motion(cap, use_queue=True, export_json=not args.no_log, queue_size=args.queue_size,
+                  policy=args.policy, stats_interval=args.stats_interval, headless=args.headless,
+                  zone_provider=zone_provider, downscale=args.downscale, lead_time=args.lead_time,
+                  log_options=log_options, metrics=metrics,
+                  metrics_path=args.metrics_file, schedule_options=schedule_options,
+                  mask_mode=args.mask_mode, store_path=None if args.no_store else args.store,
+                  camera_id=args.camera_id, ring_path=args.ring, background_file=background_file)
 
     cap.release()
-    cv2.destroyAllWindows()
\ No newline at end of file
+    if zone_provider is not None:
+        zone_provider.stop()
+    if not args.headless:
+        cv2.destroyAllWindows()
@@ -0,0 +1,24 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.detection_record import FILE_MAGIC, jsonl_to_records, records_to_jsonl
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a detection file between JSON lines and binary records (direction is detected)")
+    parser.add_argument('source', help='position_queue.txt-style JSON lines, or a binary record file')
+    parser.add_argument('destination')
+    args = parser.parse_args()
+
+    try:
+        with open(args.source, 'rb') as f:
+            binary = f.read(len(FILE_MAGIC)) == FILE_MAGIC
+        if binary:
+            count = records_to_jsonl(args.source, args.destination)
+        else:
+            count = jsonl_to_records(args.source, args.destination)
+    except (OSError, ValueError) as e:
+        exit(f"Error: {e}")
+    print(f"Converted {count} detections to {'JSON lines' if binary else 'binary records'}: {args.destination}")
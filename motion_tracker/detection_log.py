@@ -0,0 +1,215 @@
+"""
+Segmented JSON-lines detection log.
+
+The active segment always lives at the queue path (position_queue.txt), so
+existing readers keep working. Once it reaches a size or age limit it is
+rolled over: the full segment is hard-linked to a numbered name
+(position_queue.txt.000042) and a fresh empty file is renamed over the
+queue path in one atomic step, so the path never disappears and a
+JsonLinesTail following it sees an inode change, drains the old segment
+and moves on. Closed segments are optionally gzipped in the background and
+deleted once they fall outside the byte or age retention.
+
+With binary=True the segments hold fixed-size detection records
+(detection_record) instead of JSON lines: writing a detection is one
+struct pack, and load_log_records() returns the whole log as a single
+NumPy array.
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from motion_tracker.detection_record import (FILE_HEADER, FILE_HEADER_SIZE, FILE_MAGIC, RECORD_DTYPE,
+                                             check_header, decode_records, dumps, pack_detection,
+                                             records_to_dicts)
+
+# Segment constants
+SEGMENT_BYTES = 4 * 1024 * 1024  # Roll the active segment once it reaches this size
+SEGMENT_SECONDS = 3600  # ...or once it has been open this long
+RETENTION_BYTES = 256 * 1024 * 1024  # Total size of closed segments kept on disk
+RETENTION_SECONDS = 7 * 24 * 3600  # Closed segments older than this are deleted
+COMPRESS_SEGMENTS = True
+BINARY_LOG_FILE = 'position_queue.bin'  # Default path for binary=True logs
+SEGMENT_DIGITS = 6
+
+
+def segment_path(path, number):
+    return f"{path}.{number:0{SEGMENT_DIGITS}d}"
+
+
+def closed_segments(path):
+    """(number, filename) of every closed segment of a log, oldest first"""
+    directory = os.path.dirname(os.path.abspath(path))
+    pattern = re.compile(re.escape(os.path.basename(path)) + r'\.(\d+)(\.gz)?$')
+    segments = {}
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        # Mid-compression both files exist; the .gz is already complete
+        if match and (match.group(2) or int(match.group(1)) not in segments):
+            segments[int(match.group(1))] = os.path.join(directory, name)
+    return sorted(segments.items())
+
+
+def _read_segment(filename):
+    opener = gzip.open if filename.endswith('.gz') else open
+    with opener(filename, 'rb') as f:
+        return f.read()
+
+
+def _segment_records(data, filename):
+    check_header(data, filename)
+    body = memoryview(data)[FILE_HEADER_SIZE:]
+    # A record still being appended to the active segment is left out
+    return decode_records(body[:len(body) - len(body) % RECORD_DTYPE.itemsize])
+
+
+def read_log(path):
+    """Yield every record in the log, closed segments first, then the active one"""
+    for _, filename in closed_segments(path) + [(None, path)]:
+        try:
+            data = _read_segment(filename)
+        except FileNotFoundError:
+            # Compressed or expired between listing and opening
+            continue
+        if data.startswith(FILE_MAGIC):
+            yield from records_to_dicts(_segment_records(data, filename))
+            continue
+        for line in data.splitlines():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def load_log_records(path):
+    """Every record of a binary log as one RECORD_DTYPE array, oldest first"""
+    arrays = []
+    for _, filename in closed_segments(path) + [(None, path)]:
+        try:
+            data = _read_segment(filename)
+        except FileNotFoundError:
+            continue
+        if data:
+            arrays.append(_segment_records(data, filename))
+    return np.concatenate(arrays) if arrays else np.zeros(0, dtype=RECORD_DTYPE)
+
+
+def compress_segment(filename):
+    """Gzip a closed segment next to itself, then remove the original"""
+    temp = filename + '.gz.tmp'
+    try:
+        with open(filename, 'rb') as src, gzip.open(temp, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(temp, filename + '.gz')
+        os.remove(filename)
+    except Exception as e:
+        print(f"Error compressing {filename}: {e}")
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+class DetectionLog:
+    """Appends detections to a size/age-rotated, retention-bounded JSON-lines log"""
+
+    def __init__(self, path="position_queue.txt", segment_bytes=SEGMENT_BYTES,
+                 segment_seconds=SEGMENT_SECONDS, retention_bytes=RETENTION_BYTES,
+                 retention_seconds=RETENTION_SECONDS, compress=COMPRESS_SEGMENTS, binary=False):
+        self.path = path
+        self.binary = binary
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.compress = compress
+
+        segments = closed_segments(path)
+        self.next_segment = segments[-1][0] + 1 if segments else 1
+        self._workers = []
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, 'ab' if self.binary else 'a')
+        self._size = self._file.tell()
+        self._opened = time.time()
+        if self.binary and not self._size:
+            self._file.write(FILE_HEADER)
+            self._size = FILE_HEADER_SIZE
+        elif self.binary:
+            # Never append records to a JSON-lines file or an older record layout
+            with open(self.path, 'rb') as f:
+                check_header(f.read(FILE_HEADER_SIZE), self.path)
+
+    def write(self, data):
+        if self.binary:
+            payload = pack_detection(data.get('seq', 0), data)
+        else:
+            # dumps only falls back to NumPy conversion when a NumPy value is present
+            payload = dumps(data) + '\n'
+        if self._size > (FILE_HEADER_SIZE if self.binary else 0) and (
+                self._size + len(payload) > self.segment_bytes or
+                time.time() - self._opened >= self.segment_seconds):
+            self.roll()
+        self._file.write(payload)
+        self._file.flush()
+        self._size += len(payload)
+
+    def roll(self):
+        """Close the active segment under a numbered name and start a new one"""
+        closed = segment_path(self.path, self.next_segment)
+        self.next_segment += 1
+        fresh = self.path + '.new'
+        try:
+            open(fresh, 'w').close()
+            try:
+                # Link first, then atomically replace: the queue path always exists
+                os.link(self.path, closed)
+            except OSError:
+                # No hard links on this filesystem; the path is briefly missing instead
+                os.rename(self.path, closed)
+            os.replace(fresh, self.path)
+        except OSError as e:
+            print(f"Error rolling {self.path}: {e}")
+            if os.path.exists(fresh):
+                os.remove(fresh)
+            return
+        self._file.close()
+        self._open()
+
+        if self.compress:
+            worker = threading.Thread(target=compress_segment, args=(closed,), daemon=True)
+            worker.start()
+            self._workers = [w for w in self._workers if w.is_alive()] + [worker]
+        self.enforce_retention()
+
+    def enforce_retention(self):
+        """Delete the oldest closed segments beyond the byte or age limits"""
+        segments = []
+        for number, filename in closed_segments(self.path):
+            try:
+                st = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            segments.append((number, filename, st.st_size, st.st_mtime))
+
+        total = sum(size for _, _, size, _ in segments)
+        cutoff = time.time() - self.retention_seconds
+        for number, filename, size, mtime in segments:
+            if total <= self.retention_bytes and mtime >= cutoff:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def close(self):
+        self._file.close()
+        for worker in self._workers:
+            worker.join()
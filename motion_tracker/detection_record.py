@@ -0,0 +1,197 @@
+"""
+Fixed-layout binary detection records.
+
+One detection is a 128-byte little-endian record. RECORD_STRUCT packs and
+unpacks single records (the shared-memory ring uses it per slot), and
+RECORD_DTYPE is the identical NumPy structured dtype, so a buffer of
+records, whether a bytes object, an mmap or a whole file, decodes with
+np.frombuffer/np.memmap in one call, with no per-record Python objects.
+
+Binary record files start with a 16-byte header (magic, version, record
+size) followed by back-to-back records. Converters map those files to and
+from the JSON-lines queue format. The camera and zone ids are stored as
+fixed-width UTF-8 (CAMERA_ID_BYTES, ZONE_ID_BYTES) and longer ids are cut
+to fit.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+# Record layout constants
+# seq, timestamp, x, y, area, bbox x, bbox y, bbox w, bbox h,
+# track id (0 = untracked), velocity x/y (px/s), predicted x/y,
+# capture time (0 = unknown), frame width, frame height, camera id, zone id ('' = none)
+CAMERA_ID_BYTES = 16
+ZONE_ID_BYTES = 32
+RECORD_STRUCT = struct.Struct(f'<QdiiqiiiiiffiidHH{CAMERA_ID_BYTES}s{ZONE_ID_BYTES}s')
+RECORD_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('timestamp', '<f8'),
+    ('x', '<i4'),
+    ('y', '<i4'),
+    ('area', '<i8'),
+    ('bbox', '<i4', (4,)),
+    ('track_id', '<i4'),
+    ('velocity', '<f4', (2,)),
+    ('predicted', '<i4', (2,)),
+    ('capture_time', '<f8'),
+    ('frame_size', '<u2', (2,)),
+    ('camera_id', f'S{CAMERA_ID_BYTES}'),
+    ('zone', f'S{ZONE_ID_BYTES}'),
+])
+
+# File constants
+FILE_MAGIC = b'CTDB'
+FILE_VERSION = 2  # 2: camera and zone ids
+FILE_HEADER_STRUCT = struct.Struct('<4sII4x')
+FILE_HEADER_SIZE = FILE_HEADER_STRUCT.size
+FILE_HEADER = FILE_HEADER_STRUCT.pack(FILE_MAGIC, FILE_VERSION, RECORD_STRUCT.size)
+
+
+def _id_bytes(value, size):
+    return str(value).encode('utf-8')[:size] if value else b''
+
+
+def _id_text(value):
+    # NumPy strips the NUL padding, struct does not
+    return value.rstrip(b'\0').decode('utf-8', 'ignore')
+
+
+def pack_detection(seq, data):
+    """Pack a detection dict into its binary record"""
+    bbox = data.get('bbox') or (0, 0, 0, 0)
+    velocity = data.get('velocity') or (0.0, 0.0)
+    predicted = data.get('predicted') or (data['x'], data['y'])
+    frame_size = data.get('frame_size') or (0, 0)
+    return RECORD_STRUCT.pack(
+        seq,
+        float(data.get('timestamp', 0.0)),
+        int(data['x']),
+        int(data['y']),
+        int(data.get('area', 0)),
+        int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3]),
+        int(data.get('track_id', 0)),
+        float(velocity[0]), float(velocity[1]),
+        int(predicted[0]), int(predicted[1]),
+        float(data.get('capture_time') or 0.0),
+        int(frame_size[0]), int(frame_size[1]),
+        _id_bytes(data.get('camera_id'), CAMERA_ID_BYTES),
+        _id_bytes(data.get('zone'), ZONE_ID_BYTES)
+    )
+
+
+def _detection_dict(seq, timestamp, x, y, area, bbox, track_id, velocity, predicted, capture_time, frame_size,
+                    camera_id, zone):
+    data = {
+        'type': 'motion',
+        'seq': seq,
+        'timestamp': timestamp,
+        'x': x,
+        'y': y,
+        'area': area,
+        'bbox': list(bbox)
+    }
+    if track_id:
+        data['track_id'] = track_id
+        data['velocity'] = [round(velocity[0], 1), round(velocity[1], 1)]
+        data['predicted'] = list(predicted)
+    if capture_time:
+        data['capture_time'] = capture_time
+    if frame_size[0] and frame_size[1]:
+        data['frame_size'] = list(frame_size)
+    camera_id, zone = _id_text(camera_id), _id_text(zone)
+    if camera_id:
+        data['camera_id'] = camera_id
+    if zone:
+        data['zone'] = zone
+    return data
+
+
+def unpack_detection(payload):
+    """Unpack a binary record into the same dict shape as the JSON queue lines"""
+    (seq, timestamp, x, y, area, bx, by, bw, bh,
+     track_id, vx, vy, px, py, capture_time, width, height, camera_id, zone) = RECORD_STRUCT.unpack(payload)
+    return _detection_dict(seq, timestamp, x, y, area, (bx, by, bw, bh), track_id,
+                           (vx, vy), (px, py), capture_time, (width, height), camera_id, zone)
+
+
+def decode_records(buffer):
+    """Zero-copy structured array over a buffer of back-to-back records"""
+    return np.frombuffer(buffer, dtype=RECORD_DTYPE, count=len(buffer) // RECORD_DTYPE.itemsize)
+
+
+def encode_records(detections, first_seq=0):
+    """Pack many detection dicts into one bytes object"""
+    return b''.join(pack_detection(data.get('seq', first_seq + index), data)
+                    for index, data in enumerate(detections))
+
+
+def records_to_dicts(records):
+    """Detection dicts (JSON queue shape) for a structured record array"""
+    # Converting column by column turns each field into Python values in one C loop
+    columns = [records[name].tolist() for name in RECORD_DTYPE.names]
+    return [_detection_dict(*row) for row in zip(*columns)]
+
+
+def check_header(header, path=''):
+    """Raise ValueError unless header is a binary record file header this version reads"""
+    if len(header) < FILE_HEADER_SIZE:
+        raise ValueError(f"Truncated detection record file {path}")
+    magic, version, record_size = FILE_HEADER_STRUCT.unpack_from(header)
+    if magic != FILE_MAGIC or version != FILE_VERSION or record_size != RECORD_STRUCT.size:
+        raise ValueError(f"Unsupported detection record file {path}")
+
+
+def load_records(path):
+    """Memory-map a binary record file as one structured array (no copy, any size)"""
+    with open(path, 'rb') as f:
+        check_header(f.read(FILE_HEADER_SIZE), path)
+        f.seek(0, 2)
+        count = (f.tell() - FILE_HEADER_SIZE) // RECORD_DTYPE.itemsize
+    if not count:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    # A record still being appended is left out by the floor division above
+    return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=FILE_HEADER_SIZE, shape=(count,))
+
+
+def json_default(obj):
+    """json.dumps fallback for NumPy values, only consulted when one is actually present"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    return json.dumps(data, default=json_default)
+
+
+def jsonl_to_records(src, dst):
+    """Convert a JSON-lines detection file to a binary record file; returns records written"""
+    written = 0
+    with open(src, 'r') as lines, open(dst, 'wb') as out:
+        out.write(FILE_HEADER)
+        for line in lines:
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if data.get('type', 'motion') != 'motion' or 'x' not in data:
+                continue
+            out.write(pack_detection(data.get('seq', written + 1), data))
+            written += 1
+    return written
+
+
+def records_to_jsonl(src, dst, chunk=65536):
+    """Convert a binary record file to JSON lines; returns records written"""
+    records = load_records(src)
+    with open(dst, 'w') as out:
+        for start in range(0, len(records), chunk):
+            out.writelines(json.dumps(data) + '\n' for data in records_to_dicts(records[start:start + chunk]))
+    return len(records)
@@ -0,0 +1,314 @@
+"""
+Shared-memory ring buffer for motion detections.
+
+One writer (the tracker) appends fixed-size binary records to an mmap-backed
+file; any number of readers in other processes follow it without locks.
+Each slot carries a sequence stamp that is cleared while the slot is being
+written and set once the record is complete, so a reader that races the
+writer sees a stamp mismatch and retries instead of returning a torn record.
+
+Readers that block in wait() bind a Unix datagram socket in a wake-up
+directory next to the ring; the writer sends each of them a one-byte
+datagram after publishing, so a waiting reader sleeps in select() and
+wakes as soon as a record lands instead of spinning on the header.
+"""
+
+import mmap
+import os
+import select
+import socket
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from motion_tracker.detection_record import RECORD_DTYPE, RECORD_STRUCT, pack_detection, unpack_detection
+
+# Ring layout constants
+RING_MAGIC = b'CTDR'
+RING_VERSION = 4  # 2: track id, velocity and predicted position; 3: capture time, frame size; 4: camera and zone ids
+DEFAULT_CAPACITY = 1024  # Number of detection slots
+DEFAULT_RING_NAME = 'cat_tracker_detections'
+
+# Reader wake-up constants
+WAIT_POLL_INTERVAL = 0.0005  # 0.5ms between header checks while blocked (no wake-up socket)
+WAKE_RECHECK_INTERVAL = 0.05  # Max sleep between header checks when woken by the writer
+WAKE_REFRESH_INTERVAL = 0.5  # How often the writer re-lists waiting readers
+WAKE_DIR_SUFFIX = '.wake'
+MAX_READ_RETRIES = 3  # Retries before a slot being rewritten is skipped
+
+# Header: magic, version, capacity, record size, write sequence (padded to 64 bytes)
+HEADER_STRUCT = struct.Struct('<4sIIIQ')
+HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 16
+
+# Slot: sequence stamp followed by one detection record (layout in detection_record)
+STAMP_STRUCT = struct.Struct('<Q')
+SLOT_SIZE = STAMP_STRUCT.size + RECORD_STRUCT.size
+SLOT_DTYPE = np.dtype([('stamp', '<u8'), ('record', RECORD_DTYPE)])
+
+
+def default_ring_path(name=DEFAULT_RING_NAME):
+    """Return the ring file path, preferring tmpfs so pages never hit disk"""
+    shm_dir = '/dev/shm'
+    if os.path.isdir(shm_dir) and os.access(shm_dir, os.W_OK):
+        return os.path.join(shm_dir, name)
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def ring_file_size(capacity):
+    """Total mapped size for a ring with the given number of slots"""
+    return HEADER_SIZE + capacity * SLOT_SIZE
+
+
+class DetectionRingWriter:
+    """Single writer that appends detections to the ring"""
+
+    def __init__(self, path=None, capacity=DEFAULT_CAPACITY):
+        self.path = path or default_ring_path()
+        self.capacity = capacity
+        self.seq = 0
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, ring_file_size(capacity))
+            self._map = mmap.mmap(fd, ring_file_size(capacity))
+        finally:
+            os.close(fd)
+
+        # Zero the slots first so readers never mistake old stamps for new data
+        self._map[:] = bytes(len(self._map))
+        HEADER_STRUCT.pack_into(self._map, 0, RING_MAGIC, RING_VERSION,
+                                capacity, RECORD_STRUCT.size, 0)
+
+        self.wake_dir = self.path + WAKE_DIR_SUFFIX
+        self._wake_sock = None
+        self._listeners = []
+        self._listeners_checked = 0.0
+        if hasattr(socket, 'AF_UNIX'):
+            os.makedirs(self.wake_dir, exist_ok=True)
+            self._wake_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._wake_sock.setblocking(False)
+
+    def _notify(self):
+        """Nudge every reader waiting on the ring"""
+        now = time.monotonic()
+        if now - self._listeners_checked >= WAKE_REFRESH_INTERVAL:
+            try:
+                self._listeners = [os.path.join(self.wake_dir, name) for name in os.listdir(self.wake_dir)]
+            except OSError:
+                self._listeners = []
+            self._listeners_checked = now
+
+        for listener in self._listeners:
+            try:
+                self._wake_sock.sendto(b'\0', listener)
+            except BlockingIOError:
+                # Its buffer is full of unread nudges, so it is already awake
+                pass
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Reader died without cleaning up
+                try:
+                    os.remove(listener)
+                except OSError:
+                    pass
+                self._listeners_checked = 0.0
+            except OSError:
+                pass
+
+    def write(self, data):
+        """Append one detection dict and return its sequence number"""
+        self.seq += 1
+        offset = HEADER_SIZE + ((self.seq - 1) % self.capacity) * SLOT_SIZE
+
+        # Clear the stamp, write the payload, then publish the stamp
+        STAMP_STRUCT.pack_into(self._map, offset, 0)
+        self._map[offset + STAMP_STRUCT.size:offset + SLOT_SIZE] = pack_detection(self.seq, data)
+        STAMP_STRUCT.pack_into(self._map, offset, self.seq)
+        STAMP_STRUCT.pack_into(self._map, WRITE_SEQ_OFFSET, self.seq)
+        if self._wake_sock is not None:
+            self._notify()
+        return self.seq
+
+    def close(self):
+        if self._wake_sock is not None:
+            self._wake_sock.close()
+        self._map.close()
+
+
+class DetectionRingReader:
+    """Lock-free reader; each reader keeps its own position in the ring"""
+
+    def __init__(self, path=None, from_start=False):
+        self.path = path or default_ring_path()
+
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            self._map = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        magic, version, capacity, record_size, _ = HEADER_STRUCT.unpack_from(self._map, 0)
+        if magic != RING_MAGIC or version != RING_VERSION or record_size != RECORD_STRUCT.size:
+            self._map.close()
+            raise ValueError(f"Unsupported detection ring format in {self.path}")
+        self.capacity = capacity
+
+        write_seq = self._write_seq()
+        self.last_seq = max(0, write_seq - capacity) if from_start else write_seq
+        self.dropped = 0
+        self._slots = None
+        self._wake_sock = None
+        self._wake_path = None
+
+    def _write_seq(self):
+        return STAMP_STRUCT.unpack_from(self._map, WRITE_SEQ_OFFSET)[0]
+
+    def _read_slot(self, seq):
+        """Return the record for seq, or None if it was overwritten or is torn"""
+        offset = HEADER_SIZE + ((seq - 1) % self.capacity) * SLOT_SIZE
+        for _ in range(MAX_READ_RETRIES):
+            stamp = STAMP_STRUCT.unpack_from(self._map, offset)[0]
+            payload = self._map[offset + STAMP_STRUCT.size:offset + SLOT_SIZE]
+            if STAMP_STRUCT.unpack_from(self._map, offset)[0] != stamp:
+                continue
+            if stamp == seq:
+                return unpack_detection(payload)
+            if stamp > seq:
+                return None
+        return None
+
+    def _catch_up(self):
+        """Current write sequence, after adjusting our position for restarts and overruns"""
+        write_seq = self._write_seq()
+
+        # Writer restarted with a fresh ring
+        if write_seq < self.last_seq:
+            self.last_seq = 0
+
+        # Reader fell behind by more than a full lap
+        if write_seq - self.last_seq > self.capacity:
+            self.dropped += write_seq - self.last_seq - self.capacity
+            self.last_seq = write_seq - self.capacity
+        return write_seq
+
+    def read(self):
+        """Return all detections published since the last call, oldest first"""
+        write_seq = self._catch_up()
+        records = []
+        for seq in range(self.last_seq + 1, write_seq + 1):
+            record = self._read_slot(seq)
+            if record is None:
+                self.dropped += 1
+            else:
+                records.append(record)
+        self.last_seq = write_seq
+        return records
+
+    def read_array(self):
+        """Like read(), but returns the new records as one RECORD_DTYPE array"""
+        write_seq = self._catch_up()
+        if self._slots is None:
+            self._slots = np.frombuffer(self._map, dtype=SLOT_DTYPE, count=self.capacity, offset=HEADER_SIZE)
+        seqs = np.arange(self.last_seq + 1, write_seq + 1, dtype=np.uint64)
+        slots = (seqs - 1) % self.capacity
+
+        # Same stamp check as _read_slot, for the whole batch: a slot counts only
+        # if its stamp matched before and after the copy
+        before = self._slots['stamp'][slots]
+        records = self._slots['record'][slots]
+        valid = (before == seqs) & (self._slots['stamp'][slots] == seqs)
+        self.dropped += int(np.count_nonzero(~valid))
+        self.last_seq = write_seq
+        return records[valid]
+
+    def _bind_wake_socket(self):
+        """Register for writer wake-ups; falls back to polling if that is not possible"""
+        wake_dir = self.path + WAKE_DIR_SUFFIX
+        if not hasattr(socket, 'AF_UNIX') or not os.path.isdir(wake_dir):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        path = os.path.join(wake_dir, f"{os.getpid()}-{id(self)}")
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+            sock.bind(path)
+        except OSError:
+            sock.close()
+            return None
+        sock.setblocking(False)
+        self._wake_path = path
+        return sock
+
+    def _drain_wake_socket(self):
+        try:
+            while self._wake_sock.recv(64):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def wait(self, timeout=None):
+        """Block until new detections arrive (or timeout) and return them"""
+        if self._wake_sock is None:
+            self._wake_sock = self._bind_wake_socket()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._write_seq() == self.last_seq:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return []
+            if self._wake_sock is None:
+                time.sleep(WAIT_POLL_INTERVAL)
+                continue
+            # Sleep until the writer nudges us; recheck periodically in case a nudge was missed
+            delay = WAKE_RECHECK_INTERVAL if remaining is None else min(remaining, WAKE_RECHECK_INTERVAL)
+            if select.select([self._wake_sock], [], [], delay)[0]:
+                self._drain_wake_socket()
+        return self.read()
+
+    def close(self):
+        if self._wake_sock is not None:
+            self._wake_sock.close()
+            try:
+                os.remove(self._wake_path)
+            except OSError:
+                pass
+        # The NumPy view pins the mapping; drop it first
+        self._slots = None
+        self._map.close()
+
+
+def open_reader_when_ready(path=None, poll_interval=0.5):
+    """Wait for the tracker to create the ring, then return a reader on it"""
+    while True:
+        try:
+            return DetectionRingReader(path)
+        except (FileNotFoundError, ValueError):
+            time.sleep(poll_interval)
+
+
+def wait_any(readers, timeout=None):
+    """Block until any reader has new detections (or timeout); returns [(reader, detections)]"""
+    for reader in readers:
+        if reader._wake_sock is None:
+            reader._wake_sock = reader._bind_wake_socket()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        pending = [reader for reader in readers if reader._write_seq() != reader.last_seq]
+        if pending:
+            return [(reader, reader.read()) for reader in pending]
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            return []
+        sockets = [reader._wake_sock for reader in readers if reader._wake_sock is not None]
+        if len(sockets) < len(readers):
+            # Someone has no wake-up socket, so fall back to polling everyone
+            time.sleep(WAIT_POLL_INTERVAL)
+            continue
+        delay = WAKE_RECHECK_INTERVAL if remaining is None else min(remaining, WAKE_RECHECK_INTERVAL)
+        ready = select.select(sockets, [], [], delay)[0]
+        for reader in readers:
+            if reader._wake_sock in ready:
+                reader._drain_wake_socket()
+
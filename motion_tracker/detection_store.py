@@ -0,0 +1,346 @@
+"""
+Persistent detection history in SQLite.
+
+DetectionStore is the writer: the tracker hands it every published
+detection, a background thread commits them in batches (WAL mode, so the
+backend can read while the tracker writes), and each batch also bumps
+pre-aggregated counters:
+
+  - zone_counts: detections per camera and zone per minute, hour and day
+    bucket
+  - heat_grids: detections per cell of a HEATMAP_GRID over the frame, one
+    count array per camera and hour, day, week and 30-day bucket, so a
+    heatmap over months sums a few dozen arrays per camera
+
+DetectionHistory is the reader used by the backend. A time range is
+covered with as few aligned buckets as possible (whole days in the
+middle, then hours, then minutes at the edges), so counting a few months
+touches a few hundred aggregate rows instead of millions of detections.
+Every query can be limited to one camera; a single tracker without a
+camera id records under the empty id.
+Raw rows are kept for RAW_RETENTION_SECONDS for range queries; the
+aggregates are kept indefinitely.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+# Store constants
+STORE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'webapp', 'backend', 'detections.db')
+BATCH_SIZE = 500  # Detections per transaction at most
+FLUSH_INTERVAL = 1.0  # Seconds a detection may wait before it is committed
+RAW_RETENTION_SECONDS = 30 * 24 * 3600  # Raw detection rows older than this are deleted
+PRUNE_INTERVAL = 3600  # Seconds between retention sweeps
+
+# Aggregate constants
+BUCKETS = {'minute': 60, 'hour': 3600, 'day': 86400}
+COUNT_RESOLUTIONS = (86400, 3600, 60)  # Coarsest first
+HEATMAP_RESOLUTIONS = (30 * 86400, 7 * 86400, 86400, 3600)  # A grid per bucket is large, so keep coarser tiers
+HEATMAP_GRID = (64, 48)  # Cells across and down the frame
+HEATMAP_DTYPE = np.dtype('<u4')
+MAX_SERIES_BUCKETS = 2000  # Longer series are returned at a coarser bucket
+MAX_RANGE_ROWS = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    timestamp REAL NOT NULL,
+    zone TEXT NOT NULL DEFAULT '',
+    camera_id TEXT NOT NULL DEFAULT '',
+    track_id INTEGER,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    area INTEGER,
+    bbox_x INTEGER, bbox_y INTEGER, bbox_w INTEGER, bbox_h INTEGER,
+    frame_width INTEGER, frame_height INTEGER
+);
+CREATE INDEX IF NOT EXISTS detections_time ON detections (timestamp);
+CREATE INDEX IF NOT EXISTS detections_zone_time ON detections (zone, timestamp);
+CREATE TABLE IF NOT EXISTS zone_counts (
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    zone TEXT NOT NULL,
+    camera_id TEXT NOT NULL DEFAULT '',
+    count INTEGER NOT NULL,
+    PRIMARY KEY (resolution, bucket, zone, camera_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS heat_grids (
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    camera_id TEXT NOT NULL DEFAULT '',
+    grid BLOB NOT NULL,
+    PRIMARY KEY (resolution, bucket, camera_id)
+);
+"""
+
+# Aggregates written before they were kept per camera, moved under the empty camera id
+MIGRATIONS = {
+    'zone_counts': "INSERT INTO zone_counts SELECT resolution, bucket, zone, '', count FROM old_zone_counts;",
+    'heat_grids': "INSERT INTO heat_grids SELECT resolution, bucket, '', grid FROM old_heat_grids;",
+}
+
+
+def heat_cell(detection):
+    """Heatmap cell index of a detection's centre, or None without a frame size"""
+    frame_size = detection.get('frame_size')
+    if not frame_size or not frame_size[0] or not frame_size[1]:
+        return None
+    columns, rows = HEATMAP_GRID
+    cx = min(max(int(detection['x'] * columns / frame_size[0]), 0), columns - 1)
+    cy = min(max(int(detection['y'] * rows / frame_size[1]), 0), rows - 1)
+    return cy * columns + cx
+
+
+def migrate(connection):
+    """Create the schema, rebuilding aggregate tables from before camera_id was part of their key"""
+    for table, copy in MIGRATIONS.items():
+        columns = [row[1] for row in connection.execute(f'PRAGMA table_info({table})')]
+        if columns and 'camera_id' not in columns:
+            print(f"Migrating {table} to per-camera aggregates")
+            connection.executescript(f'BEGIN IMMEDIATE; ALTER TABLE {table} RENAME TO old_{table}; {SCHEMA} {copy} '
+                                     f'DROP TABLE old_{table}; COMMIT;')
+    connection.executescript(SCHEMA)
+
+
+def cover_range(start, end, resolutions):
+    """Split [start, end) into aligned (resolution, first bucket, end bucket) runs, coarsest in the middle
+
+    start and end must be multiples of the finest resolution.
+    """
+    if start >= end or not resolutions:
+        return []
+    resolution = resolutions[0]
+    first, last = -(-start // resolution), end // resolution
+    if first >= last:
+        return cover_range(start, end, resolutions[1:])
+    return (cover_range(start, first * resolution, resolutions[1:]) + [(resolution, first, last)] +
+            cover_range(last * resolution, end, resolutions[1:]))
+
+
+def aligned_range(start, end, resolution):
+    """Widen [start, end) to whole buckets of the given resolution"""
+    return int(start // resolution) * resolution, int(-(-end // resolution)) * resolution
+
+
+class DetectionStore:
+    """Batches detections into SQLite on a background thread"""
+
+    def __init__(self, path=STORE_FILE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 retention_seconds=RAW_RETENTION_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_seconds = retention_seconds
+        self.written = 0
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = True
+        self._last_prune = 0.0
+
+        # Create the schema up front so readers never see a half-initialised file
+        connection = self._connect()
+        migrate(connection)
+        connection.close()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')  # WAL stays consistent; at worst the last batch is lost
+        return connection
+
+    def add(self, detection):
+        """Queue one detection dict (as published to the ring) for the next batch"""
+        with self._lock:
+            self._pending.append(detection)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        connection = self._connect()
+        try:
+            while self._running:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self._flush(connection)
+            self._flush(connection)
+        finally:
+            connection.close()
+
+    def _flush(self, connection):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        rows = []
+        zone_counts = Counter()
+        heat = {}
+        for detection in batch:
+            timestamp = float(detection['timestamp'])
+            zone = str(detection.get('zone') or '')
+            camera_id = str(detection.get('camera_id') or '')
+            bbox = detection.get('bbox') or (None, None, None, None)
+            frame_size = detection.get('frame_size') or (None, None)
+            rows.append((timestamp, zone, camera_id, detection.get('track_id'), int(detection['x']), int(detection['y']),
+                         detection.get('area'), bbox[0], bbox[1], bbox[2], bbox[3],
+                         frame_size[0], frame_size[1]))
+            for resolution in COUNT_RESOLUTIONS:
+                zone_counts[(resolution, int(timestamp // resolution), zone, camera_id)] += 1
+            cell = heat_cell(detection)
+            if cell is not None:
+                times, cells = heat.setdefault(camera_id, ([], []))
+                times.append(timestamp)
+                cells.append(cell)
+
+        try:
+            with connection:
+                # The first insert takes the write lock, so the grid read-modify-writes below can't interleave
+                # with another writer process
+                connection.executemany('INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                connection.executemany(
+                    'INSERT INTO zone_counts VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (resolution, bucket, zone, camera_id) DO UPDATE SET count = count + excluded.count',
+                    [key + (count,) for key, count in zone_counts.items()])
+                for camera_id, (times, cells) in heat.items():
+                    self._add_heat(connection, camera_id, np.array(times), np.array(cells, dtype=np.int64))
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            print(f"Error storing {len(rows)} detections: {e}")
+
+        if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+            self._last_prune = time.monotonic()
+            try:
+                with connection:
+                    connection.execute('DELETE FROM detections WHERE timestamp < ?',
+                                       (time.time() - self.retention_seconds,))
+            except sqlite3.Error as e:
+                print(f"Error pruning detections: {e}")
+
+    def _add_heat(self, connection, camera_id, times, cells):
+        cell_count = HEATMAP_GRID[0] * HEATMAP_GRID[1]
+        for resolution in HEATMAP_RESOLUTIONS:
+            buckets = (times // resolution).astype(np.int64)
+            for bucket in np.unique(buckets).tolist():
+                grid = np.bincount(cells[buckets == bucket], minlength=cell_count).astype(HEATMAP_DTYPE)
+                row = connection.execute('SELECT grid FROM heat_grids WHERE resolution = ? AND bucket = ? '
+                                         'AND camera_id = ?', (resolution, bucket, camera_id)).fetchone()
+                if row is not None:
+                    grid += np.frombuffer(row[0], dtype=HEATMAP_DTYPE)
+                connection.execute('INSERT OR REPLACE INTO heat_grids VALUES (?, ?, ?, ?)',
+                                   (resolution, bucket, camera_id, grid.tobytes()))
+
+    def close(self):
+        self._running = False
+        self._wake.set()
+        self._thread.join()
+
+
+class DetectionHistory:
+    """Read-only queries over a DetectionStore database"""
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+
+    def _connect(self):
+        """Fresh read-only connection (cheap, and safe from any request thread), or None if no store yet"""
+        if not os.path.exists(self.path):
+            return None
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def _query(self, sql, params=()):
+        connection = self._connect()
+        if connection is None:
+            return []
+        try:
+            return connection.execute(sql, params).fetchall()
+        except sqlite3.OperationalError:
+            # Store created but schema not committed yet
+            return []
+        finally:
+            connection.close()
+
+    def detections(self, start, end, zone=None, camera_id=None, limit=1000):
+        """Raw detections with start <= timestamp < end, oldest first; limit is clamped to 1..MAX_RANGE_ROWS"""
+        sql = ('SELECT timestamp, zone, camera_id, track_id, x, y, area, bbox_x, bbox_y, bbox_w, bbox_h '
+               'FROM detections WHERE timestamp >= ? AND timestamp < ?')
+        params = [start, end]
+        if zone is not None:
+            sql += ' AND zone = ?'
+            params.append(zone)
+        if camera_id is not None:
+            sql += ' AND camera_id = ?'
+            params.append(camera_id)
+        sql += ' ORDER BY timestamp LIMIT ?'
+        params.append(max(1, min(int(limit), MAX_RANGE_ROWS)))  # SQLite reads a negative LIMIT as no limit
+        return [{'timestamp': row[0], 'zone': row[1] or None, 'camera_id': row[2] or None, 'track_id': row[3],
+                 'x': row[4], 'y': row[5], 'area': row[6], 'bbox': list(row[7:11])}
+                for row in self._query(sql, params)]
+
+    def zone_totals(self, start, end, camera_id=None):
+        """{zone: detections} over [start, end), to minute precision, for all cameras or one"""
+        totals = Counter()
+        start, end = aligned_range(start, end, COUNT_RESOLUTIONS[-1])
+        for resolution, first, last in cover_range(start, end, COUNT_RESOLUTIONS):
+            sql = 'SELECT zone, SUM(count) FROM zone_counts WHERE resolution = ? AND bucket >= ? AND bucket < ?'
+            params = [resolution, first, last]
+            if camera_id is not None:
+                sql += ' AND camera_id = ?'
+                params.append(camera_id)
+            for zone, count in self._query(sql + ' GROUP BY zone', params):
+                totals[zone] += count
+        return dict(totals)
+
+    def series_resolution(self, start, end, bucket='hour'):
+        """Requested bucket size, coarsened until the range fits in MAX_SERIES_BUCKETS"""
+        resolution = BUCKETS[bucket]
+        for candidate in sorted(BUCKETS.values()):
+            if candidate >= resolution and (end - start) / candidate <= MAX_SERIES_BUCKETS:
+                return candidate
+        return max(BUCKETS.values())
+
+    def counts(self, start, end, resolution, zone=None, camera_id=None):
+        """[(bucket start time, zone, count)] for every non-empty bucket overlapping [start, end)"""
+        first, last = int(start // resolution), int(-(-end // resolution))
+        sql = 'SELECT bucket, zone, SUM(count) FROM zone_counts WHERE resolution = ? AND bucket >= ? AND bucket < ?'
+        params = [resolution, first, last]
+        if zone is not None:
+            sql += ' AND zone = ?'
+            params.append(zone)
+        if camera_id is not None:
+            sql += ' AND camera_id = ?'
+            params.append(camera_id)
+        return [(bucket * resolution, bucket_zone, count)
+                for bucket, bucket_zone, count in self._query(sql + ' GROUP BY bucket, zone ORDER BY bucket', params)]
+
+    def heatmap(self, start, end, columns=HEATMAP_GRID[0], camera_id=None):
+        """Detections per cell over [start, end), to hour precision, summed down to `columns` across"""
+        full_columns, full_rows = HEATMAP_GRID
+        if columns <= 0 or full_columns % columns:
+            raise ValueError(f"columns must divide {full_columns}")
+        factor = full_columns // columns
+        if full_rows % factor:
+            raise ValueError(f"columns must keep whole cells down the {full_rows}-row grid")
+
+        grid = np.zeros(full_columns * full_rows, dtype=np.int64)
+        start, end = aligned_range(start, end, HEATMAP_RESOLUTIONS[-1])
+        for resolution, first, last in cover_range(start, end, HEATMAP_RESOLUTIONS):
+            sql = 'SELECT grid FROM heat_grids WHERE resolution = ? AND bucket >= ? AND bucket < ?'
+            params = [resolution, first, last]
+            if camera_id is not None:
+                sql += ' AND camera_id = ?'
+                params.append(camera_id)
+            for (blob,) in self._query(sql, params):
+                grid += np.frombuffer(blob, dtype=HEATMAP_DTYPE)
+        grid = grid.reshape(full_rows // factor, factor, columns, factor).sum(axis=(1, 3))
+        return grid
@@ -0,0 +1,370 @@
+"""
+Per-frame motion detection: background subtraction, mask cleanup, contour
+filtering and box merging. Shared by the live tracker and offline tools.
+
+A background model learned from scratch calls the whole first frame motion
+and learns anything already in view into the background, so the detector
+reports `ready` only once the model has converged. Given a background_path
+it keeps a BackgroundSnapshot of the scene up to date and, on startup,
+warm-starts the model from it: the seeded model runs at the learning rate
+of one that has seen `history` frames and is ready from the first live
+frame, unless that frame shows the snapshot no longer matches the scene.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from motion_tracker.background import (BACKGROUND_SAMPLE_STRIDE, BACKGROUND_SAVE_INTERVAL, MIN_SPREAD_SAMPLES,
+                                       BackgroundSnapshot)
+from motion_tracker.box_clustering import merge_boxes
+
+# Adjusted sensitivity parameters
+MOTION_THRESHOLD = 50  # Higher = less sensitive to small movements
+PROXIMITY_THRESHOLD = 100  # Distance threshold for merging boxes
+PROXIMITY = 15  # Morphological closing kernel size (smaller = less aggressive merging)
+HISTORY = 200  # Number of frames to build background model
+MIN_CONTOUR_AREA = 2000  # Minimum area for valid detection (increased)
+MIN_BOX_SIDE = 30  # Minimum box width/height in full-resolution pixels
+DOWNSCALE = 1.0  # Process frames at 1/DOWNSCALE resolution
+COLD_READY_FRAMES = 50  # Frames a model learned from scratch needs before its detections count
+MAX_FOREGROUND = 0.3  # A model calling more of the view than this foreground hasn't learned the scene
+
+# Mask cleanup modes
+EXACT_MASK = 'exact'  # Elliptical open -> close(15) -> close(25) -> blur -> threshold
+FAST_MASK = 'fast'  # The two closings fused into one rectangular (separable) closing
+MASK_MODES = (EXACT_MASK, FAST_MASK)
+MASK_MODE = EXACT_MASK
+FAST_CLOSE_SIZE = 21  # Rectangle a little smaller than the 25 px ellipse so its corners don't bridge gaps
+
+
+def scaled_kernel_size(size, downscale):
+    """Odd kernel size covering the same full-resolution extent at a lower resolution"""
+    scaled = max(1, int(round(size / downscale)))
+    return scaled if scaled % 2 else scaled + 1
+
+
+class MotionDetector:
+    """Turns camera frames into a cleaned foreground mask and merged detections"""
+
+    def __init__(self, motion_threshold=MOTION_THRESHOLD, history=HISTORY,
+                 proximity=PROXIMITY, proximity_threshold=PROXIMITY_THRESHOLD,
+                 min_contour_area=MIN_CONTOUR_AREA, downscale=DOWNSCALE, zone_provider=None,
+                 mask_mode=MASK_MODE, background_path=None, verbose=True):
+        if mask_mode not in MASK_MODES:
+            raise ValueError(f"Unknown mask mode: {mask_mode}")
+        self.mask_mode = mask_mode
+        self.motion_threshold = motion_threshold
+        self.history = history
+        self.proximity_threshold = proximity_threshold
+        self.min_contour_area = min_contour_area
+        self.downscale = max(1.0, float(downscale))
+        self.verbose = verbose  # Report background model start-up; off in batch workers
+
+        # zone_provider(width, height) returns the ZoneSet to gate on, or None
+        self.zone_provider = zone_provider
+        self.zones = None
+        self.roi = None
+        self._work_size = None
+
+        # Background snapshot kept at background_path for warm starts (None disables them)
+        self.background_path = background_path
+        self._snapshot = None
+        self._last_sample = 0
+        self._last_save = time.monotonic()
+
+        self.backSub = self._create_background_model()
+        self._reset_readiness()
+
+        # Morphological operations kernels - adjusted sizes, scaled to the working resolution
+        open_size = scaled_kernel_size(5, self.downscale)
+        close_size = scaled_kernel_size(proximity, self.downscale)
+        close_large_size = scaled_kernel_size(25, self.downscale)
+        self.blur_size = scaled_kernel_size(9, self.downscale)
+        self.kernel_open = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (open_size, open_size))  # Slightly larger for better noise removal
+        self.kernel_close = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (close_size, close_size))
+
+        # Additional kernel for more aggressive closing if needed
+        self.kernel_close_large = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (close_large_size, close_large_size))
+        fast_close_size = scaled_kernel_size(FAST_CLOSE_SIZE, self.downscale)
+        self.kernel_close_fast = cv2.getStructuringElement(cv2.MORPH_RECT, (fast_close_size, fast_close_size))
+        self._stages = self.mask_stages()
+        self._buffers = [None, None, None]  # MOG2 output + two ping-pong buffers, reused every frame
+
+    def _create_background_model(self):
+        # Create background subtractor with adjusted parameters
+        return cv2.createBackgroundSubtractorMOG2(
+            detectShadows=True,
+            varThreshold=self.motion_threshold,  # Higher = less sensitive
+            history=self.history
+        )
+
+    def _reset_readiness(self):
+        self.ready = False
+        self.warm = False  # Seeded from a snapshot rather than learned from scratch
+        self.model_frames = 0  # Frames the current model has learned, including seed and skipped frames
+        self.ready_frames = None  # Live frames it took to become ready
+        self._live_frames = 0
+        self._learning_rate = -1  # MOG2's automatic rate, 1/min(frames, history)
+        self._verify_seed = False
+
+    def warm_start(self, snapshot):
+        """Seed a fresh background model from a BackgroundSnapshot of the current working view.
+
+        Returns False, leaving the model learning from scratch, if the snapshot is None or
+        was taken of a different region or size.
+        """
+        if snapshot is None or self.roi is None or not snapshot.fits(self.roi, self._work_size):
+            return False
+        self.backSub = self._create_background_model()
+        self._reset_readiness()
+        for seed in snapshot.seed_frames():
+            self.backSub.apply(seed)
+            self.model_frames += 1
+        # MOG2 would keep learning at 1/(seed frames), fast enough to absorb a cat
+        # sitting in view, so carry on at the rate of a model that has seen `history` frames
+        self._learning_rate = 1.0 / self.history
+        self.warm = True
+        self._verify_seed = True
+        self._snapshot = snapshot
+        self._last_sample = self.model_frames
+        return True
+
+    def _start_model(self):
+        """Fresh model for the current working view, warm-started when a stored snapshot fits it"""
+        self._reset_readiness()
+        self._snapshot = BackgroundSnapshot(self.roi, self._work_size)
+        self._last_sample = 0
+        if self.background_path and self.warm_start(BackgroundSnapshot.load(self.background_path)) and self.verbose:
+            print(f"Background model warm-started from {self.background_path}")
+
+    def _check_ready(self, raw):
+        """Decide from a raw MOG2 mask whether the model has converged"""
+        self._live_frames += 1
+        foreground = cv2.countNonZero(raw) / raw.size
+        if self._verify_seed:
+            self._verify_seed = False
+            if foreground > MAX_FOREGROUND:
+                # The camera moved or the light changed since the snapshot
+                if self.verbose:
+                    print(f"Stored background covers only {1 - foreground:.0%} of the scene, learning it from scratch")
+                self.backSub = self._create_background_model()
+                self._reset_readiness()
+                self._snapshot = BackgroundSnapshot(self.roi, self._work_size)
+                return
+        elif self.model_frames < self.history and (self.model_frames < COLD_READY_FRAMES or
+                                                   foreground > MAX_FOREGROUND):
+            return
+        self.ready = True
+        self.ready_frames = self._live_frames
+        if self.verbose:
+            print(f"Background model ready after {self.ready_frames} frame(s) ({'warm' if self.warm else 'cold'} start)")
+
+    def _keep_background(self, view):
+        """Fold a quiet frame into the background snapshot now and then, and write it periodically"""
+        if self.model_frames - self._last_sample < BACKGROUND_SAMPLE_STRIDE:
+            return
+        self._last_sample = self.model_frames
+        self._snapshot.add(view, self.backSub.getBackgroundImage())
+        if time.monotonic() - self._last_save >= BACKGROUND_SAVE_INTERVAL:
+            self.save_background()
+
+    def save_background(self):
+        """Write the background snapshot to background_path if it has enough samples"""
+        self._last_save = time.monotonic()
+        if not self.background_path or self._snapshot is None or self._snapshot.samples < MIN_SPREAD_SAMPLES:
+            return False
+        return self._snapshot.save(self.background_path)
+
+    def mask_stages(self):
+        """Ordered (name, function(src, dst)) cleanup stages applied after background subtraction"""
+        if self.mask_mode == FAST_MASK:
+            # closing with the 15 px ellipse then the 25 px one is, up to rounding, the 25 px
+            # closing alone, and a rectangle closes as a cheap row pass plus a column pass
+            closings = [('close', lambda m, d: cv2.morphologyEx(m, cv2.MORPH_CLOSE, self.kernel_close_fast, dst=d))]
+        else:
+            # Multiple closing operations with different kernel sizes
+            closings = [
+                ('close', lambda m, d: cv2.morphologyEx(m, cv2.MORPH_CLOSE, self.kernel_close, dst=d)),
+                ('close_large', lambda m, d: cv2.morphologyEx(m, cv2.MORPH_CLOSE, self.kernel_close_large, dst=d)),
+            ]
+        return [
+            # Opening removes noise (small white spots)
+            ('open', lambda m, d: cv2.morphologyEx(m, cv2.MORPH_OPEN, self.kernel_open, dst=d)),
+            *closings,
+            # Gaussian blur for smoothing
+            ('blur', lambda m, d: cv2.GaussianBlur(m, (self.blur_size, self.blur_size), 0, dst=d)),
+            # Re-threshold with higher threshold for stricter detection
+            ('threshold', lambda m, d: cv2.threshold(m, 200, 255, cv2.THRESH_BINARY, dst=d)[1]),
+        ]
+
+    def _buffer(self, index, shape):
+        buffer = self._buffers[index]
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[index] = np.empty(shape, dtype=np.uint8)
+        return buffer
+
+    def clean_mask(self, fgMask, timings=None):
+        """Run the cleanup stages on a raw MOG2 mask
+
+        Intermediate results go to reused buffers; only the returned mask is
+        newly allocated, since the pipeline hands it on to another thread.
+        """
+        last = len(self._stages) - 1
+        for index, (name, stage) in enumerate(self._stages):
+            dst = None if index == last else self._buffer(1 + index % 2, fgMask.shape)
+            if timings is None:
+                fgMask = stage(fgMask, dst)
+            else:
+                start = time.perf_counter()
+                fgMask = stage(fgMask, dst)
+                timings[name] = time.perf_counter() - start
+        return fgMask
+
+    def foreground_mask(self, frame, timings=None):
+        """Background subtraction followed by the morphology/blur/threshold cleanup
+
+        When a timings dict is passed, each stage's duration in seconds is
+        stored under its name.
+        """
+        raw = self._buffer(0, frame.shape[:2])
+        if timings is None:
+            fgMask = self.backSub.apply(frame, fgmask=raw, learningRate=self._learning_rate)
+        else:
+            start = time.perf_counter()
+            fgMask = self.backSub.apply(frame, fgmask=raw, learningRate=self._learning_rate)
+            timings['mog2'] = time.perf_counter() - start
+        self.model_frames += 1
+        if not self.ready:
+            self._check_ready(fgMask)
+        return self.clean_mask(fgMask, timings)
+
+    def update_background(self, view, learning_rate, frames=1):
+        """Feed a working-view frame to the background model without detecting anything
+
+        Used when frames are skipped: learning_rate should cover the skipped
+        frames too (see AdaptiveScheduler.background_rate), and frames says
+        how many that was.
+        """
+        self.backSub.apply(view, learningRate=learning_rate)
+        self.model_frames += frames
+        if self.ready and self.background_path:
+            self._keep_background(view)
+
+    def find_boxes(self, fgMask, timings=None):
+        """Find, filter and merge motion boxes as [x1, y1, x2, y2]"""
+        start = time.perf_counter()
+
+        # Find contours
+        contours, _ = cv2.findContours(fgMask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        # Size limits are in full-resolution pixels; convert them to the working resolution
+        scale = self.downscale
+        min_area = self.min_contour_area / (scale * scale)
+        min_side = MIN_BOX_SIDE / scale
+
+        # Create bounding boxes from contours with a large enough area
+        bounding_boxes = []
+        for contour in contours:
+            if cv2.contourArea(contour) <= min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            # Additional filtering based on aspect ratio and size
+            aspect_ratio = w / h if h > 0 else 0
+            if w > min_side and h > min_side and 0.2 < aspect_ratio < 5.0:  # Filter unrealistic shapes
+                bounding_boxes.append([x, y, x + w, y + h])
+
+        if timings is not None:
+            timings['contours'] = time.perf_counter() - start
+            start = time.perf_counter()
+
+        # Merge nearby boxes with improved algorithm
+        merged = merge_boxes(bounding_boxes, self.proximity_threshold / scale)
+        if timings is not None:
+            timings['merge'] = time.perf_counter() - start
+        return self._to_frame_coordinates(merged)
+
+    def _to_frame_coordinates(self, boxes):
+        """Map working-resolution boxes back to full-resolution frame coordinates"""
+        if self.roi is None:
+            return boxes
+        ox, oy = self.roi[0], self.roi[1]
+        scale = self.downscale
+        return [[int(round(x1 * scale)) + ox, int(round(y1 * scale)) + oy,
+                 int(round(x2 * scale)) + ox, int(round(y2 * scale)) + oy]
+                for x1, y1, x2, y2 in boxes]
+
+    def _update_zones(self, width, height):
+        """Pick up the current zones and reset the background model if the working area changed"""
+        zones = self.zone_provider(width, height) if self.zone_provider else None
+        if zones is self.zones and self.roi is not None:
+            return
+        self.zones = zones
+
+        previous_roi = self.roi
+        self.roi = zones.roi if zones else (0, 0, width, height)
+        x1, y1, x2, y2 = self.roi
+        work_size = (max(1, int(round((x2 - x1) / self.downscale))),
+                     max(1, int(round((y2 - y1) / self.downscale))))
+        first = self._work_size is None
+        # A zone moved to a new spot at the same size still needs a model of the new crop
+        changed = work_size != self._work_size or self.roi != previous_roi
+        if not first and changed:
+            self.backSub = self._create_background_model()
+        if first or changed:
+            self._work_size = work_size
+            self._start_model()
+
+    def working_view(self, frame):
+        """Crop the frame to the zones' region of interest and downscale it"""
+        height, width = frame.shape[:2]
+        self._update_zones(width, height)
+        x1, y1, x2, y2 = self.roi
+        view = frame[y1:y2, x1:x2]
+        if self.downscale > 1.0:
+            view = cv2.resize(view, self._work_size, interpolation=cv2.INTER_AREA)
+        return view
+
+    def detections_from_boxes(self, merged_boxes):
+        """Convert merged boxes into detection dicts in the queue format"""
+        detections = []
+        for x1, y1, x2, y2 in merged_boxes:
+            x, y, w, h = x1, y1, x2 - x1, y2 - y1
+            area = w * h
+
+            # Additional size filter after merging
+            if area <= self.min_contour_area:
+                continue
+
+            detection = {
+                'type': 'motion',
+                'x': x + w // 2,
+                'y': y + h // 2,
+                'area': area,
+                'bbox': [x, y, w, h]
+            }
+
+            # Only report motion whose center lies inside an active zone
+            if self.zones:
+                zone = self.zones.zone_at(detection['x'], detection['y'])
+                if zone is None:
+                    continue
+                detection['zone'] = zone
+            detections.append(detection)
+        return detections
+
+    def process(self, frame, timings=None):
+        """Run the full per-frame pipeline and return (mask, detections)"""
+        if timings is None:
+            view = self.working_view(frame)
+        else:
+            start = time.perf_counter()
+            view = self.working_view(frame)
+            timings['roi'] = time.perf_counter() - start
+
+        fgMask = self.foreground_mask(view, timings)
+        detections = self.detections_from_boxes(self.find_boxes(fgMask, timings))
+        if self.ready and self.background_path and not detections:
+            self._keep_background(view)
+        return fgMask, detections
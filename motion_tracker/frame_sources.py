@@ -0,0 +1,210 @@
+"""
+Frame sources for the tracker.
+
+Every source follows the cv2.VideoCapture calling convention
+(read() -> (ret, frame), isOpened(), release()) so the detection loop does
+not care whether frames come from a camera, a recording, a folder of images
+or a generator. Sources set `live` to tell the pipeline whether stale frames
+may be dropped (camera) or every frame must be processed (recordings).
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+# Source spec constants
+CAMERA_PREFIX = 'camera:'
+BROKER_SPEC = 'broker'  # Bare or followed by :PATH, never a file name starting with it
+SYNTHETIC_SPEC = 'synthetic'  # Bare or followed by :FRAMES
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+# Synthetic scene defaults
+SYNTHETIC_WIDTH = 640
+SYNTHETIC_HEIGHT = 480
+SYNTHETIC_FRAMES = 600
+SYNTHETIC_BLOBS = 2
+LIGHTING_PERIOD = 300  # Frames per slow brightness cycle
+LIGHTING_STEP = 40  # Brightness jump when the "lights turn on"
+
+
+class CameraSource:
+    """Live camera through cv2.VideoCapture"""
+
+    live = True
+
+    def __init__(self, index=0, width=None, height=None):
+        self.cap = cv2.VideoCapture(index)
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(CameraSource):
+    """Recorded video, decoded as fast as the pipeline consumes it"""
+
+    live = False
+
+    def __init__(self, path):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+
+
+class ImageDirectorySource:
+    """Sorted image files from a directory, one frame per file"""
+
+    live = False
+
+    def __init__(self, path):
+        self.path = path
+        self.files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.position = 0
+
+    def isOpened(self):
+        return bool(self.files)
+
+    def read(self):
+        while self.position < len(self.files):
+            frame = cv2.imread(self.files[self.position])
+            self.position += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def release(self):
+        self.position = len(self.files)
+
+
+class SyntheticSource:
+    """Deterministic moving blobs over a static textured background
+
+    Optional per-pixel sensor noise, a slow brightness cycle and a sudden
+    brightness step exercise the background model. After each read,
+    `ground_truth` holds the [x, y, w, h] box of every blob in that frame.
+    """
+
+    live = False
+
+    def __init__(self, width=SYNTHETIC_WIDTH, height=SYNTHETIC_HEIGHT,
+                 n_frames=SYNTHETIC_FRAMES, n_blobs=SYNTHETIC_BLOBS, seed=0,
+                 noise=0.0, lighting=0.0, lighting_step_frame=None):
+        self.width = width
+        self.height = height
+        self.n_frames = n_frames
+        self.noise = noise
+        self.lighting = lighting
+        self.lighting_step_frame = lighting_step_frame
+        self.frame_index = 0
+        self.released = False
+        self.ground_truth = []
+
+        rng = np.random.default_rng(seed)
+        self.rng = rng
+        self.background = rng.integers(40, 120, (height, width, 3), dtype=np.uint8)
+        self.background = cv2.GaussianBlur(self.background, (15, 15), 0)
+
+        self.sizes = rng.integers(50, 110, (n_blobs, 2))
+        self.positions = rng.uniform([0, 0], [width, height], (n_blobs, 2))
+        self.velocities = rng.uniform(-6, 6, (n_blobs, 2))
+
+    def isOpened(self):
+        return True
+
+    def _step(self):
+        """Advance blobs, bouncing off the frame edges"""
+        self.positions += self.velocities
+        limits = np.array([self.width, self.height]) - self.sizes
+        for axis in range(2):
+            out = (self.positions[:, axis] < 0) | (self.positions[:, axis] > limits[:, axis])
+            self.velocities[out, axis] *= -1
+            self.positions[:, axis] = np.clip(self.positions[:, axis], 0, limits[:, axis])
+
+    def read(self):
+        if self.released or (self.n_frames is not None and self.frame_index >= self.n_frames):
+            return False, None
+
+        frame = self.background.copy()
+        self.ground_truth = []
+        for (x, y), (w, h) in zip(self.positions.astype(int), self.sizes):
+            cv2.ellipse(frame, (int(x + w // 2), int(y + h // 2)), (int(w // 2), int(h // 2)),
+                        0, 0, 360, (200, 200, 210), -1)
+            self.ground_truth.append([int(x), int(y), int(w), int(h)])
+
+        offset = 0.0
+        if self.lighting:
+            offset += self.lighting * 255 * np.sin(2 * np.pi * self.frame_index / LIGHTING_PERIOD)
+        if self.lighting_step_frame is not None and self.frame_index >= self.lighting_step_frame:
+            offset += LIGHTING_STEP
+        if self.noise or offset:
+            frame = frame.astype(np.float32) + offset
+            if self.noise:
+                frame += self.rng.normal(0, self.noise, frame.shape).astype(np.float32)
+            frame = np.clip(frame, 0, 255).astype(np.uint8)
+
+        self._step()
+        self.frame_index += 1
+        return True, frame
+
+    def release(self):
+        self.released = True
+
+
+def _spec_is(spec, name):
+    """Whether spec is `name` on its own or `name:ARGUMENT`"""
+    return spec == name or spec.startswith(name + ':')
+
+
+def _attach_broker(path):
+    """Broker client, or an unopened capture if no broker has created its frame file"""
+    from motion_tracker.camera_broker import SharedFrameClient
+    try:
+        # Copies (the default): a tracker frame can outlive its broker slot in the capture queue
+        return SharedFrameClient(path or None)
+    except (OSError, ValueError) as e:
+        print(f"Error attaching to camera broker: {e}")
+        return cv2.VideoCapture()
+
+
+def open_source(spec):
+    """Build a frame source from a spec string
+
+    'camera:N' or 'N' opens a camera, 'broker' or 'broker:PATH' attaches to a
+    running camera broker, 'synthetic' or 'synthetic:FRAMES' a generated
+    scene, a directory an image sequence and anything else a video file.
+    Raises ValueError for a malformed camera index or frame count.
+    """
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if spec.startswith(CAMERA_PREFIX):
+        index = spec[len(CAMERA_PREFIX):]
+        if not index.isdigit():
+            raise ValueError(f"Camera index must be a whole number: {spec}")
+        return CameraSource(int(index))
+    if _spec_is(spec, BROKER_SPEC):
+        return _attach_broker(spec.partition(':')[2])
+    if _spec_is(spec, SYNTHETIC_SPEC):
+        _, _, frames = spec.partition(':')
+        if frames and not frames.isdigit():
+            raise ValueError(f"Synthetic frame count must be a whole number: {spec}")
+        return SyntheticSource(n_frames=int(frames) if frames else SYNTHETIC_FRAMES)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec)
+    return VideoFileSource(spec)
+
+
+def is_live_spec(spec):
+    """Whether open_source(spec) gives a live source (a camera or the broker) rather than a recording"""
+    return spec.isdigit() or spec.startswith(CAMERA_PREFIX) or _spec_is(spec, BROKER_SPEC)
@@ -0,0 +1,309 @@
+"""
+Latency histograms, counters and gauges for the tracker, sprayer and backend.
+
+LatencyHistogram counts samples into fixed, log-spaced buckets, so memory
+is constant no matter how long the process runs and percentiles are read
+straight from the cumulative counts. Bucket bounds are in seconds and the
+layout matches what a Prometheus histogram exposes.
+
+A MetricsRegistry holds a process's metrics. Its timer() context manager
+is a shared no-op object when the registry is disabled, so instrumented
+code costs one attribute check. Each process periodically writes its
+registry snapshot to a JSON file in shared memory; the backend merges
+those files with its own registry and renders them as Prometheus text on
+/api/metrics.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+# Histogram constants
+LATENCY_BUCKETS = tuple(float(b) for b in np.round(np.geomspace(0.00005, 10.0, 54), 7))  # 50 us .. 10 s
+PERCENTILES = (50, 90, 99)
+
+# Export constants
+METRIC_PREFIX = 'cat_tracker_'
+SNAPSHOT_INTERVAL = 5.0  # Seconds between snapshot file writes
+TRACKER_METRICS_NAME = 'cat_tracker_metrics.json'
+SPRAYER_METRICS_NAME = 'cat_tracker_sprayer_metrics.json'
+CAMERA_HEALTH_NAME = 'cat_tracker_cameras.json'  # Written by the multi-camera supervisor
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with percentile estimates"""
+
+    def __init__(self, name, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self.bounds = np.asarray(buckets, dtype=np.float64)
+        self.counts = np.zeros(len(self.bounds) + 1, dtype=np.int64)  # Last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        # bisect on a tuple is several times cheaper than numpy for one scalar
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, p):
+        """p-th percentile in seconds, interpolated within its bucket like histogram_quantile()"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            cumulative = np.cumsum(self.counts)
+            target = self.count * p / 100.0
+            rank = int(np.searchsorted(cumulative, target, side='left'))
+            if rank >= len(self.bounds):
+                return self.max
+            lower = float(self.bounds[rank - 1]) if rank else 0.0
+            below = float(cumulative[rank - 1]) if rank else 0.0
+            fraction = (target - below) / self.counts[rank] if self.counts[rank] else 1.0
+            return min(lower + (float(self.bounds[rank]) - lower) * fraction, self.max)
+
+    def snapshot(self):
+        """Counts and summary statistics as a JSON-friendly dict"""
+        with self._lock:
+            counts = self.counts.tolist()
+            count, total, peak = self.count, self.total, self.max
+        summary = {f"p{p}_ms": round(self.percentile(p) * 1000, 2) for p in PERCENTILES}
+        summary.update({
+            'count': count,
+            'mean_ms': round(total / count * 1000, 2) if count else 0.0,
+            'max_ms': round(peak * 1000, 2),
+            'buckets': list(zip(self.bounds.tolist() + [float('inf')], counts)),
+        })
+        return summary
+
+    def summary(self):
+        if not self.count:
+            return f"{self.name}: no samples"
+        return (f"{self.name}: n={self.count}, p50 {self.percentile(50) * 1000:.1f} ms, "
+                f"p99 {self.percentile(99) * 1000:.1f} ms, max {self.max * 1000:.1f} ms")
+
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """Last-set value"""
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """Named, labelled metrics for one process"""
+
+    def __init__(self, process, enabled=True, labels=None):
+        self.process = process
+        self.enabled = enabled
+        # Added to every metric in the snapshot, e.g. the camera of one tracker among several
+        self.labels = dict(labels or {})
+        self.help = {}
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def _get(self, table, factory, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = table.get(key)
+        if metric is None:
+            with self._lock:
+                metric = table.setdefault(key, factory())
+        return metric
+
+    def histogram(self, name, **labels):
+        return self._get(self._histograms, lambda: LatencyHistogram(name), name, labels)
+
+    def counter(self, name, **labels):
+        return self._get(self._counters, Counter, name, labels)
+
+    def gauge(self, name, **labels):
+        return self._get(self._gauges, Gauge, name, labels)
+
+    def timer(self, name, **labels):
+        """Context manager that observes its duration; free when the registry is disabled"""
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self.histogram(name, **labels))
+
+    def observe(self, name, seconds, **labels):
+        if self.enabled:
+            self.histogram(name, **labels).observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        if self.enabled:
+            self.counter(name, **labels).inc(amount)
+
+    def set_gauge(self, name, value, **labels):
+        if self.enabled:
+            self.gauge(name, **labels).set(value)
+
+    def histograms(self, name):
+        """(labels, histogram) pairs registered under a name"""
+        return [(dict(labels), h) for (n, labels), h in list(self._histograms.items()) if n == name]
+
+    def stage_summary(self, name, label='stage'):
+        """One-line p50/p99 summary of a labelled histogram, e.g. "mog2 4.1/9.8" per label"""
+        parts = []
+        for labels, histogram in self.histograms(name):
+            if histogram.count:
+                parts.append(f"{labels.get(label, name)} {histogram.percentile(50) * 1000:.1f}/"
+                             f"{histogram.percentile(99) * 1000:.1f}")
+        return ', '.join(parts) + ' ms (p50/p99)' if parts else 'no samples'
+
+    def snapshot(self):
+        """All metrics as a JSON-friendly dict (the format written to snapshot files)"""
+        metrics = []
+        for (name, labels), histogram in list(self._histograms.items()):
+            with histogram._lock:
+                counts = histogram.counts.tolist()
+                total, count = histogram.total, histogram.count
+            metrics.append({'name': name, 'type': 'histogram', 'labels': dict(labels, **self.labels),
+                            'bounds': list(histogram.buckets), 'counts': counts,
+                            'sum': total, 'count': count})
+        for (name, labels), counter in list(self._counters.items()):
+            metrics.append({'name': name, 'type': 'counter', 'labels': dict(labels, **self.labels),
+                            'value': counter.value})
+        for (name, labels), gauge in list(self._gauges.items()):
+            metrics.append({'name': name, 'type': 'gauge', 'labels': dict(labels, **self.labels),
+                            'value': gauge.value})
+        return {'process': self.process, 'labels': self.labels, 'pid': os.getpid(), 'timestamp': time.time(),
+                'help': dict(self.help), 'metrics': metrics}
+
+
+def default_metrics_path(name):
+    """Snapshot file location, next to the detection ring in shared memory"""
+    from motion_tracker.detection_ring import default_ring_path
+    return default_ring_path(name)
+
+
+def write_snapshot(path, snapshot):
+    """Atomically replace a snapshot file so readers never see a partial document"""
+    try:
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temp, path)
+    except Exception as e:
+        print(f"Error writing metrics snapshot: {e}")
+
+
+def read_snapshot(path):
+    """Load a snapshot file, or None if it is missing or unreadable"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _format_labels(labels, extra=None):
+    items = dict(labels)
+    if extra:
+        items.update(extra)
+    if not items:
+        return ''
+    pairs = []
+    for key, value in sorted(items.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(snapshots, prefix=METRIC_PREFIX):
+    """Render registry snapshots in the Prometheus text exposition format"""
+    families = {}
+    help_text = {}
+    for snapshot in snapshots:
+        if not snapshot:
+            continue
+        help_text.update(snapshot.get('help', {}))
+        for metric in snapshot['metrics']:
+            families.setdefault((metric['name'], metric['type']), []).append(metric)
+        # Lets a scraper spot a process that stopped updating its snapshot
+        families.setdefault(('snapshot_age_seconds', 'gauge'), []).append({
+            'labels': dict(snapshot.get('labels', {}), process=snapshot['process']),
+            'value': round(max(0.0, time.time() - snapshot['timestamp']), 3),
+        })
+
+    lines = []
+    for (name, kind), metrics in sorted(families.items()):
+        full = prefix + name
+        if name in help_text:
+            lines.append(f"# HELP {full} {help_text[name]}")
+        lines.append(f"# TYPE {full} {kind}")
+        for metric in metrics:
+            labels = metric['labels']
+            if kind != 'histogram':
+                lines.append(f"{full}{_format_labels(labels)} {_format_value(metric['value'])}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric['bounds'] + [float('inf')], metric['counts']):
+                cumulative += count
+                lines.append(f"{full}_bucket{_format_labels(labels, {'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{full}_sum{_format_labels(labels)} {_format_value(float(metric['sum']))}")
+            lines.append(f"{full}_count{_format_labels(labels)} {metric['count']}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,240 @@
+"""
+Cached marker overlay for the motion-processor viewer.
+
+Markers only change when the detection window does (a detection arrives or
+ages out), but the viewer shows every camera frame. Once a window has
+lasted OVERLAY_BUILD_AFTER frames, MarkerOverlay draws the trails, boxes and
+labels into a premultiplied colour layer plus an alpha layer, notes which
+tiles of the frame each marker touched, and from then on blends just those tiles onto
+each frame with OpenCV's saturating arithmetic until the window changes.
+Building the layers costs about two direct draws, so until then the window
+is drawn straight onto each frame as before. Labels are antialiased; TextCache
+renders each distinct label once and the layers composite it from the cache.
+Solid markers come out exactly as if drawn on the frame; antialiased label
+edges can differ by a rounding step.
+"""
+
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Marker constants
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+TRAIL_COLOR_MAX = 255  # Red intensity of the newest trail point
+PREDICTED_COLOR = (255, 128, 0)
+BOX_COLOR = (0, 255, 0)
+POSITION_TEXT_COLOR = (0, 0, 255)
+TEXT_CACHE_SIZE = 256  # Distinct label renders kept
+OVERLAY_OPACITY = 1.0  # 1.0 draws markers opaque, like drawing on the frame
+OVERLAY_TILE = 32  # Frames are blended in runs of tiles this many pixels square
+OVERLAY_BUILD_AFTER = 2  # Frames a window is drawn directly before the layers are built for it
+
+
+def draw_crosshair(frame, x, y, color=(0, 0, 255), size=20, thickness=2):
+    """Draw a crosshair marker at the specified position"""
+    # Horizontal line
+    cv2.line(frame, (x - size, y), (x + size, y), color, thickness)
+    # Vertical line
+    cv2.line(frame, (x, y - size), (x, y + size), color, thickness)
+    # Optional: Add a small circle at the center
+    cv2.circle(frame, (x, y), 3, color, -1)
+
+
+def over(target, inverse_alpha, premultiplied):
+    """Composite a premultiplied source over target in place"""
+    blended = cv2.multiply(target, inverse_alpha, scale=1 / 255)
+    cv2.add(blended, premultiplied, dst=target)
+
+
+class TextCache:
+    """Premultiplied label renders, made once per distinct string and colour"""
+
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._renders = OrderedDict()
+
+    def get(self, text, scale, color, thickness=1):
+        """Return (colour, inverse colour alpha, coverage, inverse coverage, (dx, dy)).
+
+        dx, dy offset the putText origin to the render's top-left corner.
+        """
+        key = (text, scale, color, thickness)
+        render = self._renders.get(key)
+        if render is not None:
+            self._renders.move_to_end(key)
+            return render
+        (width, height), baseline = cv2.getTextSize(text, FONT, scale, thickness)
+        pad = thickness + 1
+        coverage = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+        cv2.putText(coverage, text, (pad, pad + height), FONT, scale, 255, thickness)
+        # putText onto black gives the premultiplied colour directly
+        premultiplied = np.zeros(coverage.shape + (3,), dtype=np.uint8)
+        cv2.putText(premultiplied, text, (pad, pad + height), FONT, scale, color, thickness)
+        inverse = 255 - coverage
+        render = (premultiplied, cv2.merge([inverse] * 3), coverage, inverse, (-pad, -(pad + height)))
+        self._renders[key] = render
+        if len(self._renders) > self.max_entries:
+            self._renders.popitem(last=False)
+        return render
+
+
+class MarkerOverlay:
+    """Marker layer that is redrawn only when the detections or trails change"""
+
+    def __init__(self, opacity=OVERLAY_OPACITY, text_cache=None, tile=OVERLAY_TILE,
+                 build_after=OVERLAY_BUILD_AFTER):
+        self.opacity = opacity
+        self.text = text_cache or TextCache()
+        self.tile = tile
+        self.build_after = build_after
+        self.rebuilds = 0
+        self._key = None
+        self._positions, self._trails = [], {}
+        self._built = False
+        self._shown = 0
+        self._direct = None  # Frame being drawn on directly instead of the layers
+        self._color = None
+        self._alpha = None
+        self._marked = None  # Tiles a marker was drawn in
+        # (rows, columns, inverse alpha, premultiplied colour) per run of marked tiles
+        self._runs = []
+
+    def update(self, shape, positions, trails):
+        """Take the current detection window; the layers are built once it repeats"""
+        key = (shape, tuple(p.get('seq', p.get('timestamp')) for p in positions),
+               tuple((track_id, tuple(trail)) for track_id, trail in trails.items()))
+        if key != self._key:
+            # Most windows last a frame or two, and building the layers for those
+            # costs more than it saves, so new ones are drawn straight onto the frame
+            self._key = key
+            self._positions, self._trails = list(positions), dict(key[2])
+            self._built = False
+            self._shown = 0
+        self._shown += 1
+        # Direct drawing can't blend, so translucent markers always use the layers
+        if self._built or (self._shown <= self.build_after and self.opacity >= 1.0):
+            return
+        self._built = True
+        self.rebuilds += 1
+
+        if self._color is None or self._color.shape != shape:
+            self._color = np.zeros(shape, dtype=np.uint8)
+            self._alpha = np.zeros(shape[:2], dtype=np.uint8)
+            self._marked = np.zeros((-(-shape[0] // self.tile), -(-shape[1] // self.tile)), dtype=bool)
+        else:
+            # Nothing outside the last runs was drawn
+            for rows, columns, _, _ in self._runs:
+                self._color[rows, columns] = 0
+                self._alpha[rows, columns] = 0
+            self._marked[:] = False
+        self._draw(self._positions, self._trails)
+        self._runs = self._find_runs()
+
+    def _mark(self, x0, y0, x1, y1):
+        """Note the tiles covering a drawn rectangle (inclusive pixel bounds)"""
+        tile = self.tile
+        x0, y0 = max(x0, 0) // tile, max(y0, 0) // tile
+        if x1 >= 0 and y1 >= 0:
+            self._marked[y0:y1 // tile + 1, x0:x1 // tile + 1] = True
+
+    def _find_runs(self):
+        """Group the marked tiles into horizontal runs, with what apply() blends over each"""
+        height, width = self._alpha.shape
+        tile = self.tile
+        runs = []
+        for tile_row, marked in enumerate(self._marked):
+            if not marked.any():
+                continue
+            band = slice(tile_row * tile, min((tile_row + 1) * tile, height))
+            # Run edges are where the marked flag flips along the row
+            edges = np.flatnonzero(np.diff(np.concatenate(([False], marked, [False])).astype(np.int8)))
+            for start, end in zip(edges[::2], edges[1::2]):
+                columns = slice(start * tile, min(end * tile, width))
+                alpha, color = self._alpha[band, columns], self._color[band, columns]
+                if self.opacity < 1.0:
+                    alpha = cv2.convertScaleAbs(alpha, alpha=max(self.opacity, 0.0))
+                    color = cv2.convertScaleAbs(color, alpha=max(self.opacity, 0.0))
+                runs.append((band, columns, cv2.merge([255 - alpha] * 3), color.copy()))
+        return runs
+
+    def _crosshair(self, x, y, color, size, thickness):
+        if self._direct is not None:
+            draw_crosshair(self._direct, x, y, color=color, size=size, thickness=thickness)
+            return
+        draw_crosshair(self._color, x, y, color=color, size=size, thickness=thickness)
+        draw_crosshair(self._alpha, x, y, color=255, size=size, thickness=thickness)
+        reach = max(size, 3) + thickness
+        self._mark(x - reach, y - reach, x + reach, y + reach)
+
+    def _rectangle(self, top_left, bottom_right, color):
+        if self._direct is not None:
+            cv2.rectangle(self._direct, top_left, bottom_right, color, 1)
+            return
+        cv2.rectangle(self._color, top_left, bottom_right, color, 1)
+        cv2.rectangle(self._alpha, top_left, bottom_right, 255, 1)
+        self._mark(min(top_left[0], bottom_right[0]) - 1, min(top_left[1], bottom_right[1]) - 1,
+                   max(top_left[0], bottom_right[0]) + 1, max(top_left[1], bottom_right[1]) + 1)
+
+    def _text(self, text, origin, scale, color, thickness=1):
+        """Composite a cached label over the layers, clipped to the frame"""
+        if self._direct is not None:
+            cv2.putText(self._direct, text, origin, FONT, scale, color, thickness)
+            return
+        premultiplied, inverse, coverage, inverse_coverage, (dx, dy) = self.text.get(text, scale, color, thickness)
+        x, y = origin[0] + dx, origin[1] + dy
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + coverage.shape[1], self._alpha.shape[1])
+        y1 = min(y + coverage.shape[0], self._alpha.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        patch = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        over(self._color[y0:y1, x0:x1], inverse[patch], premultiplied[patch])
+        over(self._alpha[y0:y1, x0:x1], inverse_coverage[patch], coverage[patch])
+        self._mark(x0, y0, x1 - 1, y1 - 1)
+
+    def _draw(self, positions, trails):
+        for trail in trails.values():
+            # Draw trail of recent positions
+            for i, (x, y, _) in enumerate(trail):
+                # Fade older positions
+                alpha = (i + 1) / len(trail)
+                color = (0, 0, int(TRAIL_COLOR_MAX * alpha))  # Red color with varying intensity
+                size = int(15 + 15 * alpha)  # Larger size for more recent positions
+                thickness = max(1, int(3 * alpha))
+                self._crosshair(x, y, color, size, thickness)
+
+            # Mark where the tracker expects the cat to be after the actuation delay
+            predicted = trail[-1][2]
+            if predicted:
+                self._crosshair(predicted[0], predicted[1], PREDICTED_COLOR, 10, 1)
+
+        # Current position info
+        if positions:
+            latest = positions[0]
+            self._text(f"Position: ({latest['x']}, {latest['y']})", (10, 30), 0.7, POSITION_TEXT_COLOR, 2)
+            self._text(f"Recent detections: {len(positions)}, tracks: {len(trails)}", (10, 60), 0.6,
+                       BOX_COLOR, 2)
+
+        # Bounding boxes of all recent positions
+        for position in positions:
+            if 'bbox' not in position:
+                continue
+            area = position.get('area', 0)
+            bbox_x, bbox_y, bbox_w, bbox_h = position['bbox']
+            label = f"#{position['track_id']} Area: {area}" if 'track_id' in position else f'Area: {area}'
+            self._rectangle((bbox_x, bbox_y), (bbox_x + bbox_w, bbox_y + bbox_h), BOX_COLOR)
+            self._text(label, (bbox_x, bbox_y - 10), 0.5, BOX_COLOR)
+
+    def apply(self, frame):
+        """Put the markers onto frame in place: blended from the layers once built, else drawn"""
+        if not self._built or self._color.shape != frame.shape:
+            self._direct = frame
+            try:
+                self._draw(self._positions, self._trails)
+            finally:
+                self._direct = None
+            return frame
+        for rows, columns, inverse_alpha, premultiplied in self._runs:
+            over(frame[rows, columns], inverse_alpha, premultiplied)
+        return frame
@@ -0,0 +1,201 @@
+"""
+Staged capture -> process -> sink pipeline.
+
+Capture and processing run on their own threads and hand frames along
+bounded queues; the sink (queue writes, printing, display) runs on the
+calling thread so GUI calls stay on the main thread. OpenCV releases the
+GIL inside its kernels, so capture and processing overlap on separate cores.
+"""
+
+import threading
+import time
+from collections import deque
+
+# Queue policies
+DROP_OLDEST = 'drop_oldest'  # Never block the producer; discard stale frames
+BLOCK = 'block'  # Producer waits for room; every frame is processed
+
+# Pipeline defaults
+DEFAULT_QUEUE_SIZE = 2
+STATS_WINDOW = 120  # Samples kept per stage for FPS/latency
+
+
+class QueueClosed(Exception):
+    """Raised by StageQueue.get once the queue is closed and drained"""
+
+
+class StageQueue:
+    """Bounded hand-off queue with a drop-oldest or blocking put policy"""
+
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if self.policy == BLOCK:
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+            elif len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            if self._closed:
+                return
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Return the next item, None on timeout, or raise QueueClosed when finished"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                item = self._items.popleft()
+                self._cond.notify_all()
+                return item
+            if self._closed:
+                raise QueueClosed()
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """Rolling FPS and latency counters for one stage"""
+
+    def __init__(self, name, window=STATS_WINDOW):
+        self.name = name
+        self.count = 0
+        self._times = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self.count += 1
+            self._times.append(time.monotonic())
+            self._latencies.append(latency)
+
+    def fps(self):
+        with self._lock:
+            if len(self._times) < 2:
+                return 0.0
+            span = self._times[-1] - self._times[0]
+            return (len(self._times) - 1) / span if span > 0 else 0.0
+
+    def latency_ms(self, percentile=50):
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index] * 1000
+
+    def summary(self):
+        return (f"{self.name}: {self.fps():.1f} fps, "
+                f"p50 {self.latency_ms(50):.1f} ms, p99 {self.latency_ms(99):.1f} ms")
+
+
+class FramePacket:
+    """A frame travelling through the pipeline plus what each stage adds to it"""
+
+    __slots__ = ('index', 'capture_time', 'frame', 'mask', 'detections')
+
+    def __init__(self, index, capture_time, frame):
+        self.index = index
+        self.capture_time = capture_time
+        self.frame = frame
+        self.mask = None
+        self.detections = []
+
+
+class Pipeline:
+    """Runs capture and processing threads feeding a sink on the caller's thread"""
+
+    def __init__(self, cap, process, sink, queue_size=DEFAULT_QUEUE_SIZE,
+                 capture_policy=DROP_OLDEST, process_policy=DROP_OLDEST):
+        self.cap = cap
+        self.process = process
+        self.sink = sink
+        self.capture_queue = StageQueue(queue_size, capture_policy)
+        self.output_queue = StageQueue(queue_size, process_policy)
+        self.stats = {name: StageStats(name) for name in ('capture', 'process', 'sink')}
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _capture_loop(self):
+        index = 0
+        try:
+            while not self._stop.is_set():
+                start = time.monotonic()
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                self.stats['capture'].record(time.monotonic() - start)
+                # Shared-memory sources report when the broker actually grabbed the frame
+                capture_time = getattr(self.cap, 'capture_time', None) or time.time()
+                self.capture_queue.put(FramePacket(index, capture_time, frame))
+                index += 1
+        finally:
+            self.capture_queue.close()
+
+    def _process_loop(self):
+        try:
+            while not self._stop.is_set():
+                packet = self.capture_queue.get(timeout=0.1)
+                if packet is None:
+                    continue
+                start = time.monotonic()
+                packet.mask, packet.detections = self.process(packet.frame)
+                self.stats['process'].record(time.monotonic() - start)
+                self.output_queue.put(packet)
+        except QueueClosed:
+            pass
+        finally:
+            self.output_queue.close()
+
+    def run(self):
+        """Start the worker stages and drive the sink until it returns False or input ends"""
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='capture', daemon=True),
+            threading.Thread(target=self._process_loop, name='process', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        try:
+            while True:
+                packet = self.output_queue.get(timeout=0.1)
+                if packet is None:
+                    continue
+                start = time.monotonic()
+                keep_going = self.sink(packet)
+                self.stats['sink'].record(time.monotonic() - start)
+                if keep_going is False:
+                    break
+        except QueueClosed:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stop.set()
+        self.capture_queue.close()
+        self.output_queue.close()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+
+    def summary(self):
+        """One line per stage with FPS, latency and drop counters"""
+        lines = [stats.summary() for stats in self.stats.values()]
+        lines.append(f"dropped: capture {self.capture_queue.dropped}, process {self.output_queue.dropped}")
+        return '\n'.join(lines)
@@ -0,0 +1,172 @@
+"""
+Incremental follower for the JSON-lines detection queue.
+
+Instead of re-reading position_queue.txt on every frame, JsonLinesTail
+remembers its byte offset and parses only what was appended since the last
+poll. Truncation (the file shrinking below our offset) and rotation (the
+path now pointing at a different inode) restart from the top of the new
+file. Parsed detections are kept in a time-ordered window, so "everything
+from the last N seconds" is a bisect rather than a scan.
+"""
+
+import json
+import os
+import time
+from bisect import bisect_left, bisect_right
+
+# Tail constants
+BACKFILL_BYTES = 64 * 1024  # How far back from the end to start on an existing file
+READ_CHUNK = 256 * 1024  # Max bytes parsed per poll so one huge append can't stall a frame
+WINDOW_SECONDS = 10.0  # Detections older than this (relative to the newest) are forgotten
+MAX_WINDOW_ENTRIES = 10000
+
+
+class JsonLinesTail:
+    """Follows an append-only JSON-lines file and indexes its records by timestamp"""
+
+    def __init__(self, path="position_queue.txt", from_end=True, window=WINDOW_SECONDS,
+                 max_entries=MAX_WINDOW_ENTRIES, record_type='motion'):
+        self.path = path
+        self.from_end = from_end
+        self.window = window
+        self.max_entries = max_entries
+        self.record_type = record_type
+
+        self._file = None
+        self._inode = None
+        self._offset = 0
+        self._partial = b''
+        self._times = []
+        self._records = []
+        self.skipped = 0  # Lines that were not valid JSON
+
+    def _open(self):
+        """Open the current file at the path, or return False if it does not exist"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return False
+        st = os.fstat(f.fileno())
+        self._file = f
+        self._inode = st.st_ino
+        self._partial = b''
+        self._offset = 0
+        if self.from_end and st.st_size > BACKFILL_BYTES:
+            # Start near the end and drop the first, probably partial, line
+            self._offset = st.st_size - BACKFILL_BYTES
+            f.seek(self._offset)
+            self._offset += len(f.readline())
+        # Only the first file is joined mid-stream; rotated files are read from the top
+        self.from_end = False
+        return True
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._inode = None
+
+    def _check_file(self):
+        """Detect rotation or truncation and reopen/rewind as needed
+
+        Returns the number of records drained from a rotated-away file.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # Rotated away with no replacement yet; keep draining the old handle
+            return 0
+
+        if self._file is None:
+            self._open()
+            return 0
+
+        drained = 0
+        if st.st_ino != self._inode:
+            # Finish whatever was appended to the old file before switching, READ_CHUNK at a time
+            while True:
+                offset = self._offset
+                drained += self._read_available()
+                if self._offset == offset:
+                    break
+            self._close()
+            self._open()
+        elif st.st_size < self._offset:
+            # Truncated in place
+            self._file.seek(0)
+            self._offset = 0
+            self._partial = b''
+            self.clear()
+        return drained
+
+    def _read_available(self):
+        self._file.seek(self._offset)
+        data = self._file.read(READ_CHUNK)
+        if not data:
+            return 0
+        self._offset += len(data)
+
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()  # Incomplete trailing line, finished by a later append
+        added = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                self.skipped += 1
+                continue
+            if self.record_type and record.get('type') != self.record_type:
+                continue
+            self._add(record)
+            added += 1
+        return added
+
+    def _add(self, record):
+        timestamp = record.get('timestamp', 0)
+        if not self._times or timestamp >= self._times[-1]:
+            self._times.append(timestamp)
+            self._records.append(record)
+        else:
+            # Rare out-of-order write; keep the index sorted
+            index = bisect_right(self._times, timestamp)
+            self._times.insert(index, timestamp)
+            self._records.insert(index, record)
+
+    def _trim(self):
+        if not self._times:
+            return
+        cut = bisect_left(self._times, self._times[-1] - self.window)
+        cut = max(cut, len(self._times) - self.max_entries)
+        if cut > 0:
+            del self._times[:cut]
+            del self._records[:cut]
+
+    def poll(self):
+        """Parse newly appended lines; returns how many records were added"""
+        try:
+            added = self._check_file()
+            if self._file is not None:
+                added += self._read_available()
+            self._trim()
+            return added
+        except OSError as e:
+            print(f"Error tailing {self.path}: {e}")
+            self._close()
+            return 0
+
+    def since(self, timestamp):
+        """Records with timestamp >= the given time, oldest first"""
+        return self._records[bisect_left(self._times, timestamp):]
+
+    def recent(self, max_age, now=None):
+        """Records from the last max_age seconds, oldest first"""
+        return self.since((time.time() if now is None else now) - max_age)
+
+    def clear(self):
+        self._times = []
+        self._records = []
+
+    def close(self):
+        self._close()
@@ -0,0 +1,145 @@
+"""
+Adaptive idle/active scheduling for the motion detector.
+
+Most of the day nothing moves, yet MOG2 and the mask cleanup cost the
+same on an empty yard as on a busy one. AdaptiveScheduler wraps a
+MotionDetector and runs it in one of two modes:
+
+  - idle: only every IDLE_STRIDE-th frame is looked at, and only with a
+    cheap frame-difference check on a small grayscale copy of the working
+    view. The background model is refreshed every BACKGROUND_STRIDE frames.
+  - active: the full pipeline runs on every frame, as without the scheduler.
+
+Idle escalates to active as soon as the fraction of changed pixels crosses
+the activation threshold, and active decays back to idle after ACTIVE_HOLD
+processed frames in a row without a detection.
+
+MOG2 adapts by its learning rate once per apply(), so feeding it one frame
+in N would stretch its memory N times. Idle refreshes therefore use the
+rate that N consecutive full-rate updates would have compounded to,
+1 - (1 - 1/history)^N, and the background is as current when the scheduler
+escalates as if it had never slowed down. Strides count frames rather than
+seconds so recorded sources behave the same as live ones.
+"""
+
+import cv2
+import numpy as np
+
+# Scheduler constants
+IDLE_STRIDE = 5  # Idle mode checks one frame in this many
+BACKGROUND_STRIDE = 15  # Idle mode refreshes the background model every this many frames
+IDLE_WIDTH = 160  # Width of the grayscale copy used for the idle check
+IDLE_BLUR = 5  # Blur kernel that keeps sensor noise out of the difference
+DIFF_THRESHOLD = 25  # Per-pixel change (0-255) that counts as motion in idle mode
+ACTIVATE_THRESHOLD = 0.003  # Fraction of changed pixels that switches to full-rate detection
+ACTIVE_HOLD = 90  # Processed frames without a detection before dropping back to idle
+
+IDLE = 'idle'
+ACTIVE = 'active'
+
+
+class AdaptiveScheduler:
+    """Runs a MotionDetector at full rate only while there is something to see"""
+
+    def __init__(self, detector, idle_stride=IDLE_STRIDE, background_stride=BACKGROUND_STRIDE,
+                 activate_threshold=ACTIVATE_THRESHOLD, active_hold=ACTIVE_HOLD,
+                 diff_threshold=DIFF_THRESHOLD, idle_width=IDLE_WIDTH, metrics=None):
+        self.detector = detector
+        self.idle_stride = max(1, int(idle_stride))
+        self.background_stride = max(self.idle_stride, int(background_stride))
+        self.activate_threshold = activate_threshold
+        self.active_hold = max(1, int(active_hold))
+        self.diff_threshold = diff_threshold
+        self.idle_width = idle_width
+        self.metrics = metrics
+
+        # Start active so MOG2 learns the scene at full rate before the first idle stretch
+        self.mode = ACTIVE
+        self.frame_index = 0
+        self.quiet_frames = 0
+        self.energy = 0.0
+        self._previous = None
+        self._last_background = 0
+        self._idle_mask = None
+        self._set_mode_gauge()
+
+    def _count(self, name, **labels):
+        if self.metrics is not None:
+            self.metrics.inc(name, **labels)
+
+    def _set_mode_gauge(self):
+        if self.metrics is not None:
+            self.metrics.set_gauge('scheduler_active', 1 if self.mode == ACTIVE else 0)
+
+    def _switch(self, mode):
+        self.mode = mode
+        self.quiet_frames = 0
+        self._previous = None
+        self._count('scheduler_transitions_total', to=mode)
+        self._set_mode_gauge()
+        if mode == ACTIVE:
+            print(f"Scheduler: motion detected (change {self.energy:.4f}), full-rate detection")
+        else:
+            print(f"Scheduler: no detections for {self.active_hold} frames, idle")
+
+    def background_rate(self, frames):
+        """Learning rate equivalent to `frames` consecutive automatic MOG2 updates"""
+        return 1.0 - (1.0 - 1.0 / self.detector.history) ** frames
+
+    def change_energy(self, view):
+        """Fraction of pixels that changed since the previous idle check"""
+        height, width = view.shape[:2]
+        size = (min(width, self.idle_width), max(1, height * min(width, self.idle_width) // width))
+        small = cv2.resize(view, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (IDLE_BLUR, IDLE_BLUR), 0)
+
+        previous, self._previous = self._previous, small
+        if previous is None or previous.shape != small.shape:
+            return 0.0
+        changed = cv2.threshold(cv2.absdiff(small, previous), self.diff_threshold, 255, cv2.THRESH_BINARY)[1]
+        return cv2.countNonZero(changed) / changed.size
+
+    def _idle_result(self, shape):
+        if self._idle_mask is None or self._idle_mask.shape != shape:
+            self._idle_mask = np.zeros(shape, dtype=np.uint8)
+        return self._idle_mask, []
+
+    def process(self, frame, timings=None):
+        """Same contract as MotionDetector.process: returns (mask, detections)"""
+        self.frame_index += 1
+        if self.mode == ACTIVE:
+            return self._process_active(frame, timings)
+
+        if self.frame_index % self.idle_stride:
+            self._count('scheduler_frames_total', mode='skipped')
+            return self._idle_result(self._idle_mask.shape if self._idle_mask is not None else frame.shape[:2])
+
+        self._count('scheduler_frames_total', mode='idle')
+        view = self.detector.working_view(frame)
+        self.energy = self.change_energy(view)
+        if self.energy >= self.activate_threshold:
+            self._switch(ACTIVE)
+            return self._process_active(frame, timings)
+
+        gap = self.frame_index - self._last_background
+        if gap >= self.background_stride:
+            self.detector.update_background(view, self.background_rate(gap), gap)
+            self._last_background = self.frame_index
+        return self._idle_result(view.shape[:2])
+
+    def _process_active(self, frame, timings):
+        self._count('scheduler_frames_total', mode='active')
+        # At most BACKGROUND_STRIDE frames behind, and this frame may hold the cat,
+        # so the escalating frame is learned at the normal rate rather than caught up
+        mask, detections = self.detector.process(frame, timings)
+        self._last_background = self.frame_index
+
+        if detections:
+            self.quiet_frames = 0
+        else:
+            self.quiet_frames += 1
+            if self.quiet_frames >= self.active_hold:
+                self._switch(IDLE)
+        return mask, detections
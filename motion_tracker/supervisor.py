@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Multi-camera supervisor.
+
+Runs one cat-tracker process per camera, each pinned to its own core and
+publishing to its own detection ring. Cameras therefore never share a GIL,
+a capture thread or a queue, throughput grows with the number of cores,
+and a camera that stalls only stalls itself. The supervisor follows all
+the per-camera rings and republishes every detection, tagged with its
+camera id, to the shared ring, the detection log and the history store,
+so the sprayer and the webapp keep reading one merged stream.
+
+Each tracker rewrites its metrics snapshot every SNAPSHOT_INTERVAL from
+its frame loop, so the snapshot doubles as a heartbeat: one that stops
+changing means a stalled capture (so trackers can't be given
+--no-metrics). Stalled or crashed live cameras are
+restarted with backoff; recordings that end are left finished. Per-camera
+state is written to a health file that the backend merges into
+/api/health. Zones come from the camera's entry in shapes.json (see
+zones.camera_shapes).
+
+    python motion_tracker/supervisor.py --camera yard=camera:0 --camera porch=camera:1 -- --downscale 0.5
+"""
+
+import argparse
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motion_tracker.detection_log import DetectionLog
+from motion_tracker.detection_ring import (DEFAULT_RING_NAME, DetectionRingReader, DetectionRingWriter,
+                                           default_ring_path, wait_any)
+from motion_tracker.detection_store import STORE_FILE, DetectionStore
+from motion_tracker.frame_sources import is_live_spec
+from motion_tracker.metrics import (CAMERA_HEALTH_NAME, SNAPSHOT_INTERVAL, default_metrics_path, read_snapshot,
+                                    write_snapshot)
+from motion_tracker.zones import SHAPES_FILE
+
+# Process constants
+TRACKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cat-tracker.py')
+CAMERA_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,16}$')  # Fits the record's camera field and file names
+# Tracker options the supervisor sets itself; --no-metrics would also silence the heartbeat
+SUPERVISED_OPTIONS = ('--source', '--camera-id', '--ring', '--metrics-file', '--no-metrics')
+
+# Supervision constants
+STARTUP_GRACE = 30.0  # Seconds a new tracker gets to publish its first heartbeat
+STALL_TIMEOUT = 3 * SNAPSHOT_INTERVAL  # Seconds without a heartbeat before a tracker counts as stalled
+TERMINATE_TIMEOUT = 5.0  # Seconds between asking a tracker to stop and killing it
+RESTART_BACKOFF = 1.0  # First restart delay, doubled for each crash in a row
+MAX_RESTART_BACKOFF = 60.0
+STABLE_AFTER = 60.0  # A tracker that ran this long resets the backoff
+MERGE_WAIT = 0.25  # Longest sleep in the merge loop, so supervision keeps running when all is quiet
+HEALTH_INTERVAL = 1.0  # Seconds between health checks and health file writes
+
+# Camera states
+STARTING = 'starting'
+RUNNING = 'running'
+STALLED = 'stalled'
+RESTARTING = 'restarting'
+FINISHED = 'finished'
+FAILED = 'failed'
+STOPPED = 'stopped'
+
+
+def supervised_option(arg):
+    """Supervisor-owned tracker option named by arg, including argparse abbreviations, or None"""
+    name = arg.split('=', 1)[0]
+    if not name.startswith('--') or name == '--':
+        return None
+    return next((option for option in SUPERVISED_OPTIONS if option.startswith(name)), None)
+
+
+def parse_camera(spec):
+    """'ID=SOURCE' -> (id, source spec)"""
+    camera_id, sep, source = spec.partition('=')
+    if not sep or not source or not CAMERA_ID_PATTERN.match(camera_id):
+        raise ValueError(f"Camera must be ID=SOURCE with an id of up to 16 letters, digits, _ or -: {spec}")
+    return camera_id, source
+
+
+class CameraProcess:
+    """One camera's tracker process and its supervision state"""
+
+    def __init__(self, camera_id, source, core=None, shapes=SHAPES_FILE, tracker_args=(), log_dir=None):
+        self.camera_id = camera_id
+        self.source = source
+        self.core = core
+        self.shapes = shapes
+        self.tracker_args = list(tracker_args)
+        self.log_dir = log_dir
+        self.live = is_live_spec(source)
+        self.ring_path = default_ring_path(f"{DEFAULT_RING_NAME}.{camera_id}")
+        self.metrics_path = default_metrics_path(f"cat_tracker_metrics.{camera_id}.json")
+
+        self.process = None
+        self.state = STARTING
+        self.started = 0.0
+        self.restarts = 0
+        self.stalls = 0
+        self.exit_code = None
+        self.published = 0
+        self.heartbeat = None
+        self._backoff = RESTART_BACKOFF
+        self._restart_at = 0.0
+        self._kill_at = None
+
+    def command(self):
+        return [sys.executable, TRACKER_SCRIPT, '--headless', '--source', self.source,
+                '--camera-id', self.camera_id, '--shapes', self.shapes, '--ring', self.ring_path,
+                '--metrics-file', self.metrics_path, '--no-log', '--no-store'] + self.tracker_args
+
+    def _pin(self):
+        # Runs in the child before exec; OpenCV sizes its thread pool from the affinity mask
+        os.sched_setaffinity(0, {self.core})
+
+    def start(self):
+        # A snapshot left by the previous process must not count as this one's heartbeat
+        try:
+            os.remove(self.metrics_path)
+        except OSError:
+            pass
+        stdout = subprocess.DEVNULL
+        if self.log_dir:
+            stdout = open(os.path.join(self.log_dir, f"{self.camera_id}.log"), 'a')
+        pin = self._pin if self.core is not None and hasattr(os, 'sched_setaffinity') else None
+        try:
+            self.process = subprocess.Popen(self.command(), stdout=stdout, preexec_fn=pin)
+        finally:
+            if stdout is not subprocess.DEVNULL:
+                stdout.close()
+        self.state = STARTING
+        self.started = time.time()
+        self.heartbeat = None
+        self.exit_code = None
+        self._kill_at = None
+        print(f"Camera {self.camera_id}: started tracker (pid {self.process.pid}"
+              f"{'' if pin is None else f', core {self.core}'}) on {self.source}")
+
+    def _read_heartbeat(self):
+        snapshot = read_snapshot(self.metrics_path)
+        if snapshot and snapshot.get('pid') == self.process.pid:
+            self.heartbeat = snapshot
+
+    def stop(self, now, state):
+        """Ask the tracker to exit; it is killed if still running after TERMINATE_TIMEOUT"""
+        self.state = state
+        if self.process is not None and self._kill_at is None:
+            self.process.terminate()
+            self._kill_at = now + TERMINATE_TIMEOUT
+
+    def check(self, now):
+        """Advance the state machine: heartbeats, stalls, exits and due restarts"""
+        if self.process is None:
+            if self.state == RESTARTING and now >= self._restart_at:
+                self.restarts += 1
+                self.start()
+            return
+
+        self.exit_code = self.process.poll()
+        if self.exit_code is None:
+            if self._kill_at is not None:
+                if now >= self._kill_at:
+                    self.process.kill()
+                return
+            self._read_heartbeat()
+            if self.heartbeat is not None:
+                self.state = RUNNING
+                silent = now - self.heartbeat['timestamp']
+                limit = STALL_TIMEOUT
+            else:
+                silent = now - self.started
+                limit = STARTUP_GRACE
+            if silent > limit:
+                print(f"Camera {self.camera_id}: no heartbeat for {silent:.0f} s, restarting its tracker")
+                self.stalls += 1
+                self.stop(now, STALLED)
+            return
+
+        # The tracker exited; its last snapshot has the final counts
+        self._read_heartbeat()
+        self.process = None
+        self._kill_at = None
+        if self.state == STOPPED:
+            return
+        if not self.live and self.state != STALLED:
+            self.state = FINISHED if self.exit_code == 0 else FAILED
+            print(f"Camera {self.camera_id}: tracker {self.state} (exit code {self.exit_code})")
+            return
+        if now - self.started >= STABLE_AFTER:
+            self._backoff = RESTART_BACKOFF
+        print(f"Camera {self.camera_id}: tracker exited with code {self.exit_code}, "
+              f"restarting in {self._backoff:.0f} s")
+        self.state = RESTARTING
+        self._restart_at = now + self._backoff
+        self._backoff = min(self._backoff * 2, MAX_RESTART_BACKOFF)
+
+    @property
+    def done(self):
+        return self.state in (FINISHED, FAILED, STOPPED) and self.process is None
+
+    def status(self, now):
+        """JSON-friendly health entry for this camera"""
+        status = {
+            'source': self.source,
+            'state': self.state,
+            'pid': self.process.pid if self.process is not None else None,
+            'core': self.core,
+            'restarts': self.restarts,
+            'stalls': self.stalls,
+            'exit_code': self.exit_code,
+            'published': self.published,
+            'uptime': round(now - self.started, 1) if self.process is not None else 0.0,
+            'metrics_file': self.metrics_path,
+        }
+        if self.heartbeat is not None:
+            values = {(metric['name'], metric['labels'].get('stage')): metric.get('value')
+                      for metric in self.heartbeat['metrics'] if metric['type'] != 'histogram'}
+            status.update(heartbeat_age=round(now - self.heartbeat['timestamp'], 1),
+                          fps=values.get(('pipeline_fps', 'sink')),
+                          frames=values.get(('frames_total', None)),
+                          detections=values.get(('detections_total', None)))
+        return status
+
+
+class Supervisor:
+    """Runs the camera trackers and merges their rings into the shared detection stream"""
+
+    def __init__(self, cameras, ring_path=None, log_options=None, store_path=STORE_FILE,
+                 health_path=None):
+        self.cameras = cameras
+        self.ring_path = ring_path
+        self.log_options = log_options
+        self.store_path = store_path
+        self.health_path = health_path or default_metrics_path(CAMERA_HEALTH_NAME)
+        self._by_ring = {camera.ring_path: camera for camera in cameras}
+        self._readers = {}
+        self._ring = None
+        self._exporter = None
+        self._store = None
+        self._stopping = False
+
+    def _attach_readers(self):
+        """Follow each camera ring once its tracker has created it"""
+        for camera in self.cameras:
+            if camera.ring_path in self._readers:
+                continue
+            try:
+                self._readers[camera.ring_path] = DetectionRingReader(camera.ring_path)
+            except (FileNotFoundError, ValueError):
+                pass
+
+    def merge(self, timeout):
+        """Republish everything the camera rings received, waiting up to timeout for the first record"""
+        self._attach_readers()
+        if not self._readers:
+            time.sleep(timeout)
+            return
+        for reader, detections in wait_any(list(self._readers.values()), timeout=timeout):
+            camera = self._by_ring[reader.path]
+            for data in detections:
+                # The tracker's publish timestamp is kept, so consumers still see the camera's latency
+                data['camera_id'] = camera.camera_id
+                try:
+                    data['seq'] = self._ring.write(data)
+                    if self._exporter is not None:
+                        self._exporter.write(data)
+                    if self._store is not None:
+                        self._store.add(data)
+                except Exception as e:
+                    print(f"Error writing to queue: {e}")
+            camera.published += len(detections)
+
+    def write_health(self, now):
+        write_snapshot(self.health_path, {
+            'pid': os.getpid(),
+            'timestamp': now,
+            'cameras': {camera.camera_id: camera.status(now) for camera in self.cameras},
+        })
+
+    def run(self):
+        """Supervise until interrupted, or until every (recorded) camera has finished"""
+        self._ring = DetectionRingWriter(self.ring_path)
+        self._exporter = DetectionLog(**self.log_options) if self.log_options is not None else None
+        self._store = DetectionStore(self.store_path) if self.store_path else None
+
+        for camera in self.cameras:
+            # A ring left by an earlier run would be followed from its stale write position
+            try:
+                os.remove(camera.ring_path)
+            except OSError:
+                pass
+            camera.start()
+
+        last_health = 0.0
+        try:
+            while not self._stopping:
+                self.merge(MERGE_WAIT)
+                now = time.time()
+                if now - last_health < HEALTH_INTERVAL:
+                    continue
+                for camera in self.cameras:
+                    camera.check(now)
+                self.write_health(now)
+                last_health = now
+                if all(camera.done for camera in self.cameras):
+                    # Pick up whatever the last trackers published before exiting
+                    self.merge(0)
+                    break
+        except KeyboardInterrupt:
+            print("Stopping cameras...")
+        finally:
+            self.shutdown()
+
+    def stop(self):
+        """Make run() stop the trackers and return (from another thread)"""
+        self._stopping = True
+
+    def shutdown(self):
+        now = time.time()
+        for camera in self.cameras:
+            if not camera.done:
+                camera.stop(now, STOPPED)
+        for camera in self.cameras:
+            if camera.process is not None:
+                try:
+                    camera.process.wait(TERMINATE_TIMEOUT)
+                except subprocess.TimeoutExpired:
+                    camera.process.kill()
+                    camera.process.wait()
+                camera.process = None
+        self.write_health(time.time())
+        for reader in self._readers.values():
+            reader.close()
+        self._ring.close()
+        if self._exporter is not None:
+            self._exporter.close()
+        if self._store is not None:
+            self._store.close()
+
+
+def assign_cores(count):
+    """Core for each of count cameras, round-robin over the cores this process may use"""
+    if not hasattr(os, 'sched_getaffinity'):
+        return [None] * count
+    cores = sorted(os.sched_getaffinity(0))
+    return [cores[index % len(cores)] for index in range(count)]
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run one tracker per camera and merge their detections",
+        epilog="Arguments after -- are passed to every cat-tracker.py (e.g. -- --downscale 0.5 --mask-mode fast)")
+    parser.add_argument('--camera', action='append', required=True, metavar='ID=SOURCE',
+                        help='Camera id and frame source spec, e.g. yard=camera:0 (repeat per camera)')
+    parser.add_argument('--shapes', default=SHAPES_FILE, help='shapes.json with per-camera zones')
+    parser.add_argument('--no-pin', action='store_true', help='Let the OS schedule trackers on any core')
+    parser.add_argument('--log-dir', help='Write each tracker\'s output to LOG_DIR/ID.log (default: discard)')
+    parser.add_argument('--no-log', action='store_true', help='Do not write the merged detection log')
+    parser.add_argument('--store', default=STORE_FILE, help='SQLite detection history queried by the webapp')
+    parser.add_argument('--no-store', action='store_true', help='Do not record detection history')
+    argv = sys.argv[1:]
+    tracker_args = []
+    if '--' in argv:
+        argv, tracker_args = argv[:argv.index('--')], argv[argv.index('--') + 1:]
+    args = parser.parse_args(argv)
+    reserved = sorted({supervised_option(arg) for arg in tracker_args} - {None})
+    if reserved:
+        parser.error(f"{', '.join(reserved)} cannot be passed to the trackers; the supervisor manages them")
+
+    try:
+        specs = [parse_camera(spec) for spec in args.camera]
+    except ValueError as e:
+        exit(f"Error: {e}")
+    if len({camera_id for camera_id, _ in specs}) != len(specs):
+        exit("Error: camera ids must be unique")
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    cores = [None] * len(specs) if args.no_pin else assign_cores(len(specs))
+    cameras = [CameraProcess(camera_id, source, core, args.shapes, tracker_args, args.log_dir)
+               for (camera_id, source), core in zip(specs, cores)]
+    signal.signal(signal.SIGTERM, _terminate)
+    Supervisor(cameras, log_options=None if args.no_log else {},
+               store_path=None if args.no_store else args.store).run()
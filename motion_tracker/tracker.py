@@ -0,0 +1,228 @@
+"""
+Multi-object tracking for merged motion boxes.
+
+Each track carries a constant-velocity Kalman filter over its centre
+(x, y, vx, vy). Every frame the filters are predicted forward by the real
+time between captures, detections are matched to tracks with a combined
+IoU/centroid-distance cost (optimal assignment via scipy when installed,
+greedy otherwise) and matched filters are corrected. All filter maths is
+batched across tracks with NumPy. The number of live tracks is capped and
+nothing per track grows over time, so memory stays bounded.
+"""
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# Track lifecycle constants
+MAX_TRACKS = 32  # Live tracks kept at once; extra detections go untracked
+MAX_MISSES = 15  # Frames a track may coast unmatched before it is dropped
+MAX_TRACK_ID = 2 ** 31 - 1  # Ids wrap so they always fit the ring's int32 field
+
+# Association constants
+GATE_DISTANCE = 150  # Max pixels between prediction and detection centres
+INFEASIBLE_COST = 1e6
+
+# Filter constants
+PROCESS_NOISE = 500.0  # Acceleration noise (px/s^2) allowed by the constant-velocity model
+MEASUREMENT_NOISE = 10.0  # Centroid jitter (px) of a detection
+INITIAL_VELOCITY_STD = 200.0  # px/s uncertainty of a brand-new track's velocity
+DEFAULT_DT = 1.0 / 30  # Frame interval assumed when capture times are unavailable
+MAX_DT = 1.0  # Longer gaps are clamped so a stall doesn't blow up the covariance
+PREDICTION_LEAD = 0.15  # Seconds ahead to report the predicted position (actuation latency)
+
+OBSERVATION = np.array([[1.0, 0.0, 0.0, 0.0],
+                        [0.0, 1.0, 0.0, 0.0]])
+MEASUREMENT_COVARIANCE = np.eye(2) * MEASUREMENT_NOISE ** 2
+IDENTITY = np.eye(4)
+
+
+def box_corners(boxes):
+    """[x, y, w, h] rows as [x1, y1, x2, y2] float rows"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.hstack([boxes[:, :2], boxes[:, :2] + boxes[:, 2:]])
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between two sets of [x1, y1, x2, y2] boxes"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def greedy_assignment(cost):
+    """Cheapest-first matching; the fallback when scipy is not installed"""
+    rows, cols = [], []
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(cost, axis=None):
+        r, c = divmod(int(flat), cost.shape[1])
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        rows.append(r)
+        cols.append(c)
+        if len(rows) == min(cost.shape):
+            break
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+
+def assign(cost):
+    """Minimum-cost (row, col) matching with infeasible pairs removed"""
+    if cost.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(cost)
+    else:
+        rows, cols = greedy_assignment(cost)
+    keep = cost[rows, cols] < INFEASIBLE_COST
+    return rows[keep], cols[keep]
+
+
+def transition(dt):
+    """Constant-velocity state transition and process noise for a step of dt seconds"""
+    F = np.eye(4)
+    F[0, 2] = F[1, 3] = dt
+    # Piecewise white acceleration noise
+    q = PROCESS_NOISE ** 2
+    Q = np.zeros((4, 4))
+    Q[0, 0] = Q[1, 1] = q * dt ** 4 / 4
+    Q[0, 2] = Q[2, 0] = Q[1, 3] = Q[3, 1] = q * dt ** 3 / 2
+    Q[2, 2] = Q[3, 3] = q * dt ** 2
+    return F, Q
+
+
+class MultiObjectTracker:
+    """Assigns persistent ids to detections and estimates their velocity"""
+
+    def __init__(self, max_tracks=MAX_TRACKS, max_misses=MAX_MISSES,
+                 gate_distance=GATE_DISTANCE, lead_time=PREDICTION_LEAD):
+        self.max_tracks = max_tracks
+        self.max_misses = max_misses
+        self.gate_distance = gate_distance
+        self.lead_time = lead_time
+
+        # One row per live track
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.states = np.zeros((0, 4))
+        self.covariances = np.zeros((0, 4, 4))
+        self.sizes = np.zeros((0, 2))
+        self.misses = np.zeros(0, dtype=np.int64)
+
+        self.next_id = 1
+        self.last_time = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _predict(self, dt):
+        if not len(self.ids):
+            return
+        F, Q = transition(dt)
+        self.states = self.states @ F.T
+        self.covariances = F @ self.covariances @ F.T + Q
+
+    def _cost(self, centres, boxes):
+        """Tracks x detections cost: (1 - IoU) plus normalised centre distance, gated"""
+        predicted = self.states[:, :2]
+        distance = np.linalg.norm(predicted[:, None, :] - centres[None, :, :], axis=2)
+        track_boxes = np.hstack([predicted - self.sizes / 2, predicted + self.sizes / 2])
+        cost = (1.0 - iou_matrix(track_boxes, box_corners(boxes))) + distance / self.gate_distance
+        cost[distance > self.gate_distance] = INFEASIBLE_COST
+        return cost
+
+    def _correct(self, rows, centres):
+        """Kalman update of the matched tracks, batched"""
+        P = self.covariances[rows]
+        S = P[:, :2, :2] + MEASUREMENT_COVARIANCE
+        K = P[:, :, :2] @ np.linalg.inv(S)
+        innovation = centres - self.states[rows, :2]
+        self.states[rows] += np.einsum('nij,nj->ni', K, innovation)
+        self.covariances[rows] = (IDENTITY - K @ OBSERVATION) @ P
+
+    def _spawn(self, centres, sizes):
+        room = self.max_tracks - len(self.ids)
+        centres, sizes = centres[:room], sizes[:room]
+        n = len(centres)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        ids = (np.arange(n) + self.next_id - 1) % MAX_TRACK_ID + 1
+        self.next_id = int(ids[-1]) % MAX_TRACK_ID + 1
+        covariance = np.diag([MEASUREMENT_NOISE ** 2] * 2 + [INITIAL_VELOCITY_STD ** 2] * 2)
+
+        self.ids = np.concatenate([self.ids, ids])
+        self.states = np.vstack([self.states, np.hstack([centres, np.zeros((n, 2))])])
+        self.covariances = np.concatenate([self.covariances, np.repeat(covariance[None], n, axis=0)])
+        self.sizes = np.vstack([self.sizes, sizes])
+        self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int64)])
+        return ids
+
+    def _prune(self):
+        alive = self.misses <= self.max_misses
+        if alive.all():
+            return
+        self.ids = self.ids[alive]
+        self.states = self.states[alive]
+        self.covariances = self.covariances[alive]
+        self.sizes = self.sizes[alive]
+        self.misses = self.misses[alive]
+
+    def update(self, detections, timestamp=None):
+        """Match detections to tracks and add track_id, velocity and predicted to each
+
+        Detections that could not be given a track (tracker full) are
+        returned without the tracking keys.
+        """
+        if timestamp is None or self.last_time is None:
+            dt = DEFAULT_DT
+        else:
+            dt = min(max(timestamp - self.last_time, 0.0), MAX_DT)
+        if timestamp is not None:
+            self.last_time = timestamp
+
+        self._predict(dt)
+
+        boxes = np.array([d['bbox'] for d in detections], dtype=np.float64).reshape(-1, 4)
+        centres = np.array([[d['x'], d['y']] for d in detections], dtype=np.float64).reshape(-1, 2)
+
+        track_rows = np.full(len(detections), -1, dtype=np.int64)
+        if len(self.ids) and len(detections):
+            rows, cols = assign(self._cost(centres, boxes))
+            if len(rows):
+                self._correct(rows, centres[cols])
+                self.sizes[rows] = boxes[cols, 2:]
+                self.misses[rows] = 0
+                track_rows[cols] = rows
+            unmatched_tracks = np.ones(len(self.ids), dtype=bool)
+            unmatched_tracks[rows] = False
+            self.misses[unmatched_tracks] += 1
+        elif len(self.ids):
+            self.misses += 1
+
+        new = np.flatnonzero(track_rows < 0)
+        first_row = len(self.ids)
+        spawned = self._spawn(centres[new], boxes[new, 2:])
+        track_rows[new[:len(spawned)]] = np.arange(first_row, first_row + len(spawned))
+
+        for detection, row in zip(detections, track_rows):
+            if row < 0:
+                continue
+            x, y, vx, vy = self.states[row]
+            detection['track_id'] = int(self.ids[row])
+            detection['velocity'] = [round(float(vx), 1), round(float(vy), 1)]
+            detection['predicted'] = [int(round(x + vx * self.lead_time)),
+                                      int(round(y + vy * self.lead_time))]
+
+        # Drop tracks only after reporting so rows above stay valid
+        self._prune()
+        return detections
@@ -0,0 +1,108 @@
+"""
+Hot-reloading zone configuration.
+
+ZoneConfigWatcher polls shapes.json on a background thread, and only when
+the file's signature (mtime, size, inode) changes does it parse the JSON and
+precompile ZoneSets for every frame size the tracker has asked for. The
+compiled state is published as a single tuple, so the tracker swaps to new
+zones atomically between frames and never touches the file itself.
+"""
+
+import os
+import threading
+
+from motion_tracker.zones import SHAPES_FILE, ZoneSet, active_shapes, read_shapes_file
+
+# Watcher constants
+WATCH_INTERVAL = 0.5  # Seconds between shapes.json signature checks
+
+
+class ZoneConfigWatcher:
+    """Zone provider that follows edits to shapes.json without restarting the tracker"""
+
+    def __init__(self, path=SHAPES_FILE, interval=WATCH_INTERVAL, camera_id=None):
+        self.path = path
+        self.camera_id = camera_id
+        self.interval = interval
+        self.version = 0
+        self._signature = None
+        self._failed_signature = None
+        # (active shapes, {(width, height): ZoneSet}) - replaced as a whole, never mutated in place
+        self._state = ([], {})
+        self._publish_lock = threading.Lock()  # Keeps a frame-size compile from undoing a reload
+        self._stop = threading.Event()
+        self._thread = None
+        self.reload()
+
+    @property
+    def shapes(self):
+        return self._state[0]
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def reload(self):
+        """Re-read the file if it changed; returns True when new zones were published"""
+        signature = self._file_signature()
+        if signature == self._signature or signature == self._failed_signature:
+            return False
+
+        if signature is None:
+            shapes = []
+        else:
+            try:
+                shapes = active_shapes(read_shapes_file(self.path), self.camera_id)
+            except (ValueError, OSError) as e:
+                # Likely caught mid-write; keep the current zones and retry on the next poll
+                print(f"Error loading shapes, keeping current zones: {e}")
+                self._failed_signature = signature
+                return False
+        self._signature = signature
+
+        current_shapes, compiled = self._state
+        if shapes == current_shapes:
+            return False
+
+        # Precompile for every frame size already in use so the swap costs nothing per frame
+        sizes = list(compiled)
+        new_compiled = {size: ZoneSet(shapes, *size) for size in sizes} if shapes else {}
+        with self._publish_lock:
+            self._state = (shapes, new_compiled)
+        self.version += 1
+        print(f"Loaded {len(shapes)} active zone(s) from {self.path}")
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error watching shapes: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, name='zone-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def __call__(self, width, height):
+        state = self._state
+        shapes, compiled = state
+        if not shapes:
+            return None
+        zone_set = compiled.get((width, height))
+        if zone_set is None:
+            # First frame at this size: compile from the already-parsed shapes and publish a new state
+            zone_set = ZoneSet(shapes, width, height)
+            with self._publish_lock:
+                if self._state is state:
+                    self._state = (shapes, {**compiled, (width, height): zone_set})
+        return zone_set
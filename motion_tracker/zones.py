@@ -0,0 +1,117 @@
+"""
+Detection zones from the webapp's shapes.json.
+
+Shapes are stored as polygons in percentage coordinates of the camera
+image. A ZoneSet converts the active ones to pixel coordinates for one frame
+size, rasterizes them into a label mask (0 = outside, i + 1 = zone i) for
+constant-time zone lookups, and computes the bounding region of interest
+the tracker needs to process.
+
+With several cameras, shapes.json may also hold a "cameras" object keyed by
+camera id, each entry with its own "shapes" list; cameras without an entry
+(and the single-camera tracker) use the top-level shapes.
+"""
+
+import json
+import os
+
+import cv2
+import numpy as np
+
+# Zone constants
+SHAPES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'webapp', 'backend', 'shapes.json')
+ROI_MARGIN = 32  # Pixels of context kept around the zones so entering objects are seen
+MAX_ZONES = 255  # Label mask is uint8
+
+
+def read_shapes_file(path=SHAPES_FILE):
+    """Read and validate the shapes document, raising on missing or malformed files"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get('shapes'), list):
+        raise ValueError(f"{path} has no shapes list")
+    return data
+
+
+def load_shapes(path=SHAPES_FILE):
+    """Load the shapes document, returning an empty one if the file is missing or invalid"""
+    try:
+        return read_shapes_file(path)
+    except FileNotFoundError:
+        return {'shapes': []}
+    except Exception as e:
+        print(f"Error loading shapes: {e}")
+        return {'shapes': []}
+
+
+def camera_shapes(shapes_data, camera_id=None):
+    """The shapes list that applies to camera_id"""
+    camera = (shapes_data.get('cameras') or {}).get(camera_id) if camera_id else None
+    if isinstance(camera, dict) and isinstance(camera.get('shapes'), list):
+        return camera['shapes']
+    return shapes_data.get('shapes', [])
+
+
+def active_shapes(shapes_data, camera_id=None):
+    """Active shapes of camera_id that form a polygon"""
+    return [shape for shape in camera_shapes(shapes_data, camera_id)
+            if shape.get('active') and len(shape.get('points', [])) >= 3]
+
+
+class ZoneSet:
+    """Active zones compiled for a fixed frame size"""
+
+    def __init__(self, shapes, width, height, margin=ROI_MARGIN):
+        self.width = width
+        self.height = height
+        self.ids = [shape['id'] for shape in shapes[:MAX_ZONES]]
+        self.names = [shape.get('name', shape['id']) for shape in shapes[:MAX_ZONES]]
+
+        scale = np.array([width / 100.0, height / 100.0])
+        self.polygons = [
+            np.array([[p['x'], p['y']] for p in shape['points']], dtype=np.float64) * scale
+            for shape in shapes[:MAX_ZONES]
+        ]
+
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        for label, polygon in enumerate(self.polygons, start=1):
+            cv2.fillPoly(self.mask, [np.round(polygon).astype(np.int32)], label)
+
+        self.roi = self._bounding_roi(margin)
+
+    def _bounding_roi(self, margin):
+        """(x1, y1, x2, y2) around all zones, or the full frame if there are none"""
+        if not self.polygons:
+            return (0, 0, self.width, self.height)
+        points = np.vstack(self.polygons)
+        x1, y1 = np.floor(points.min(axis=0)).astype(int) - margin
+        x2, y2 = np.ceil(points.max(axis=0)).astype(int) + margin
+        return (max(0, int(x1)), max(0, int(y1)),
+                min(self.width, int(x2)), min(self.height, int(y2)))
+
+    def __bool__(self):
+        return bool(self.polygons)
+
+    def zone_at(self, x, y):
+        """Id of the zone covering pixel (x, y) from the label mask, or None"""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        label = self.mask[int(y), int(x)]
+        return self.ids[label - 1] if label else None
+
+
+class StaticZones:
+    """Zone provider for a fixed shapes document, compiled once per frame size"""
+
+    def __init__(self, shapes_data, camera_id=None):
+        self.shapes = active_shapes(shapes_data, camera_id)
+        self._compiled = {}
+
+    def __call__(self, width, height):
+        if not self.shapes:
+            return None
+        key = (width, height)
+        if key not in self._compiled:
+            self._compiled[key] = ZoneSet(self.shapes, width, height)
+        return self._compiled[key]
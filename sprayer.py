@@ -1,41 +1,195 @@
-import json
+import argparse
 import time
-import os
-
-def read_position_queue(queue_file="position_queue.txt"):
-    last_position = 0
-    
-    # Clear old queue file on startup
-    if os.path.exists(queue_file):
-        os.remove(queue_file)
-        print("Cleared old queue file")
-    
+from collections import deque
+
+from motion_tracker.actuators import ACTUATORS, DEFAULT_BURST, DEFAULT_GPIO_PIN, create_actuator
+from motion_tracker.detection_ring import open_reader_when_ready
+from motion_tracker.metrics import (MetricsRegistry, SNAPSHOT_INTERVAL, SPRAYER_METRICS_NAME,
+                                    default_metrics_path, write_snapshot)
+from motion_tracker.zone_config import ZoneConfigWatcher
+from motion_tracker.zones import SHAPES_FILE
+
+WAIT_TIMEOUT = 1.0  # Seconds to block before re-checking for shutdown
+STALE_AFTER = 1.0  # Detections captured longer ago than this are not worth spraying at
+
+# Per-zone burst control
+DEBOUNCE_HITS = 2  # Detections needed in a zone before it fires, so one-frame flicker is ignored
+DEBOUNCE_WINDOW = 0.5  # Seconds those detections must fall within
+COOLDOWN = 2.0  # Minimum seconds between bursts in the same zone
+MAX_BURSTS_PER_MINUTE = 6  # Per zone
+
+STATS_INTERVAL = 30.0  # Seconds between latency printouts
+
+class ZoneGate:
+    """Debounce and rate limit for one zone"""
+
+    def __init__(self, debounce_hits=DEBOUNCE_HITS, debounce_window=DEBOUNCE_WINDOW,
+                 cooldown=COOLDOWN, max_bursts_per_minute=MAX_BURSTS_PER_MINUTE):
+        self.hits = deque(maxlen=max(1, debounce_hits))
+        self.bursts = deque(maxlen=max(1, max_bursts_per_minute))
+        self.debounce_window = debounce_window
+        self.cooldown = cooldown
+        self.suppressed = 0
+
+    def should_fire(self, now):
+        self.hits.append(now)
+        if len(self.hits) < self.hits.maxlen or now - self.hits[0] > self.debounce_window:
+            return False
+        if self.bursts and now - self.bursts[-1] < self.cooldown:
+            self.suppressed += 1
+            return False
+        if len(self.bursts) == self.bursts.maxlen and now - self.bursts[0] < 60.0:
+            self.suppressed += 1
+            return False
+        self.bursts.append(now)
+        return True
+
+class SprayerDaemon:
+    """Turns detections from the ring into rate-limited bursts and tracks reaction time"""
+
+    def __init__(self, actuator, zone_provider=None, burst=DEFAULT_BURST, gate_options=None, camera_id=None):
+        self.actuator = actuator
+        self.camera_id = camera_id  # With several cameras, the one this sprayer is aimed through
+        self.zone_provider = zone_provider
+        self.burst = burst
+        self.gate_options = gate_options or {}
+        self.gates = {}
+
+        self.metrics = MetricsRegistry('sprayer')
+        self.metrics.describe('sprayer_latency_seconds', 'Detection latency from frame capture to each sprayer step')
+        self.metrics.describe('sprayer_detections_total', 'Detections received, by what the sprayer did with them')
+        # Where the time goes between the camera and the valve
+        self.latency = {name: self.metrics.histogram('sprayer_latency_seconds', path=name) for name in (
+            'capture_to_receive',  # Every detection: camera -> this process
+            'capture_to_publish',  # Tracker processing before the ring write
+            'publish_to_receive',  # Ring hand-off
+            'receive_to_actuate',  # Our own decision + actuator switching
+            'capture_to_actuate',  # End to end, for detections that fired
+        )}
+        self.counters = {outcome: self.metrics.counter('sprayer_detections_total', outcome=outcome)
+                         for outcome in ('received', 'other_camera', 'stale', 'outside_zones', 'debounced',
+                                         'fired')}
+
+    def zone_for(self, entry):
+        """Zone id the detection is in, None when zones are not in use, or False if outside all zones"""
+        frame_size = entry.get('frame_size')
+        if self.zone_provider is None or not frame_size:
+            return None
+        zones = self.zone_provider(*frame_size)
+        if not zones:
+            return None
+        zone = zones.zone_at(entry['x'], entry['y'])
+        return False if zone is None else zone
+
+    def handle(self, entry, received):
+        self.counters['received'].inc()
+        if self.camera_id and entry.get('camera_id', self.camera_id) != self.camera_id:
+            self.counters['other_camera'].inc()
+            return
+
+        captured = entry.get('capture_time') or entry['timestamp']
+        self.latency['capture_to_receive'].observe(received - captured)
+        self.latency['capture_to_publish'].observe(max(0.0, entry['timestamp'] - captured))
+        self.latency['publish_to_receive'].observe(max(0.0, received - entry['timestamp']))
+
+        if received - captured > STALE_AFTER:
+            self.counters['stale'].inc()
+            return
+
+        zone = self.zone_for(entry)
+        if zone is False:
+            self.counters['outside_zones'].inc()
+            return
+
+        gate = self.gates.get(zone)
+        if gate is None:
+            gate = self.gates[zone] = ZoneGate(**self.gate_options)
+        if not gate.should_fire(received):
+            self.counters['debounced'].inc()
+            return
+
+        # Tracked detections carry where the cat is expected to be once the spray lands
+        aim = entry.get('predicted', [entry['x'], entry['y']])
+        fired_at = self.actuator.fire(self.burst, aim)
+        self.counters['fired'].inc()
+        self.latency['receive_to_actuate'].observe(fired_at - received)
+        self.latency['capture_to_actuate'].observe(fired_at - captured)
+        print(f"Spray zone={zone} track={entry.get('track_id')} aim={aim} "
+              f"({(fired_at - captured) * 1000:.1f} ms after capture)")
+
+    def snapshot(self):
+        for zone, gate in self.gates.items():
+            self.metrics.gauge('sprayer_suppressed_bursts', zone=str(zone)).set(gate.suppressed)
+        return self.metrics.snapshot()
+
+    def summary(self):
+        counters = ', '.join(f"{name} {counter.value}" for name, counter in self.counters.items())
+        return '\n'.join([counters] + [histogram.summary() for histogram in self.latency.values()])
+
+def run_sprayer(daemon, ring_path=None, stats_interval=STATS_INTERVAL, stats_file=None):
+    print("Waiting for detection ring...")
+    reader = open_reader_when_ready(ring_path)
+    print(f"Attached to detection ring: {reader.path}")
+    last_stats = last_snapshot = time.monotonic()
+
     while True:
         try:
-            if os.path.exists(queue_file):
-                with open(queue_file, 'r') as f:
-                    f.seek(last_position)
-                    new_lines = f.readlines()
-                    last_position = f.tell()
-                
-                for line in new_lines:
-                    line = line.strip()
-                    if line:
-                        try:
-                            entry = json.loads(line)
-                            print(f"Received: {entry}")
-                        except json.JSONDecodeError:
-                            continue
-            
-            time.sleep(0.05)  # Check every 50ms for faster response
-            
+            # Sleeps until the tracker publishes, then handles everything new
+            entries = reader.wait(timeout=WAIT_TIMEOUT)
+            received = time.time()
+            for entry in entries:
+                daemon.handle(entry, received)
+
+            if stats_interval and time.monotonic() - last_stats >= stats_interval:
+                print(daemon.summary())
+                last_stats = time.monotonic()
+            if stats_file and time.monotonic() - last_snapshot >= SNAPSHOT_INTERVAL:
+                write_snapshot(stats_file, daemon.snapshot())
+                last_snapshot = time.monotonic()
+
         except KeyboardInterrupt:
-            print("Stopping queue reader...")
+            print("Stopping sprayer...")
             break
         except Exception as e:
-            print(f"Error reading queue: {e}")
+            print(f"Error handling detections: {e}")
             time.sleep(0.5)
 
+    reader.close()
+    print(daemon.summary())
+    if stats_file:
+        write_snapshot(stats_file, daemon.snapshot())
+
 if __name__ == "__main__":
-    print("Starting position queue reader...")
-    read_position_queue()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Spray at detected cats inside the active zones")
+    parser.add_argument('--ring', help='Detection ring path (defaults to the tracker\'s)')
+    parser.add_argument('--actuator', choices=sorted(ACTUATORS), default='stub')
+    parser.add_argument('--gpio-pin', type=int, default=DEFAULT_GPIO_PIN, help='BCM pin for --actuator gpio')
+    parser.add_argument('--burst', type=float, default=DEFAULT_BURST, help='Seconds per spray burst')
+    parser.add_argument('--shapes', default=SHAPES_FILE, help='shapes.json whose active zones may be sprayed')
+    parser.add_argument('--no-zones', action='store_true', help='Spray anywhere in the frame')
+    parser.add_argument('--camera', help='Only spray at detections from this camera id, inside its zones')
+    parser.add_argument('--debounce-hits', type=int, default=DEBOUNCE_HITS)
+    parser.add_argument('--cooldown', type=float, default=COOLDOWN)
+    parser.add_argument('--max-bursts-per-minute', type=int, default=MAX_BURSTS_PER_MINUTE)
+    parser.add_argument('--stats-interval', type=float, default=STATS_INTERVAL,
+                        help='Seconds between latency printouts (0 to disable)')
+    parser.add_argument('--stats-file', default=default_metrics_path(SPRAYER_METRICS_NAME),
+                        help='Metrics snapshot served by the backend\'s /api/metrics')
+    args = parser.parse_args()
+
+    print("Starting sprayer...")
+    actuator = create_actuator(args.actuator, **({'pin': args.gpio_pin} if args.actuator == 'gpio' else {}))
+    zone_provider = None if args.no_zones else ZoneConfigWatcher(args.shapes, camera_id=args.camera).start()
+    gate_options = {
+        'debounce_hits': args.debounce_hits,
+        'cooldown': args.cooldown,
+        'max_bursts_per_minute': args.max_bursts_per_minute,
+    }
+    daemon = SprayerDaemon(actuator, zone_provider, burst=args.burst, gate_options=gate_options,
+                           camera_id=args.camera)
+    try:
+        run_sprayer(daemon, args.ring, args.stats_interval, args.stats_file)
+    finally:
+        actuator.close()
+        if zone_provider is not None:
+            zone_provider.stop()
@@ -4,14 +4,25 @@ Motion Detector Backend API
 Handles shape configuration storage and camera streaming
 """
 
-import json
 import os
-import cv2
+import sys
+import threading
 import time
+import atexit
+import cv2
 from datetime import datetime
 from flask import Flask, jsonify, request, Response
 from flask_cors import CORS
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from motion_tracker.camera_broker import SharedFrameClient, broker_available
+from motion_tracker.detection_store import BUCKETS, HEATMAP_GRID, STORE_FILE, DetectionHistory
+from motion_tracker.metrics import (CAMERA_HEALTH_NAME, MetricsRegistry, SPRAYER_METRICS_NAME,
+                                    TRACKER_METRICS_NAME, default_metrics_path, read_snapshot, render_prometheus)
+from motion_tracker.zones import camera_shapes
+from shapes_store import ShapesStore, VersionConflict, apply_delta
+from streaming import STREAM_PROFILES, FrameBroadcaster
+
 # Constants
 SHAPES_FILE = 'shapes.json'
 DEFAULT_SHAPES = {'shapes': []}
@@ -25,18 +36,44 @@ CAMERA_WIDTH = 800
 CAMERA_HEIGHT = 600
 CAMERA_FPS = 30
 JPEG_QUALITY = 80
+USE_CAMERA_BROKER = True  # Read frames from a running camera_broker instead of opening the camera
+
+# Metrics constants
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Snapshot files written by the tracker and sprayer processes, merged into /api/metrics
+METRICS_SNAPSHOT_FILES = [default_metrics_path(TRACKER_METRICS_NAME), default_metrics_path(SPRAYER_METRICS_NAME)]
+
+# Multi-camera constants
+CAMERA_HEALTH_FILE = default_metrics_path(CAMERA_HEALTH_NAME)  # Written by motion_tracker/supervisor.py
+CAMERA_HEALTH_STALE_AFTER = 10.0  # Seconds; older health files mean the supervisor itself is down
+
+# Detection history constants
+DEFAULT_HISTORY_SECONDS = 24 * 3600  # Range queried when no start is given
+DETECTION_PAGE_SIZE = 1000
+
+# Shapes document kept in memory; writes to SHAPES_FILE are debounced and atomic
+shapes_store = ShapesStore(SHAPES_FILE, DEFAULT_SHAPES)
+atexit.register(shapes_store.flush)
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)  # Enable CORS for React frontend
+CORS(app, expose_headers=['ETag'])  # Enable CORS for React frontend; autosave reads ETags
 
-# Global camera object
+# Global camera object, shared by every request thread
 camera = None
+camera_lock = threading.Lock()
 
 def initialize_camera():
     """Initialize the camera"""
     global camera
     try:
+        # Share the broker's capture when it is running so we don't fight the trackers for the device
+        if USE_CAMERA_BROKER and broker_available():
+            # Views are fine here: each frame is resized into a new array as soon as it is read
+            camera = SharedFrameClient(copy=False)
+            print(f"Camera attached to broker at {camera.path}")
+            return True
+
         camera = cv2.VideoCapture(CAMERA_INDEX)
         if camera.isOpened():
             camera.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
@@ -54,12 +91,16 @@ def initialize_camera():
 def get_camera_frame():
     """Get a single frame from the camera"""
     global camera
-    if camera is None or not camera.isOpened():
-        if not initialize_camera():
-            return None
-    
     try:
-        ret, frame = camera.read()
+        with camera_lock:
+            if camera is None or not camera.isOpened():
+                if not initialize_camera():
+                    return None
+
+            if isinstance(camera, SharedFrameClient):
+                ret, frame = camera.latest()
+            else:
+                ret, frame = camera.read()
         if ret:
             # Resize frame to match our canvas dimensions
             frame = cv2.resize(frame, (CAMERA_WIDTH, CAMERA_HEIGHT))
@@ -71,25 +112,9 @@ def get_camera_frame():
         print(f"Error reading camera frame: {e}")
         return None
 
-def generate_camera_stream():
-    """Generate camera frames for streaming"""
-    while True:
-        frame = get_camera_frame()
-        if frame is not None:
-            # Encode frame as JPEG
-            ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
-            if ret:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-        else:
-            # Send a black frame if camera is not available
-            black_frame = create_black_frame()
-            ret, jpeg = cv2.imencode('.jpg', black_frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
-            if ret:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-        
-        time.sleep(1.0 / CAMERA_FPS)  # Control frame rate
+def generate_camera_stream(profile=None):
+    """Generate camera frames for streaming, shared with every other viewer on the same profile"""
+    return broadcaster.stream(profile)
 
 def create_black_frame():
     """Create a black frame with error message"""
@@ -106,122 +131,308 @@ def create_black_frame():
     cv2.putText(frame, text, (text_x, text_y), font, 1, (255, 255, 255), 2)
     return frame
 
+# Backend metrics; the tracker and sprayer publish theirs through snapshot files
+metrics = MetricsRegistry('backend')
+
+# One encoder thread serves every stream client
+broadcaster = FrameBroadcaster(get_camera_frame, create_black_frame, CAMERA_FPS, JPEG_QUALITY, metrics=metrics)
+
+def camera_health():
+    """Per-camera state from the multi-camera supervisor, or None when it has never run"""
+    health = read_snapshot(CAMERA_HEALTH_FILE)
+    if not health:
+        return None
+    cameras = health.get('cameras', {})
+    if time.time() - health['timestamp'] > CAMERA_HEALTH_STALE_AFTER:
+        # Nobody is supervising these trackers any more, so their last state can't be trusted
+        cameras = {camera_id: dict(status, state='unknown') for camera_id, status in cameras.items()}
+    return cameras
+
+def render_metrics():
+    """Backend metrics plus the latest tracker/sprayer snapshots in Prometheus text format"""
+    paths = list(METRICS_SNAPSHOT_FILES)
+    # Each supervised camera's tracker writes its own snapshot, labelled with its camera id
+    paths += [status['metrics_file'] for status in (camera_health() or {}).values() if status.get('metrics_file')]
+    snapshots = [metrics.snapshot()] + [read_snapshot(path) for path in paths]
+    return render_prometheus(snapshots)
+
+# Written by the tracker, read here through fresh read-only connections
+history = DetectionHistory(STORE_FILE)
+
+def parse_time_range(args):
+    """(start, end) epoch seconds from the query string, defaulting to the last DEFAULT_HISTORY_SECONDS"""
+    end = float(args.get('end', time.time()))
+    start = float(args.get('start', end - DEFAULT_HISTORY_SECONDS))
+    if start >= end:
+        raise ValueError('start must be before end')
+    return start, end
+
+def query_history(kind, args):
+    """Answer a detection history query; raises ValueError for a bad query string"""
+    start, end = parse_time_range(args)
+    result = {'start': start, 'end': end}
+    if kind == 'detections':
+        limit = int(args.get('limit', DETECTION_PAGE_SIZE))
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        result['detections'] = history.detections(start, end, zone=args.get('zone'), camera_id=args.get('camera'),
+                                                  limit=limit)
+    elif kind == 'zones':
+        totals = history.zone_totals(start, end, args.get('camera'))
+        result['zones'] = [{'zone': zone or None, 'count': count} for zone, count in sorted(totals.items())]
+    elif kind == 'counts':
+        bucket = args.get('bucket', 'hour')
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of {sorted(BUCKETS)}")
+        resolution = history.series_resolution(start, end, bucket)
+        result['bucket'] = resolution
+        result['counts'] = [{'time': bucket_time, 'zone': zone or None, 'count': count}
+                            for bucket_time, zone, count in history.counts(start, end, resolution, args.get('zone'),
+                                                                           args.get('camera'))]
+    elif kind == 'heatmap':
+        grid = history.heatmap(start, end, int(args.get('columns', HEATMAP_GRID[0])), args.get('camera'))
+        result.update(columns=grid.shape[1], rows=grid.shape[0], grid=grid.tolist())
+    return result
+
+def merge_camera_shapes(camera_id, data, shapes_data=None):
+    """Full shapes document with one camera's shapes replaced by data['shapes']"""
+    shapes_data = load_shapes() if shapes_data is None else shapes_data
+    cameras = dict(shapes_data.get('cameras') or {})
+    cameras[camera_id] = {'shapes': data['shapes']}
+    return dict(shapes_data, cameras=cameras)
+
+def patch_shapes(shapes_data, delta, camera_id=None):
+    """Full shapes document with a delta (see shapes_store.apply_delta) applied to the shapes or one camera's"""
+    if camera_id:
+        shapes = apply_delta(camera_shapes(shapes_data, camera_id), delta)
+        return merge_camera_shapes(camera_id, {'shapes': shapes}, shapes_data)
+    return dict(shapes_data, shapes=apply_delta(shapes_data['shapes'], delta))
+
 def load_shapes():
-    """Load shapes from JSON file"""
-    try:
-        if os.path.exists(SHAPES_FILE):
-            with open(SHAPES_FILE, 'r') as f:
-                return json.load(f)
-        else:
-            return DEFAULT_SHAPES
-    except Exception as e:
-        print(f"Error loading shapes: {e}")
-        return DEFAULT_SHAPES
+    """Current shapes document (read-only); the file is only re-read when it changes on disk"""
+    return shapes_store.document()
 
 def save_shapes(shapes_data):
-    """Save shapes to JSON file"""
+    """Replace the shapes document; it is written to the file shortly after"""
     try:
-        # Add timestamp to the data
-        shapes_data['last_updated'] = datetime.now().isoformat()
-        
-        with open(SHAPES_FILE, 'w') as f:
-            json.dump(shapes_data, f, indent=2)
+        shapes_store.replace(shapes_data)
         return True
     except Exception as e:
         print(f"Error saving shapes: {e}")
         return False
 
+def stream_profile(args):
+    """Stream profile from ?profile=&width=&quality=&fps=, or None for the full stream;
+    raises ValueError for a bad query string"""
+    if not any(key in args for key in ('profile', 'width', 'quality', 'fps')):
+        return None
+    width, quality, fps = (args.get(key) for key in ('width', 'quality', 'fps'))
+    return broadcaster.profile(args.get('profile'),
+                               width=int(width) if width is not None else None,
+                               quality=int(quality) if quality is not None else None,
+                               fps=float(fps) if fps is not None else None)
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header covers etag"""
+    return bool(if_none_match) and (if_none_match.strip() == '*' or
+                                     etag in [tag.strip() for tag in if_none_match.split(',')])
+
 @app.route('/api/camera/stream')
 def camera_stream():
-    """Camera streaming endpoint"""
-    return Response(generate_camera_stream(),
+    """Camera streaming endpoint; ?profile=low or ?width=&quality=&fps= for a lighter stream"""
+    try:
+        profile = stream_profile(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(generate_camera_stream(profile),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/api/camera/snapshot')
 def camera_snapshot():
-    """Get a single camera snapshot"""
-    frame = get_camera_frame()
-    if frame is not None:
-        ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
-        if ret:
-            return Response(jpeg.tobytes(), mimetype='image/jpeg')
-    
-    # Return black frame if camera not available
-    black_frame = create_black_frame()
-    ret, jpeg = cv2.imencode('.jpg', black_frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
-    return Response(jpeg.tobytes(), mimetype='image/jpeg')
+    """Get a single camera snapshot, with the same profile parameters as the stream"""
+    try:
+        profile = stream_profile(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Reuse the frame the stream just encoded instead of encoding another one;
+    # shows the black "not available" frame if the camera is down
+    return Response(broadcaster.snapshot(profile), mimetype='image/jpeg')
 
 @app.route('/api/camera/status')
 def camera_status():
     """Get camera status"""
-    global camera
-    is_available = camera is not None and camera.isOpened()
-    
     return jsonify({
-        'available': is_available,
+        'available': camera_available(),
         'width': CAMERA_WIDTH,
         'height': CAMERA_HEIGHT,
-        'fps': CAMERA_FPS
+        'fps': CAMERA_FPS,
+        'profiles': sorted(STREAM_PROFILES)
     })
 
 @app.route('/api/shapes', methods=['GET'])
 def get_shapes():
-    """Get all motion detection shapes"""
+    """Get all motion detection shapes, or one camera's with ?camera=ID; 304 if the ETag still matches"""
     try:
-        shapes_data = load_shapes()
-        return jsonify(shapes_data), 200
+        body, etag = shapes_store.body(request.args.get('camera'))
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers={'ETag': etag})
+        return Response(body, mimetype='application/json', headers={'ETag': etag})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def validate_shape(shape):
+    """Return an error message if one shape is invalid, otherwise None"""
+    required_fields = ['id', 'name', 'points', 'active']
+    if not isinstance(shape, dict) or not all(field in shape for field in required_fields):
+        return f'Shape missing required fields: {required_fields}'
+    
+    # Validate points
+    if not isinstance(shape['points'], list):
+        return 'Shape points must be a list'
+    
+    for point in shape['points']:
+        if not isinstance(point, dict) or 'x' not in point or 'y' not in point:
+            return 'Invalid point format'
+    return None
+
+def validate_shapes_data(data):
+    """Return an error message if the shapes payload is invalid, otherwise None"""
+    if not data or 'shapes' not in data:
+        return 'Invalid data format'
+
+    cameras = data.get('cameras')
+    if cameras is not None:
+        if not isinstance(cameras, dict):
+            return 'Cameras must be an object keyed by camera id'
+        for camera in cameras.values():
+            error = validate_shapes_data(camera if isinstance(camera, dict) else None)
+            if error:
+                return error
+    
+    # Validate shapes data
+    shapes = data['shapes']
+    if not isinstance(shapes, list):
+        return 'Shapes must be a list'
+    
+    # Validate each shape
+    for shape in shapes:
+        error = validate_shape(shape)
+        if error:
+            return error
+    return None
+
+def validate_shapes_delta(delta):
+    """Return an error message if a PATCH delta is invalid, otherwise None"""
+    if not isinstance(delta, dict) or not any(key in delta for key in ('upsert', 'delete', 'order')):
+        return 'Delta must have upsert, delete or order'
+    for key in ('upsert', 'delete', 'order'):
+        if delta.get(key) is not None and not isinstance(delta[key], list):
+            return f'{key} must be a list'
+    for shape in delta.get('upsert') or []:
+        error = validate_shape(shape)
+        if error:
+            return error
+    if not all(isinstance(shape_id, str) for shape_id in (delta.get('delete') or []) + (delta.get('order') or [])):
+        return 'Shape ids must be strings'
+    return None
+
+def camera_available():
+    """Whether the camera (or broker) is currently open"""
+    return camera is not None and camera.isOpened()
+
 @app.route('/api/shapes', methods=['POST'])
 def save_shapes_endpoint():
-    """Save motion detection shapes"""
+    """Save motion detection shapes, or only one camera's with ?camera=ID"""
     try:
         data = request.get_json()
         
-        if not data or 'shapes' not in data:
-            return jsonify({'error': 'Invalid data format'}), 400
-        
-        # Validate shapes data
-        shapes = data['shapes']
-        if not isinstance(shapes, list):
-            return jsonify({'error': 'Shapes must be a list'}), 400
-        
-        # Validate each shape
-        for shape in shapes:
-            required_fields = ['id', 'name', 'points', 'active']
-            if not all(field in shape for field in required_fields):
-                return jsonify({'error': f'Shape missing required fields: {required_fields}'}), 400
-            
-            # Validate points
-            if not isinstance(shape['points'], list):
-                return jsonify({'error': 'Shape points must be a list'}), 400
-            
-            for point in shape['points']:
-                if not isinstance(point, dict) or 'x' not in point or 'y' not in point:
-                    return jsonify({'error': 'Invalid point format'}), 400
-        
-        # Save the shapes
-        if save_shapes(data):
-            return jsonify({'message': 'Shapes saved successfully'}), 200
+        error = validate_shapes_data(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        camera_id = request.args.get('camera')
+        if camera_id:
+            etag = shapes_store.update(lambda shapes_data: merge_camera_shapes(camera_id, data, shapes_data),
+                                       request.headers.get('If-Match'))
         else:
-            return jsonify({'error': 'Failed to save shapes'}), 500
-            
+            etag = shapes_store.replace(data, request.headers.get('If-Match'))
+        return jsonify({'message': 'Shapes saved successfully'}), 200, {'ETag': etag}
+    except VersionConflict as e:
+        return jsonify({'error': str(e)}), 412, {'ETag': shapes_store.etag}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    global camera
-    camera_status = camera is not None and camera.isOpened()
-    
-    return jsonify({
+@app.route('/api/shapes', methods=['PATCH'])
+def patch_shapes_endpoint():
+    """Apply a per-shape delta {upsert: [shape], delete: [id], order: [id]}, optionally to ?camera=ID"""
+    try:
+        delta = request.get_json()
+        
+        error = validate_shapes_delta(delta)
+        if error:
+            return jsonify({'error': error}), 400
+
+        camera_id = request.args.get('camera')
+        etag = shapes_store.update(lambda shapes_data: patch_shapes(shapes_data, delta, camera_id),
+                                   request.headers.get('If-Match'))
+        return jsonify({'message': 'Shapes updated'}), 200, {'ETag': etag}
+    except VersionConflict as e:
+        return jsonify({'error': str(e)}), 412, {'ETag': shapes_store.etag}
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def health_status():
+    """Health check body; lists every supervised camera when the multi-camera supervisor runs"""
+    status = {
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'version': API_VERSION,
-        'camera_available': camera_status
-    }), 200
+        'camera_available': camera_available()
+    }
+    cameras = camera_health()
+    if cameras is not None:
+        status['cameras'] = cameras
+        if any(camera['state'] not in ('running', 'finished') for camera in cameras.values()):
+            status['status'] = 'degraded'
+    return status
+
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return jsonify(health_status()), 200
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics for the backend, tracker and sprayer"""
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def history_endpoint(kind):
+    try:
+        return jsonify(query_history(kind, request.args)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/detections', methods=['GET'])
+def detections_endpoint():
+    """Raw detections between start and end (epoch seconds), optionally for one zone or camera"""
+    return history_endpoint('detections')
+
+@app.route('/api/detections/zones', methods=['GET'])
+def detection_zones_endpoint():
+    """Detections per zone between start and end, optionally for one camera"""
+    return history_endpoint('zones')
+
+@app.route('/api/detections/counts', methods=['GET'])
+def detection_counts_endpoint():
+    """Detections per zone per minute/hour/day bucket between start and end, optionally for one camera"""
+    return history_endpoint('counts')
+
+@app.route('/api/detections/heatmap', methods=['GET'])
+def detection_heatmap_endpoint():
+    """Detection density grid over the frame between start and end, optionally for one camera"""
+    return history_endpoint('heatmap')
 
 @app.errorhandler(404)
 def not_found(error):
@@ -236,6 +447,7 @@ def internal_error(error):
 if __name__ == '__main__':
     print(f"Starting Motion Detector API server...")
     print(f"Shapes file: {SHAPES_FILE}")
+    print(f"Detection history: {STORE_FILE}")
     print(f"Port: {PORT}")
     print(f"Debug mode: {DEBUG}")
     
@@ -249,6 +461,7 @@ if __name__ == '__main__':
     # Create initial shapes file if it doesn't exist
     if not os.path.exists(SHAPES_FILE):
         save_shapes(DEFAULT_SHAPES)
+        shapes_store.flush()
         print(f"Created initial shapes file: {SHAPES_FILE}")
     
     try:
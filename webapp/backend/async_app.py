@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Asyncio serving mode for the Motion Detector Backend API.
+
+Serves the same /api/shapes, /api/camera/* and /api/health contracts as
+app.py, but on aiohttp: each MJPEG viewer is a coroutine rather than a
+thread, so hundreds of idle stream connections cost little. Frames still
+come from the shared FrameBroadcaster (one grab per frame, one encode per
+stream profile); one bridge subscription per profile hands each chunk to
+the event loop, which fans it out to per-client bounded queues. Writes
+await the socket drain, so a slow client only backs up its own queue, where
+stale frames are dropped, and a client that keeps dropping frames is moved
+to a lower-quality bridge until it catches up.
+
+Requires aiohttp (pip install aiohttp).
+
+    python async_app.py
+"""
+
+import asyncio
+import json
+import os
+from collections import deque
+
+from aiohttp import web
+
+import app as flask_app
+from app import (CAMERA_FPS, CAMERA_HEIGHT, CAMERA_WIDTH, PORT,
+                 PROMETHEUS_CONTENT_TYPE, SHAPES_FILE, DEFAULT_SHAPES, broadcaster, camera_available, etag_matches,
+                 health_status, initialize_camera, merge_camera_shapes, metrics, patch_shapes,
+                 query_history, render_metrics, save_shapes, shapes_store, stream_profile, validate_shapes_data,
+                 validate_shapes_delta)
+from shapes_store import VersionConflict
+from streaming import STREAM_PROFILES, SUBSCRIBER_QUEUE_SIZE, QualityGovernor
+
+# Async server constants
+MAX_STREAM_CLIENTS = 1000  # Further stream requests get 503 instead of degrading everyone
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PATCH, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, If-Match, If-None-Match',
+    'Access-Control-Expose-Headers': 'ETag',
+}
+
+
+class StreamClient:
+    """Per-viewer bounded queue living on the event loop"""
+
+    def __init__(self, profile, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.chunks = deque(maxlen=maxsize)
+        self.ready = asyncio.Event()
+        self.governor = QualityGovernor(profile)
+        self.bridge = None
+        self.dropped = 0
+
+    @property
+    def profile(self):
+        return self.governor.profile
+
+    def push(self, chunk):
+        dropped = len(self.chunks) == self.chunks.maxlen
+        if dropped:
+            self.dropped += 1
+        self.chunks.append(chunk)
+        self.ready.set()
+        self.governor.observe(dropped)
+
+    async def next_chunk(self):
+        while not self.chunks:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.chunks.popleft()
+
+
+class LoopBridge:
+    """Broadcaster subscriber that forwards one profile's chunks from the encode thread to the event loop"""
+
+    def __init__(self, hub, profile):
+        self.hub = hub
+        self.profile = profile
+        self.clients = set()
+
+    def put(self, chunk):
+        # One thread-safe hop per frame, regardless of how many viewers are connected
+        self.hub.loop.call_soon_threadsafe(self._fan_out, chunk)
+
+    def _fan_out(self, chunk):
+        for client in list(self.clients):
+            client.push(chunk)
+            if client.profile != self.profile:
+                # Its quality was stepped; it gets the other profile from the next frame
+                self.hub.remove(client)
+                self.hub.add(client)
+
+    def close(self):
+        pass
+
+
+class StreamHub:
+    """The event loop's stream clients, with one broadcaster bridge per profile in use"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.bridges = {}
+
+    def client_count(self):
+        return sum(len(bridge.clients) for bridge in self.bridges.values())
+
+    def add(self, client):
+        bridge = self.bridges.get(client.profile)
+        if bridge is None:
+            bridge = self.bridges[client.profile] = LoopBridge(self, client.profile)
+            broadcaster.subscribe(bridge)
+        bridge.clients.add(client)
+        client.bridge = bridge
+
+    def remove(self, client):
+        bridge = client.bridge
+        bridge.clients.discard(client)
+        client.bridge = None
+        if not bridge.clients and self.bridges.get(bridge.profile) is bridge:
+            del self.bridges[bridge.profile]
+            broadcaster.unsubscribe(bridge)
+
+    def close(self):
+        for bridge in self.bridges.values():
+            broadcaster.unsubscribe(bridge)
+        self.bridges = {}
+
+
+def json_response(data, status=200):
+    return web.json_response(data, status=status, dumps=json.dumps)
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    if request.method == 'OPTIONS':
+        return web.Response(headers=CORS_HEADERS)
+    try:
+        response = await handler(request)
+    except web.HTTPNotFound:
+        response = json_response({'error': 'Endpoint not found'}, 404)
+    except web.HTTPException:
+        raise
+    except Exception:
+        response = json_response({'error': 'Internal server error'}, 500)
+    if not response.prepared:
+        response.headers.update(CORS_HEADERS)
+    return response
+
+
+async def camera_stream(request):
+    """Camera streaming endpoint; ?profile=low or ?width=&quality=&fps= for a lighter stream"""
+    hub = request.app['streams']
+    if hub.client_count() >= MAX_STREAM_CLIENTS:
+        return json_response({'error': 'Too many stream clients'}, 503)
+    try:
+        profile = stream_profile(request.query) or broadcaster.profile()
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'multipart/x-mixed-replace; boundary=frame',
+        'Cache-Control': 'no-cache',
+        **CORS_HEADERS,
+    })
+    await response.prepare(request)
+
+    client = StreamClient(profile)
+    hub.add(client)
+    try:
+        while True:
+            # write() waits for the socket to drain, so backpressure stays per client
+            await response.write(await client.next_chunk())
+            metrics.inc('stream_chunks_sent_total')
+    except ConnectionResetError:
+        pass
+    finally:
+        # Also runs when aiohttp cancels the handler on disconnect; the cancellation carries on
+        metrics.inc('stream_dropped_frames_total', client.dropped)
+        metrics.inc('stream_quality_changes_total', client.governor.changes)
+        hub.remove(client)
+    return response
+
+
+async def camera_snapshot(request):
+    """Get a single camera snapshot, with the same profile parameters as the stream"""
+    try:
+        profile = stream_profile(request.query)
+    except ValueError as e:
+        return json_response({'error': str(e)}, 400)
+    jpeg = broadcaster.latest(max_age=1.0 / CAMERA_FPS, profile=profile)
+    if jpeg is None:
+        jpeg = await asyncio.get_running_loop().run_in_executor(None, broadcaster.snapshot, profile)
+    return web.Response(body=jpeg, content_type='image/jpeg')
+
+
+async def camera_status(request):
+    """Get camera status"""
+    return json_response({
+        'available': camera_available(),
+        'width': CAMERA_WIDTH,
+        'height': CAMERA_HEIGHT,
+        'fps': CAMERA_FPS,
+        'profiles': sorted(STREAM_PROFILES)
+    })
+
+
+async def get_shapes(request):
+    """Get all motion detection shapes, or one camera's with ?camera=ID; 304 if the ETag still matches"""
+    body, etag = await asyncio.get_running_loop().run_in_executor(None, shapes_store.body,
+                                                                  request.query.get('camera'))
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return web.Response(status=304, headers={'ETag': etag})
+    return web.Response(body=body, content_type='application/json', headers={'ETag': etag})
+
+
+async def save_shapes_endpoint(request):
+    """Save motion detection shapes, or only one camera's with ?camera=ID"""
+    try:
+        data = await request.json()
+    except json.JSONDecodeError:
+        data = None
+
+    error = validate_shapes_data(data)
+    if error:
+        return json_response({'error': error}, 400)
+
+    camera_id = request.query.get('camera')
+
+    def change(shapes_data):
+        return merge_camera_shapes(camera_id, data, shapes_data) if camera_id else data
+
+    return await update_shapes(request, change, 'Shapes saved successfully')
+
+
+async def patch_shapes_endpoint(request):
+    """Apply a per-shape delta {upsert: [shape], delete: [id], order: [id]}, optionally to ?camera=ID"""
+    try:
+        delta = await request.json()
+    except json.JSONDecodeError:
+        delta = None
+
+    error = validate_shapes_delta(delta)
+    if error:
+        return json_response({'error': error}, 400)
+
+    camera_id = request.query.get('camera')
+    return await update_shapes(request, lambda shapes_data: patch_shapes(shapes_data, delta, camera_id),
+                               'Shapes updated')
+
+
+async def update_shapes(request, change, message):
+    """Apply change to the shapes document, honouring If-Match"""
+    try:
+        etag = await asyncio.get_running_loop().run_in_executor(None, shapes_store.update, change,
+                                                                request.headers.get('If-Match'))
+    except VersionConflict as e:
+        response = json_response({'error': str(e)}, 412)
+        response.headers['ETag'] = shapes_store.etag
+        return response
+    response = json_response({'message': message})
+    response.headers['ETag'] = etag
+    return response
+
+
+async def health_check(request):
+    """Health check endpoint"""
+    status = await asyncio.get_running_loop().run_in_executor(None, health_status)
+    status['stream_clients'] = request.app['streams'].client_count()
+    return json_response(status)
+
+
+async def metrics_endpoint(request):
+    """Prometheus metrics for the backend, tracker and sprayer"""
+    text = await asyncio.get_running_loop().run_in_executor(None, render_metrics)
+    return web.Response(body=text.encode(), headers={'Content-Type': PROMETHEUS_CONTENT_TYPE})
+
+
+def history_handler(kind):
+    """Detection history endpoint; the SQLite queries run on the default executor"""
+    async def handler(request):
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, query_history, kind, request.query)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        return json_response(result)
+    return handler
+
+
+async def on_startup(application):
+    application['streams'] = StreamHub(asyncio.get_running_loop())
+
+
+async def on_cleanup(application):
+    application['streams'].close()
+    if flask_app.camera is not None:
+        flask_app.camera.release()
+        print("Camera released")
+
+
+def create_app():
+    application = web.Application(middlewares=[cors_middleware])
+    application.on_startup.append(on_startup)
+    application.on_cleanup.append(on_cleanup)
+    application.router.add_get('/api/camera/stream', camera_stream)
+    application.router.add_get('/api/camera/snapshot', camera_snapshot)
+    application.router.add_get('/api/camera/status', camera_status)
+    application.router.add_get('/api/shapes', get_shapes)
+    application.router.add_post('/api/shapes', save_shapes_endpoint)
+    application.router.add_patch('/api/shapes', patch_shapes_endpoint)
+    application.router.add_get('/api/health', health_check)
+    application.router.add_get('/api/metrics', metrics_endpoint)
+    application.router.add_get('/api/detections', history_handler('detections'))
+    application.router.add_get('/api/detections/zones', history_handler('zones'))
+    application.router.add_get('/api/detections/counts', history_handler('counts'))
+    application.router.add_get('/api/detections/heatmap', history_handler('heatmap'))
+    return application
+
+
+if __name__ == '__main__':
+    print(f"Starting Motion Detector API server (asyncio)...")
+    print(f"Shapes file: {SHAPES_FILE}")
+    print(f"Port: {PORT}")
+
+    print("Initializing camera...")
+    if initialize_camera():
+        print("Camera initialized successfully")
+    else:
+        print("Warning: Camera initialization failed - will show placeholder")
+
+    if not os.path.exists(SHAPES_FILE):
+        save_shapes(DEFAULT_SHAPES)
+        shapes_store.flush()
+        print(f"Created initial shapes file: {SHAPES_FILE}")
+
+    web.run_app(create_app(), host='0.0.0.0', port=PORT)
@@ -0,0 +1,183 @@
+"""
+In-memory, versioned shapes document for the API.
+
+ShapesStore keeps the parsed shapes document in memory, bumps a version on
+every change and serves GETs from a cached JSON body tagged with an ETag, so
+unchanged polls are answered with 304 and no parsing. Autosaves send small
+per-shape deltas (upserts, deletes, order) instead of the whole document.
+Changes are written back on a short debounce, coalescing bursts of edits
+into one write, by writing a temp file and renaming it over shapes.json so
+the tracker's zone watcher never reads a torn file. Edits made to the file
+by hand are picked up on the next read, as long as no write is pending.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from motion_tracker.zones import camera_shapes
+
+# Store constants
+SAVE_DEBOUNCE = 0.5  # Seconds of quiet before pending changes are written
+SAVE_MAX_DELAY = 2.0  # Longest a change waits while edits keep coming
+
+
+class VersionConflict(Exception):
+    """The client's If-Match ETag is not the current version"""
+
+
+def apply_delta(shapes, delta):
+    """Shapes list with a delta applied: 'upsert' shapes by id, 'delete' ids, optional 'order' of ids"""
+    by_id = {shape['id']: shape for shape in shapes}
+    order = [shape['id'] for shape in shapes]
+    for shape_id in delta.get('delete') or []:
+        if by_id.pop(shape_id, None) is not None:
+            order.remove(shape_id)
+    for shape in delta.get('upsert') or []:
+        if shape['id'] not in by_id:
+            order.append(shape['id'])
+        by_id[shape['id']] = shape
+    if delta.get('order') is not None:
+        # Ids missing from the given order keep their relative place at the end
+        listed = [shape_id for shape_id in delta['order'] if shape_id in by_id]
+        order = listed + [shape_id for shape_id in order if shape_id not in set(listed)]
+    return [by_id[shape_id] for shape_id in order]
+
+
+class ShapesStore:
+    """Shapes document shared by every request thread, persisted on a debounce"""
+
+    def __init__(self, path, default=None, debounce=SAVE_DEBOUNCE, max_delay=SAVE_MAX_DELAY):
+        self.path = path
+        self.default = default or {'shapes': []}
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.version = 0
+        self.writes = 0
+        # Tags are unique per process, so a tag cached before a restart never matches
+        self._instance = uuid.uuid4().hex[:8]
+        self._data = None
+        self._signature = None
+        self._bodies = {}  # camera id (or None) -> JSON body for the current version
+        self._dirty_since = None
+        self._changed_at = 0.0
+        self._cond = threading.Condition()
+        self._writer = None
+
+    @property
+    def etag(self):
+        return f'"{self._instance}-{self.version}"'
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _refresh(self):
+        """Load the file on first use, and again if someone else changed it"""
+        if self._dirty_since is not None:
+            return
+        signature = self._file_signature()
+        if self._data is not None and signature == self._signature:
+            return
+        data = self.default
+        if signature is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Error loading shapes: {e}")
+                if self._data is not None:
+                    return
+        self._set(data)
+        self._signature = signature
+
+    def _set(self, data):
+        self._data = data
+        self.version += 1
+        self._bodies = {}
+
+    def document(self):
+        """The current shapes document; treat it as read-only"""
+        with self._cond:
+            self._refresh()
+            return self._data
+
+    def body(self, camera_id=None):
+        """(JSON bytes, ETag) of the document, or of one camera's shapes, built once per version"""
+        with self._cond:
+            self._refresh()
+            body = self._bodies.get(camera_id)
+            if body is None:
+                data = {'shapes': camera_shapes(self._data, camera_id)} if camera_id else self._data
+                body = self._bodies[camera_id] = json.dumps(data, separators=(',', ':')).encode()
+            return body, self.etag
+
+    def update(self, change, if_match=None):
+        """Replace the document with change(document) and schedule a write; returns the new ETag.
+
+        Raises VersionConflict if if_match (an If-Match header) names another version.
+        """
+        with self._cond:
+            self._refresh()
+            if if_match and if_match != '*' and self.etag not in [tag.strip() for tag in if_match.split(',')]:
+                raise VersionConflict(f"Shapes changed since {if_match}; now {self.etag}")
+            self._set(dict(change(self._data), last_updated=datetime.now().isoformat()))
+            self._schedule()
+            return self.etag
+
+    def replace(self, data, if_match=None):
+        """Replace the whole document"""
+        return self.update(lambda _: data, if_match)
+
+    def _schedule(self):
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        self._changed_at = now
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+        self._cond.notify_all()
+
+    def _write_loop(self):
+        with self._cond:
+            while self._dirty_since is not None:
+                due = min(self._changed_at + self.debounce, self._dirty_since + self.max_delay)
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                self._write()
+
+    def _write(self):
+        """Write the document to a temp file and rename it into place (call with the lock held)"""
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, 'w') as f:
+                json.dump(self._data, f, separators=(',', ':'))
+                # On disk before the rename, so a power cut can't leave an empty shapes.json behind
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp, self.path)
+            self.writes += 1
+            self._signature = self._file_signature()
+        except Exception as e:
+            # Keep the change pending and retry after another debounce
+            print(f"Error saving shapes: {e}")
+            self._dirty_since = self._changed_at = time.monotonic()
+            return False
+        self._dirty_since = None
+        return True
+
+    def flush(self):
+        """Write pending changes now; returns False if the write failed"""
+        with self._cond:
+            if self._dirty_since is None:
+                return True
+            return self._write()
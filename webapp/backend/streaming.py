@@ -0,0 +1,352 @@
+"""
+Encode-once MJPEG fan-out for the camera stream.
+
+A single broadcaster thread grabs each frame once, paced on a fixed
+deadline, and JPEG-encodes it once per stream profile (width, quality and
+frame rate) that some client asked for, handing the same multipart chunk to
+every client on that profile. Requested sizes and qualities are rounded to
+coarse steps and at most MAX_STREAM_VARIANTS are encoded at a time, so
+similar previews share one encode; the newest encode of each profile also
+answers snapshot requests. Each client has a small bounded queue that keeps
+only the newest frames, so a slow client skips frames instead of slowing
+everyone down, and a client whose queue keeps overflowing is stepped down
+to a lower JPEG quality until it keeps up again. The thread only runs while
+someone is subscribed. Grab/encode/fan-out times and frame counters go to
+an optional MetricsRegistry.
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+
+from motion_tracker.metrics import MetricsRegistry
+
+# Broadcaster constants
+SUBSCRIBER_QUEUE_SIZE = 2  # Frames buffered per client before the oldest is dropped
+IDLE_STOP_DELAY = 2.0  # Seconds with no subscribers before the encode thread exits
+MULTIPART_BOUNDARY = b'--frame\r\n'
+
+# Stream profile constants
+STREAM_PROFILES = {
+    'full': {},  # The camera's size, JPEG_QUALITY and frame rate
+    'low': {'width': 320, 'quality': 50, 'fps': 10},  # Previews and slow links
+}
+MIN_STREAM_WIDTH = 160
+WIDTH_STEP = 32  # Requested widths are rounded to this so similar previews share a variant
+QUALITY_STEP = 10  # Qualities are rounded to this; adaptive changes move one step at a time
+MIN_STREAM_QUALITY = 10
+MAX_STREAM_QUALITY = 100
+MAX_STREAM_VARIANTS = 4  # Distinct encodes per frame; further profiles get the closest one
+MIN_ADAPTIVE_QUALITY = 30  # Backed-up clients are not stepped below this
+CONGESTION_LEVEL = 0.3  # Share of recent chunks dropped unsent that marks a client as backed up
+ADAPT_WINDOW = 15  # Chunks the drop share is averaged over, and the least between quality changes
+RECOVER_CHUNKS = 150  # Chunks delivered without a drop before quality steps back up
+LATEST_KEEP = 1.0  # Seconds an encoded variant is kept for snapshots after its last use
+
+
+class StreamProfile(namedtuple('StreamProfile', ['width', 'height', 'quality', 'every'])):
+    """Encoded variant of the stream: size, JPEG quality and broadcast frames per sent frame"""
+
+    def label(self):
+        return f"{self.width}x{self.height}q{self.quality}/{self.every}"
+
+
+def multipart_chunk(jpeg_bytes):
+    """Wrap JPEG bytes as one part of a multipart/x-mixed-replace stream"""
+    return (MULTIPART_BOUNDARY +
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg_bytes + b'\r\n')
+
+
+class QualityGovernor:
+    """Steps a client's JPEG quality down while its queue overflows, and back up once it keeps up"""
+
+    def __init__(self, requested):
+        self.requested = requested
+        self.profile = requested
+        self.changes = 0
+        self._pressure = 0.0  # Moving average of the share of chunks that pushed out an unsent one
+        self._since_change = 0
+        self._clear = 0
+
+    def observe(self, dropped):
+        """Account for one queued chunk; returns the profile the client should get next"""
+        self._pressure += ((1.0 if dropped else 0.0) - self._pressure) / ADAPT_WINDOW
+        self._since_change += 1
+        self._clear = 0 if dropped else self._clear + 1
+        quality = self.profile.quality
+        if self._pressure >= CONGESTION_LEVEL and self._since_change >= ADAPT_WINDOW:
+            # Give each step a window to take effect before judging it
+            quality = max(min(quality, MIN_ADAPTIVE_QUALITY), quality - QUALITY_STEP)
+        elif self._clear >= RECOVER_CHUNKS and quality < self.requested.quality:
+            quality = min(self.requested.quality, quality + QUALITY_STEP)
+        if quality != self.profile.quality:
+            self.profile = self.profile._replace(quality=quality)
+            self.changes += 1
+            self._pressure = 0.0
+            self._since_change = self._clear = 0
+        return self.profile
+
+
+class Subscription:
+    """One client's view of the broadcast: a bounded queue keeping the newest chunks"""
+
+    def __init__(self, profile=None, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self._chunks = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.governor = QualityGovernor(profile) if profile is not None else None
+        self.dropped = 0
+        self.closed = False
+
+    @property
+    def profile(self):
+        """Profile to encode for this client, or None for the broadcaster's default"""
+        return self.governor.profile if self.governor else None
+
+    @property
+    def quality_changes(self):
+        return self.governor.changes if self.governor else 0
+
+    def put(self, chunk):
+        with self._cond:
+            dropped = len(self._chunks) == self._chunks.maxlen
+            if dropped:
+                self.dropped += 1
+            self._chunks.append(chunk)
+            self._cond.notify()
+        if self.governor:
+            self.governor.observe(dropped)
+
+    def get(self, timeout=None):
+        """Next chunk, or None on timeout/close"""
+        with self._cond:
+            if not self._chunks and not self.closed:
+                self._cond.wait(timeout)
+            return self._chunks.popleft() if self._chunks else None
+
+    def backlog(self):
+        return len(self._chunks)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class FrameBroadcaster:
+    """Grabs, encodes and fans out camera frames to all stream subscribers"""
+
+    def __init__(self, get_frame, placeholder_frame, fps, quality, metrics=None, max_variants=MAX_STREAM_VARIANTS):
+        self.get_frame = get_frame
+        self.placeholder_frame = placeholder_frame
+        self.fps = fps
+        self.quality = quality
+        self.max_variants = max_variants
+        self.metrics = metrics or MetricsRegistry('backend', enabled=False)
+        self.metrics.describe('stream_stage_seconds', 'Time per broadcast frame spent grabbing, encoding and fanning out')
+
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._placeholder = None
+        self._placeholder_chunks = {}  # profile -> encoded placeholder
+        self._latest = {}  # profile -> (JPEG, monotonic time) of its newest encode
+        self.default_profile = None
+
+    def frame_size(self):
+        """(height, width) of broadcast frames, taken from the placeholder"""
+        if self._placeholder is None:
+            self._placeholder = self.placeholder_frame()
+        return self._placeholder.shape[:2]
+
+    def profile(self, name=None, width=None, quality=None, fps=None):
+        """Stream profile for a request, rounded so that similar requests share one variant.
+
+        name picks a preset from STREAM_PROFILES, which width, quality and fps override.
+        Raises ValueError for an unknown name or a non-positive fps.
+        """
+        if name is not None and name not in STREAM_PROFILES:
+            raise ValueError(f"profile must be one of {sorted(STREAM_PROFILES)}")
+        preset = STREAM_PROFILES.get(name) or {}
+        base_height, base_width = self.frame_size()
+        width = preset.get('width', base_width) if width is None else width
+        quality = preset.get('quality', self.quality) if quality is None else quality
+        fps = preset.get('fps', self.fps) if fps is None else fps
+        if fps <= 0:
+            raise ValueError('fps must be positive')
+
+        width = min(base_width, max(MIN_STREAM_WIDTH, round(width / WIDTH_STEP) * WIDTH_STEP))
+        # Keep the camera's aspect ratio, with an even height for chroma subsampling
+        height = base_height if width == base_width else max(2, round(width * base_height / base_width / 2) * 2)
+        if quality != self.quality:
+            quality = min(MAX_STREAM_QUALITY, max(MIN_STREAM_QUALITY, round(quality / QUALITY_STEP) * QUALITY_STEP))
+        # Lower rates send every n-th broadcast frame, so they line up with the full-rate variant
+        every = max(1, round(self.fps / fps))
+        return StreamProfile(width, height, quality, every)
+
+    def _default(self):
+        if self.default_profile is None:
+            # Full size, self.quality, every frame
+            self.default_profile = self.profile()
+        return self.default_profile
+
+    def encode(self, frame, profile=None):
+        profile = profile or self._default()
+        if frame.shape[1] != profile.width or frame.shape[0] != profile.height:
+            frame = cv2.resize(frame, (profile.width, profile.height))
+        ret, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, profile.quality])
+        return jpeg.tobytes() if ret else None
+
+    def placeholder_jpeg(self, profile=None):
+        """The "Camera not available" frame, rendered once and encoded once per profile"""
+        profile = profile or self._default()
+        jpeg = self._placeholder_chunks.get(profile)
+        if jpeg is None:
+            self.frame_size()
+            jpeg = self._placeholder_chunks[profile] = self.encode(self._placeholder, profile)
+        return jpeg
+
+    def subscribe(self, subscription=None, profile=None):
+        """Register a subscriber (anything with put(chunk) and close(), and optionally a profile
+        attribute) and start encoding"""
+        subscription = subscription or Subscription(profile)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='mjpeg-broadcast', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            self._subscribers.discard(subscription)
+            count = len(self._subscribers)
+        self.metrics.inc('stream_dropped_frames_total', getattr(subscription, 'dropped', 0))
+        self.metrics.inc('stream_quality_changes_total', getattr(subscription, 'quality_changes', 0))
+        self.metrics.set_gauge('stream_subscribers', count)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def variants(self, subscribers):
+        """Group subscribers by the profile they are sent, capped at max_variants profiles"""
+        groups = {}
+        for subscription in subscribers:
+            groups.setdefault(getattr(subscription, 'profile', None) or self._default(), []).append(subscription)
+        if len(groups) <= self.max_variants:
+            return groups
+        # Keep the most watched profiles; everyone else gets the closest of those at or below their quality,
+        # so a client stepped down for congestion is never merged back up. The lowest quality is always kept
+        # so there is such a profile for everyone.
+        ranked = sorted(groups, key=lambda profile: len(groups[profile]), reverse=True)
+        chosen = ranked[:self.max_variants]
+        lowest = min(ranked, key=lambda profile: profile.quality)
+        if lowest not in chosen:
+            chosen[-1] = lowest
+        kept = {profile: groups[profile] for profile in chosen}
+        for profile in ranked:
+            if profile in kept:
+                continue
+            closest = min((other for other in kept if other.quality <= profile.quality),
+                          key=lambda other: (abs(other.width - profile.width),
+                                             profile.quality - other.quality,
+                                             abs(other.every - profile.every)))
+            kept[closest] = kept[closest] + groups[profile]
+        return kept
+
+    def _remember(self, profile, jpeg):
+        now = time.monotonic()
+        with self._lock:
+            self._latest[profile] = (jpeg, now)
+            if len(self._latest) > 2 * self.max_variants:
+                for stale in [key for key, (_, at) in self._latest.items() if now - at > LATEST_KEEP]:
+                    del self._latest[stale]
+
+    def _publish(self, profile, jpeg, subscribers):
+        self._remember(profile, jpeg)
+        chunk = multipart_chunk(jpeg)
+        with self.metrics.timer('stream_stage_seconds', stage='fanout'):
+            for subscription in subscribers:
+                subscription.put(chunk)
+        self.metrics.inc('stream_frames_total')
+        self.metrics.inc('stream_bytes_total', len(chunk) * len(subscribers))
+
+    def _run(self):
+        period = 1.0 / self.fps
+        deadline = time.monotonic()
+        idle_since = None
+        tick = 0
+
+        while True:
+            with self._lock:
+                subscribers = list(self._subscribers)
+            if not subscribers:
+                idle_since = idle_since or time.monotonic()
+                if time.monotonic() - idle_since >= IDLE_STOP_DELAY:
+                    with self._lock:
+                        if not self._subscribers:
+                            self._thread = None
+                            return
+            else:
+                idle_since = None
+                groups = self.variants(subscribers)
+                self.metrics.set_gauge('stream_subscribers', len(subscribers))
+                self.metrics.set_gauge('stream_variants', len(groups))
+                due = {profile: group for profile, group in groups.items() if tick % profile.every == 0}
+                if due:
+                    # One grab per frame, one encode per profile due on it
+                    with self.metrics.timer('stream_stage_seconds', stage='grab'):
+                        frame = self.get_frame()
+                    for profile, group in due.items():
+                        with self.metrics.timer('stream_stage_seconds', stage='encode'):
+                            jpeg = self.encode(frame, profile) if frame is not None else None
+                        if jpeg is None:
+                            self.metrics.inc('stream_placeholder_frames_total')
+                        self._publish(profile, jpeg or self.placeholder_jpeg(profile), group)
+                tick += 1
+
+            # Pace on a fixed deadline so encode time doesn't stretch the frame interval
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period:
+                # Fell more than a frame behind; resync instead of bursting to catch up
+                deadline = time.monotonic()
+
+    def latest(self, max_age, profile=None):
+        """Most recently broadcast JPEG of a profile if it is at most max_age seconds old"""
+        entry = self._latest.get(profile or self._default())
+        if entry is not None and time.monotonic() - entry[1] <= max_age:
+            return entry[0]
+        return None
+
+    def snapshot(self, profile=None, max_age=None):
+        """JPEG of the current frame: the stream's own encode if it is fresh, else a new one shared
+        with other snapshot requests for the next max_age seconds"""
+        profile = profile or self._default()
+        max_age = 1.0 / self.fps if max_age is None else max_age
+        jpeg = self.latest(max_age, profile)
+        if jpeg is not None:
+            return jpeg
+        frame = self.get_frame()
+        jpeg = self.encode(frame, profile) if frame is not None else None
+        if jpeg is None:
+            return self.placeholder_jpeg(profile)
+        self._remember(profile, jpeg)
+        return jpeg
+
+    def stream(self, profile=None, timeout=1.0):
+        """Generator of multipart chunks for one client"""
+        subscription = self.subscribe(profile=profile or self._default())
+        try:
+            while True:
+                chunk = subscription.get(timeout)
+                if chunk is not None:
+                    yield chunk
+                    self.metrics.inc('stream_chunks_sent_total')
+        finally:
+            self.unsubscribe(subscription)
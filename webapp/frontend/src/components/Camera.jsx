@@ -23,6 +23,8 @@ function Camera({
   const [isLoading, setIsLoading] = useState(true);
   const [cameraDimensions, setCameraDimensions] = useState({ width: 640, height: 480 });
   const intervalRef = useRef(null);
+  // Full camera size from /api/camera/status; snapshots are requested scaled to the displayed width
+  const fullSizeRef = useRef(null);
 
   useEffect(() => {
     getCameraDimensions();
@@ -40,6 +42,7 @@ function Camera({
       const response = await fetch(CAMERA_STATUS_URL);
       const status = await response.json();
       if (status.available) {
+        fullSizeRef.current = { width: status.width, height: status.height };
         setCameraDimensions({
           width: status.width,
           height: status.height
@@ -63,7 +66,9 @@ function Camera({
   const updateSnapshot = async () => {
     if (imgRef.current) {
       const timestamp = Date.now();
-      imgRef.current.src = `${CAMERA_SNAPSHOT_URL}?t=${timestamp}`;
+      const shownWidth = containerRef.current ? containerRef.current.clientWidth : 0;
+      const scaled = fullSizeRef.current && shownWidth > 0 && shownWidth < fullSizeRef.current.width;
+      imgRef.current.src = `${CAMERA_SNAPSHOT_URL}?t=${timestamp}${scaled ? `&width=${shownWidth}` : ''}`;
     }
   };
 
@@ -71,8 +76,8 @@ function Camera({
     setIsLoading(false);
     setStreamError(null);
     
-    // Update dimensions from the actual loaded image
-    if (imgRef.current) {
+    // Update dimensions from the actual loaded image, unless it was requested scaled down
+    if (imgRef.current && !fullSizeRef.current) {
       setCameraDimensions({
         width: imgRef.current.naturalWidth,
         height: imgRef.current.naturalHeight
@@ -1,5 +1,5 @@
 import { useState, useEffect, useRef } from 'react';
-import { saveShapes } from '../utils/api';
+import { patchShapes, saveShapes, ShapesConflictError } from '../utils/api';
 
 // Constants
 const SAVE_STATUSES = {
@@ -11,11 +11,38 @@ const SAVE_STATUSES = {
 
 const CHECK_INTERVAL = 1000; // Check every second
 
+// Per-shape changes between the last saved shapes and the current ones, or null if nothing changed
+export function shapesDelta(saved, current) {
+  const savedById = new Map(saved.map(shape => [shape.id, JSON.stringify(shape)]));
+  const currentIds = new Set(current.map(shape => shape.id));
+  const upsert = current.filter(shape => savedById.get(shape.id) !== JSON.stringify(shape));
+  const deleted = saved.filter(shape => !currentIds.has(shape.id)).map(shape => shape.id);
+
+  // The server keeps existing shapes in place and appends new ones; send the order only if that is wrong
+  const expected = [
+    ...saved.filter(shape => currentIds.has(shape.id)).map(shape => shape.id),
+    ...current.filter(shape => !savedById.has(shape.id)).map(shape => shape.id)
+  ];
+  const order = current.map(shape => shape.id);
+  const reordered = order.some((id, index) => id !== expected[index]);
+
+  if (!upsert.length && !deleted.length && !reordered) {
+    return null;
+  }
+  return {
+    ...(upsert.length ? { upsert } : {}),
+    ...(deleted.length ? { delete: deleted } : {}),
+    ...(reordered ? { order } : {})
+  };
+}
+
 export function useAutosave(shapes, autosaveInterval) {
   const [saveStatus, setSaveStatus] = useState(SAVE_STATUSES.SAVED);
   const [lastSaveTime, setLastSaveTime] = useState(Date.now());
   const intervalRef = useRef(null);
   const isInitialLoad = useRef(true);
+  // Shapes as the server last accepted them; null until the first full save
+  const lastSavedRef = useRef(null);
 
   // Setup autosave interval
   useEffect(() => {
@@ -50,7 +77,21 @@ export function useAutosave(shapes, autosaveInterval) {
     setSaveStatus(SAVE_STATUSES.SAVING);
     
     try {
-      await saveShapes({ shapes });
+      const delta = lastSavedRef.current && shapesDelta(lastSavedRef.current, shapes);
+      if (!lastSavedRef.current) {
+        await saveShapes({ shapes });
+      } else if (delta) {
+        try {
+          await patchShapes(delta);
+        } catch (error) {
+          if (!(error instanceof ShapesConflictError)) {
+            throw error;
+          }
+          // Someone else saved in between; this editor's shapes win, as with full saves
+          await saveShapes({ shapes });
+        }
+      }
+      lastSavedRef.current = shapes;
       setSaveStatus(SAVE_STATUSES.SAVED);
     } catch (error) {
       console.error('Autosave failed:', error);
@@ -2,7 +2,8 @@
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5002/api';
 const ENDPOINTS = {
   SHAPES: `${API_BASE_URL}/shapes`,
-  HEALTH: `${API_BASE_URL}/health`
+  HEALTH: `${API_BASE_URL}/health`,
+  DETECTIONS: `${API_BASE_URL}/detections`
 };
 
 const REQUEST_TIMEOUT = 10000; // 10 seconds
@@ -28,16 +29,41 @@ const fetchWithTimeout = async (url, options = {}) => {
   }
 };
 
+// With several cameras, shapes are stored per camera id; no camera means the top-level shapes
+const shapesUrl = (camera) => camera ? `${ENDPOINTS.SHAPES}?camera=${encodeURIComponent(camera)}` : ENDPOINTS.SHAPES;
+
+// Last ETag and body per shapes URL: unchanged reloads come back as 304, and edits send
+// the ETag they were based on so the server can refuse them if someone else saved first
+const shapesCache = new Map();
+
+export class ShapesConflictError extends Error {}
+
+const rememberEtag = (url, response, data = null) => {
+  const etag = response.headers.get('ETag');
+  if (etag) {
+    shapesCache.set(url, { etag, data });
+  } else {
+    shapesCache.delete(url);
+  }
+};
+
 // API Functions
-export const loadShapes = async () => {
+export const loadShapes = async (camera) => {
+  const url = shapesUrl(camera);
   try {
-    const response = await fetchWithTimeout(ENDPOINTS.SHAPES);
+    const cached = shapesCache.get(url);
+    const headers = cached && cached.data ? { 'If-None-Match': cached.etag } : {};
+    const response = await fetchWithTimeout(url, { headers });
     
+    if (response.status === 304) {
+      return cached.data;
+    }
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
     
     const data = await response.json();
+    rememberEtag(url, response, data);
     return data;
   } catch (error) {
     console.error('Failed to load shapes:', error);
@@ -45,27 +71,54 @@ export const loadShapes = async () => {
   }
 };
 
-export const saveShapes = async (shapesData) => {
+const sendShapes = async (method, body, camera) => {
+  const url = shapesUrl(camera);
+  const cached = shapesCache.get(url);
+  const response = await fetchWithTimeout(url, {
+    method,
+    headers: cached ? { ...DEFAULT_HEADERS, 'If-Match': cached.etag } : DEFAULT_HEADERS,
+    body: JSON.stringify(body)
+  });
+
+  if (response.status === 412) {
+    shapesCache.delete(url);
+    throw new ShapesConflictError('Shapes were changed elsewhere');
+  }
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+  }
+
+  // Our copy of the body is stale now; keep only the ETag for the next edit
+  rememberEtag(url, response);
+  return await response.json();
+};
+
+export const saveShapes = async (shapesData, camera) => {
   try {
-    const response = await fetchWithTimeout(ENDPOINTS.SHAPES, {
-      method: 'POST',
-      headers: DEFAULT_HEADERS,
-      body: JSON.stringify(shapesData)
-    });
-    
-    if (!response.ok) {
-      const errorData = await response.json().catch(() => ({}));
-      throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
-    }
-    
-    const data = await response.json();
-    return data;
+    // A full save replaces whatever is there, so it does not need to match a version
+    shapesCache.delete(shapesUrl(camera));
+    return await sendShapes('POST', shapesData, camera);
   } catch (error) {
     console.error('Failed to save shapes:', error);
     throw new Error('Failed to save shapes to server');
   }
 };
 
+// Send only what changed: { upsert: [shape], delete: [id], order: [id] }.
+// Throws ShapesConflictError if the shapes changed on the server since we last saw them.
+export const patchShapes = async (delta, camera) => {
+  try {
+    return await sendShapes('PATCH', delta, camera);
+  } catch (error) {
+    if (error instanceof ShapesConflictError) {
+      throw error;
+    }
+    console.error('Failed to update shapes:', error);
+    throw new Error('Failed to update shapes on server');
+  }
+};
+
 export const healthCheck = async () => {
   try {
     const response = await fetchWithTimeout(ENDPOINTS.HEALTH);
@@ -82,6 +135,26 @@ export const healthCheck = async () => {
   }
 };
 
+// Detection history: kind is '' (raw detections), 'zones', 'counts' or 'heatmap';
+// params are query options such as start/end (epoch seconds), zone, camera, bucket, columns
+export const loadDetectionHistory = async (kind = '', params = {}) => {
+  try {
+    const query = new URLSearchParams(params).toString();
+    const url = `${ENDPOINTS.DETECTIONS}${kind ? `/${kind}` : ''}${query ? `?${query}` : ''}`;
+    const response = await fetchWithTimeout(url);
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.error || `HTTP error! status: ${response.status}`);
+    }
+
+    return await response.json();
+  } catch (error) {
+    console.error('Failed to load detection history:', error);
+    throw new Error('Failed to load detection history from server');
+  }
+};
+
 // Utility function to validate shape data before sending
 export const validateShapeData = (shapesData) => {
   if (!shapesData || typeof shapesData !== 'object') {